@@ -0,0 +1,162 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Generating many experiment or system descriptions in one command.
+
+Bootstrapping Ramble and loading the repos is most of the cost of generating
+a single description. ``init --manifest`` and ``experiment init
+--all-variants`` pay it once, then hand the specs to a pool of forked
+workers that inherit the loaded repos. Each spec succeeds or fails on its
+own, and the results are reported in one table.
+"""
+
+import collections
+import concurrent.futures
+import multiprocessing
+import time
+
+import benchpark.yamlio
+
+#: The outcome of generating the description of one spec: ``output`` is
+#: where it was written, or the error if ``ok`` is False
+Result = collections.namedtuple("Result", ["spec", "ok", "output", "seconds"])
+
+
+def read_manifest(path):
+    """The ``(spec, dest)`` pairs listed in a manifest file.
+
+    A manifest is a YAML list of specs, or a mapping with such a list under
+    ``specs``. Each item is either a spec string, or a mapping with a
+    ``spec`` and optionally the ``dest`` directory to write it to::
+
+        specs:
+        - amg2023 programming_model=cuda
+        - spec: saxpy programming_model=openmp
+          dest: nightly/saxpy-openmp
+
+    ``dest`` is None when the item doesn't set it.
+    """
+    data = benchpark.yamlio.load(path)
+
+    if isinstance(data, dict):
+        data = data.get("specs")
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of specs (or 'specs: [...]')")
+
+    entries = []
+    for i, item in enumerate(data):
+        if isinstance(item, str):
+            entries.append((item, None))
+        elif isinstance(item, dict) and isinstance(item.get("spec"), str):
+            entries.append((item["spec"], item.get("dest")))
+        else:
+            raise ValueError(
+                f"{path}: item {i} must be a spec or a mapping with a 'spec'"
+            )
+    return entries
+
+
+def _fork_pool(workers):
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork")
+    )
+
+
+def process_pool(jobs):
+    """A process pool whose workers inherit the repos already loaded here,
+    or None if processes cannot be forked on this platform.
+    """
+    if jobs < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return _fork_pool(jobs)
+
+
+def _error(e):
+    return f"{type(e).__name__}: {e}"
+
+
+def _timed(worker, spec, *args):
+    # Runs in the worker: errors are turned into strings here, since not all
+    # exceptions (e.g. from Ramble) survive being sent back from a process
+    start = time.perf_counter()
+    try:
+        output, ok = worker(spec, *args), True
+    except Exception as e:
+        output, ok = _error(e), False
+    return Result(spec, ok, output, time.perf_counter() - start)
+
+
+def _run_isolated(worker, tasks, jobs):
+    """Like ``run``, but each task gets a process of its own, so a task that
+    kills its process (e.g. a segfault) fails without taking others along.
+    """
+    results = []
+    for start in range(0, len(tasks), jobs):
+        pools, futures = [], []
+        for task in tasks[start : start + jobs]:
+            pools.append(_fork_pool(1))
+            futures.append(pools[-1].submit(_timed, worker, *task))
+        for task, pool, future in zip(tasks[start : start + jobs], pools, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(Result(task[0], False, _error(e), 0.0))
+            pool.shutdown()
+    return results
+
+
+def run(worker, tasks, jobs):
+    """Call ``worker(*task)`` for each of ``tasks`` (argument tuples that
+    start with the spec string), in up to ``jobs`` processes. Returns a
+    ``Result`` for each task, in order.
+
+    ``worker`` must be a module-level function, and its arguments and return
+    value must be picklable.
+    """
+    pool = process_pool(jobs)
+    if pool is None:
+        return [_timed(worker, *task) for task in tasks]
+
+    results = [None] * len(tasks)
+    with pool:
+        futures = [pool.submit(_timed, worker, *task) for task in tasks]
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                # A worker died, which fails every task the pool had not
+                # finished: those are run again below
+                pass
+            except Exception as e:
+                results[i] = Result(tasks[i][0], False, _error(e), 0.0)
+
+    unfinished = [i for i, result in enumerate(results) if result is None]
+    retried = _run_isolated(worker, [tasks[i] for i in unfinished], jobs)
+    for i, result in zip(unfinished, retried):
+        results[i] = result
+    return results
+
+
+def summary(results):
+    """A table of ``results``: status, time, spec and output of each."""
+    rows = [("", "time", "spec", "output")]
+    for result in results:
+        status = "ok" if result.ok else "FAILED"
+        rows.append((status, f"{result.seconds:.2f}s", result.spec, result.output))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(3)]
+    lines = []
+    for row in rows:
+        cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+        lines.append("  ".join(cells + [row[3]]))
+    return "\n".join(lines)
+
+
+def report(results, what="descriptions"):
+    """Print the summary of ``results``, and return the number of failures."""
+    failures = sum(1 for result in results if not result.ok)
+    print(summary(results))
+    print(f"\nGenerated {len(results) - failures} of {len(results)} {what}")
+    return failures
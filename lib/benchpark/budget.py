@@ -0,0 +1,325 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Node-hour estimates for the experiments of a workspace, and pruning them
+to fit a budget.
+
+An instance is charged for the nodes Ramble's allocation modifier requests
+for it, for the whole of its ``timeout``. This is what the scheduler
+reserves, so it is an upper bound on what the instance uses. The allocation
+arithmetic is that of ``modifiers/allocation/modifier.py``, which needs
+Ramble to be imported; ``allocation`` repeats it and the two must be changed
+together.
+
+Pruning happens before anything is submitted: ``restrict`` rewrites the
+applications section so that each experiment only expands to the instances
+that were kept.
+"""
+
+import collections
+import copy
+import math
+import pathlib
+
+import benchpark.expansion
+import benchpark.yamlio
+
+#: Variables the allocation modifier reads as numbers (AllocOpt)
+allocation_options = (
+    "n_ranks",
+    "n_nodes",
+    "n_cores_per_rank",
+    "n_threads_per_proc",
+    "n_ranks_per_node",
+    "n_gpus",
+    "n_cores_per_node",
+    "omp_num_threads",
+    "sys_gpus_per_node",
+    "sys_cores_per_node",
+    "sys_mem_per_node",
+    "timeout",
+    "max_request",
+)
+
+#: Minutes the allocation modifier requests when there is no timeout
+default_timeout = 120
+
+
+class Estimate(
+    collections.namedtuple(
+        "Estimate",
+        [
+            "application",
+            "workload",
+            "experiment",
+            "name",
+            "point",
+            "n_nodes",
+            "n_ranks",
+            "n_gpus",
+            "minutes",
+        ],
+    )
+):
+    """The allocation of one instance of ``experiment``. ``point`` holds the
+    values of the experiment's list variables at this instance.
+    """
+
+    __slots__ = ()
+
+    @property
+    def node_hours(self):
+        return self.n_nodes * self.minutes / 60
+
+
+def allocation(instance):
+    """The ``(n_nodes, n_ranks, n_gpus, minutes)`` that the allocation
+    modifier requests for ``instance``. Raise ValueError if it would fail.
+    """
+    v = {}
+    for option in allocation_options:
+        try:
+            v[option] = int(instance.get(option))
+        except (TypeError, ValueError):
+            v[option] = None
+
+    # Values above max_request are placeholders (e.g. the n_nodes of a
+    # system's variables.yaml), to be determined from the others
+    max_request = v["max_request"] or 1000
+    for option, value in v.items():
+        if value is not None and value > max_request:
+            v[option] = None
+
+    if v["omp_num_threads"] is not None:
+        if v["n_threads_per_proc"] not in (None, v["omp_num_threads"]):
+            raise ValueError("Configs set omp_num_threads and n_threads_per_proc")
+        v["n_threads_per_proc"] = v["omp_num_threads"]
+
+    if not v["n_ranks"]:
+        if v["n_ranks_per_node"] and v["n_nodes"]:
+            v["n_ranks"] = v["n_nodes"] * v["n_ranks_per_node"]
+        elif v["n_gpus"]:
+            v["n_ranks"] = v["n_gpus"]
+
+    if not v["n_nodes"]:
+        if not any((v["n_ranks"], v["n_gpus"])):
+            raise ValueError("Must specify one of: n_nodes, n_ranks, n_gpus")
+        cores_node_request = None
+        if v["n_ranks"]:
+            if not v["sys_cores_per_node"]:
+                raise ValueError("sys_cores_per_node is not specified for the system")
+            multi_cores_per_rank = v["n_cores_per_rank"] or v["n_threads_per_proc"] or 0
+            cores_request_per_rank = max(multi_cores_per_rank, 1)
+            ranks_per_node = math.floor(
+                v["sys_cores_per_node"] / cores_request_per_rank
+            )
+            if ranks_per_node == 0:
+                raise ValueError(
+                    "Experiment requests more cores per rank than "
+                    "are available on a node"
+                )
+            cores_node_request = math.ceil(v["n_ranks"] / ranks_per_node)
+        gpus_node_request = None
+        if v["n_gpus"]:
+            if v["sys_gpus_per_node"]:
+                gpus_node_request = math.ceil(v["n_gpus"] / v["sys_gpus_per_node"])
+            else:
+                raise ValueError(
+                    "Experiment requests GPUs, but sys_gpus_per_node "
+                    "is not specified for the system"
+                )
+        v["n_nodes"] = max(cores_node_request or 0, gpus_node_request or 0)
+
+    for option, value in v.items():
+        if value is not None and value > max_request:
+            raise ValueError(f"Request exceeds maximum: {option}/{value}/{max_request}")
+
+    return v["n_nodes"], v["n_ranks"], v["n_gpus"], v["timeout"] or default_timeout
+
+
+def estimate(applications, variables=None):
+    """Generate an ``Estimate`` for each instance of the experiments in a
+    Ramble applications section, given the workspace's ``variables``.
+    """
+    matrices = benchpark.expansion.application_matrices(applications, variables)
+    for app_name, workload_name, matrix in matrices:
+        for instance in matrix:
+            try:
+                resources = allocation(instance)
+            except ValueError as e:
+                raise ValueError(f"{instance.name}: {e}")
+            yield Estimate(
+                app_name,
+                workload_name,
+                matrix.name,
+                instance.name,
+                instance.point,
+                *resources,
+            )
+
+
+def total(estimates):
+    return sum(e.node_hours for e in estimates)
+
+
+def largest_first(estimates, budget):
+    """Drop the instances that use the most node-hours until the rest fit in
+    ``budget``.
+    """
+    by_cost = sorted(range(len(estimates)), key=lambda i: estimates[i].node_hours)
+    remaining = total(estimates)
+    dropped = set()
+    while by_cost and remaining > budget:
+        i = by_cost.pop()
+        remaining -= estimates[i].node_hours
+        dropped.add(i)
+    return dropped
+
+
+def _spread(n):
+    """The indices of ``n`` items, ordered so that any prefix is spread
+    evenly over them (by their bit-reversed position).
+    """
+    width = max(n - 1, 0).bit_length()
+    return sorted(range(n), key=lambda i: int(f"{i:0{width}b}"[::-1], 2))
+
+
+def stratified(estimates, budget):
+    """Keep instances at every scale (number of nodes), smallest first: the
+    scales take turns adding one more instance as long as it fits in
+    ``budget``. Within a scale, instances are picked spread out over the
+    experiment's matrix.
+    """
+    strata = collections.defaultdict(list)
+    for i, e in enumerate(estimates):
+        strata[e.n_nodes].append(i)
+    queues = [
+        collections.deque(members[j] for j in _spread(len(members)))
+        for _, members in sorted(strata.items())
+    ]
+
+    kept = set()
+    spent = 0
+    while any(queues):
+        for queue in queues:
+            while queue:
+                i = queue.popleft()
+                if spent + estimates[i].node_hours <= budget:
+                    kept.add(i)
+                    spent += estimates[i].node_hours
+                    break
+    return set(range(len(estimates))) - kept
+
+
+#: Ways of choosing the instances to drop to fit a budget, each a function of
+#: the estimates and the budget returning the indices of those to drop
+strategies = {
+    "largest-first": largest_first,
+    "stratified": stratified,
+}
+
+
+def prune(estimates, budget, strategy="largest-first"):
+    """Split ``estimates`` into those kept and those dropped to fit in
+    ``budget`` node-hours, both in their original order.
+    """
+    if strategy not in strategies:
+        raise ValueError(
+            f"Unknown strategy '{strategy}' (choose from: {', '.join(strategies)})"
+        )
+    estimates = list(estimates)
+    dropped = strategies[strategy](estimates, budget)
+    return (
+        [e for i, e in enumerate(estimates) if i not in dropped],
+        [e for i, e in enumerate(estimates) if i in dropped],
+    )
+
+
+def restrict(applications, kept, dropped):
+    """A copy of the applications section without the instances in
+    ``dropped`` (``kept`` and ``dropped`` being estimated from it, see
+    ``prune``).
+
+    An experiment that lost instances is rewritten so that its list
+    variables hold the values of the kept instances, iterated together
+    rather than through its zips and matrices. Experiments (and workloads
+    and applications) left without instances are removed.
+    """
+    points = collections.defaultdict(list)
+    for e in kept:
+        points[(e.application, e.workload, e.experiment)].append(e.point)
+    pruned = set((e.application, e.workload, e.experiment) for e in dropped)
+
+    restricted = copy.deepcopy(applications)
+    matrices = benchpark.expansion.application_matrices(applications)
+    for app_name, workload_name, matrix in matrices:
+        key = (app_name, workload_name, matrix.name)
+        if key not in pruned:
+            continue
+        workload = restricted[app_name]["workloads"][workload_name]
+        experiments = workload["experiments"]
+        if key not in points:
+            del experiments[matrix.name]
+        else:
+            definition = experiments[matrix.name] = dict(experiments[matrix.name])
+            variables = dict(definition.get("variables") or {})
+            for name in points[key][0]:
+                variables[name] = [point[name] for point in points[key]]
+            definition["variables"] = variables
+            for section in ("zips", "matrix", "matrices"):
+                definition.pop(section, None)
+
+        if not experiments:
+            del restricted[app_name]["workloads"][workload_name]
+            if not restricted[app_name]["workloads"]:
+                del restricted[app_name]
+    return restricted
+
+
+def read_workspace(experiment_dir, system_dir):
+    """The ramble dict of the experiment description in ``experiment_dir``,
+    and the variables its experiments are expanded with on the system
+    described in ``system_dir``. The ramble dict must not be modified.
+    """
+    system_variables = pathlib.Path(system_dir) / "variables.yaml"
+    ramble = benchpark.yamlio.load(pathlib.Path(experiment_dir) / "ramble.yaml")
+
+    variables = {}
+    if system_variables.exists():
+        variables.update(benchpark.yamlio.load(system_variables)["variables"])
+    variables.update(ramble["ramble"].get("variables") or {})
+    return ramble, variables
+
+
+def summary(kept, dropped=()):
+    """A table of the instances and node-hours of each experiment, kept
+    (and dropped) to fit a budget.
+    """
+    experiments = {}
+    for column, estimates in enumerate((kept, dropped)):
+        for e in estimates:
+            key = f"{e.application} / {e.workload} / {e.experiment}"
+            experiments.setdefault(key, ([], []))[column].append(e)
+    experiments["total"] = (list(kept), list(dropped))
+
+    rows = [("experiment", "instances", "node-hours")]
+    for key, (k, d) in experiments.items():
+        if dropped:
+            rows.append(
+                (
+                    key,
+                    f"{len(k)} of {len(k) + len(d)}",
+                    f"{total(k):.1f} of {total(k) + total(d):.1f}",
+                )
+            )
+        else:
+            rows.append((key, str(len(k)), f"{total(k):.1f}"))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(2)]
+    lines = []
+    for row in rows:
+        cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+        lines.append("  ".join(cells + [row[2]]))
+    return "\n".join(lines)
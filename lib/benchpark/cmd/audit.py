@@ -8,34 +8,22 @@ import pathlib
 import re
 import sys
 
-import benchpark.paths
-import benchpark.repo
-
-# import benchpark.system as system
-from benchpark.runtime import RuntimeResources
-
-bootstrapper = RuntimeResources(benchpark.paths.benchpark_home)  # noqa
-bootstrapper.bootstrap()  # noqa
-
-import ramble.config as cfg  # noqa
-
-
-sys_repo = benchpark.repo.paths[benchpark.repo.ObjectTypes.systems]
-exp_repo = benchpark.repo.paths[benchpark.repo.ObjectTypes.experiments]
+import benchpark.repo_index
 
 
 def setup_parser(subparser):
     pass
 
 
-def audit_experiment(exp_cls):
+def audit_experiment(entry):
+    """Audit an experiment from its ``benchpark.repo_index`` entry"""
     required_methods = ["compute_applications_section", "compute_spack_section"]
 
     errors = list()
 
     for method in required_methods:
-        if method not in exp_cls.__dict__:
-            errors.append(f"{exp_cls.__name__} does not implement {method}")
+        if method not in entry["attributes"]:
+            errors.append(f"{entry['class_name']} does not implement {method}")
 
     return errors
 
@@ -49,8 +37,8 @@ def _find_yaml_files(d):
 
 
 # TODO: when .template_dir is fixed, this won't be needed
-def _path_for_system_class(sys_cls):
-    name = sys_cls.__name__
+def _path_for_system(entry):
+    name = entry["class_name"]
     component = ""
     components = []
     for letter in name:
@@ -63,16 +51,15 @@ def _path_for_system_class(sys_cls):
     if component:
         components.append(component)
     system_dirname = "-".join(x.lower() for x in components)
-    basedir = pathlib.Path(
-        sys_repo.filename_for_object_name(sys_cls.__name__)
-    ).parent.parent
+    basedir = pathlib.Path(entry["file"]).parent.parent
     assert basedir.exists()
     return basedir / system_dirname
 
 
-def audit_system(sys_cls):
+def audit_system(entry):
+    """Audit a system from its ``benchpark.repo_index`` entry"""
     errors = list()
-    basedir = _path_for_system_class(sys_cls)
+    basedir = _path_for_system(entry)
     externals = basedir / "externals"
     if externals.exists():
         for f in _find_yaml_files(externals):
@@ -91,15 +78,17 @@ def audit_system(sys_cls):
 
 
 def command(args):
+    # The index is read from the sources, so auditing never imports (or
+    # bootstraps Ramble for) the classes in the repos
+    exp_index = benchpark.repo_index.get("experiments")
+    sys_index = benchpark.repo_index.get("systems")
     all_errors = list()
 
-    for exp_name in exp_repo.all_object_names():
-        exp_cls = exp_repo.get_obj_class(exp_name)
-        all_errors.extend(audit_experiment(exp_cls))
+    for exp_name in exp_index.names():
+        all_errors.extend(audit_experiment(exp_index[exp_name]))
 
-    for sys_name in sys_repo.all_object_names():
-        sys_cls = sys_repo.get_obj_class(sys_name)
-        all_errors.extend(audit_system(sys_cls))
+    for sys_name in sys_index.names():
+        all_errors.extend(audit_system(sys_index[sys_name]))
 
     for error in all_errors:
         print(error)
@@ -0,0 +1,84 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import sys
+
+import benchpark.budget
+
+
+def add_budget_arguments(parser, strategy_option="--strategy"):
+    """Options to prune the experiments of a workspace to a budget, shared
+    with ``benchpark setup``.
+    """
+    parser.add_argument(
+        "--budget",
+        type=float,
+        metavar="NODE_HOURS",
+        help="drop experiment instances until the rest fit in this many node-hours",
+    )
+    parser.add_argument(
+        strategy_option,
+        dest="budget_strategy",
+        choices=list(benchpark.budget.strategies),
+        default="largest-first",
+        help="how to choose the instances to drop (default: largest-first): "
+        "the most expensive ones, or a subsample of each scale (number of nodes)",
+    )
+
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        "experiment",
+        help="an experiment description generated by `benchpark experiment init` "
+        "(or benchmark/ProgrammingModel)",
+    )
+    subparser.add_argument(
+        "system",
+        help="a system description generated by `benchpark system init` "
+        "(or a system ID)",
+    )
+    add_budget_arguments(subparser)
+    subparser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="list the instances that are dropped",
+    )
+
+
+def plan(ramble, variables, budget=None, strategy="largest-first"):
+    """The estimates of the instances of the experiments in ``ramble`` (a
+    ramble dict, expanded with ``variables``) kept and dropped to fit in
+    ``budget`` node-hours (none dropped without one).
+    """
+    applications = ramble["ramble"]["applications"]
+    estimates = list(benchpark.budget.estimate(applications, variables))
+    if budget is None:
+        return estimates, []
+
+    kept, dropped = benchpark.budget.prune(estimates, budget, strategy)
+    if not kept:
+        raise ValueError(f"No experiment instance fits in {budget} node-hours")
+    return kept, dropped
+
+
+def command(args):
+    # benchpark.cmd.setup uses this module
+    from benchpark.cmd.setup import benchpark_check_experiment, benchpark_check_system
+
+    _, experiment_dir = benchpark_check_experiment(args.experiment)
+    _, system_dir = benchpark_check_system(args.system)
+
+    ramble, variables = benchpark.budget.read_workspace(experiment_dir, system_dir)
+    try:
+        kept, dropped = plan(ramble, variables, args.budget, args.budget_strategy)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(benchpark.budget.summary(kept, dropped))
+    if args.verbose and dropped:
+        print("\nDropped:")
+        for e in dropped:
+            print(f"  {e.name} ({e.n_nodes} nodes, {e.node_hours:.1f} node-hours)")
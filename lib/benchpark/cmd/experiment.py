@@ -9,39 +9,219 @@ import os
 import shutil
 import sys
 
-import benchpark.experiment
-import benchpark.spec
-
 
 def experiment_init(args):
+    # Importing these bootstraps Ramble, so only do it when we need to
+    import benchpark.experiment
+    import benchpark.spec
+
+    if args.manifest:
+        return experiment_init_manifest(args)
+    if not args.spec:
+        raise ValueError("Must specify a spec or --manifest")
+    if args.all_variants:
+        return experiment_init_all(args)
+
     experiment_spec = benchpark.spec.ExperimentSpec(" ".join(args.spec)).concretize()
     experiment = experiment_spec.experiment
 
     if args.basedir:
         base = args.basedir
-        expdir = str(hash(experiment_spec))
+        expdir = experiment.experiment_uid()
         destdir = os.path.join(base, expdir)
     elif args.dest:
         destdir = args.dest
     else:
         raise ValueError("Must specify one of: --dest, --basedir")
 
+    if args.reconcile and os.path.isdir(destdir):
+        import benchpark.reconcile
+
+        changes = experiment.update_description(destdir)
+        print(f"Updated experiment description ({destdir})")
+        print(benchpark.reconcile.summary(changes))
+        return
+
     try:
-        os.mkdir(destdir)
-        experiment.write_ramble_dict(f"{destdir}/ramble.yaml")
+        # A directory named after the spec hash can only hold an older
+        # description of the same spec, which is safe to replace
+        generated = write_experiment(experiment, destdir, replace=bool(args.basedir))
     except FileExistsError:
         print(f"Abort: experiment description dir already exists ({destdir})")
         sys.exit(1)
+
+    if not generated:
+        print(f"Experiment description is up to date ({destdir})")
+
+
+def write_experiment(experiment, destdir, replace=False):
+    """Generate the description of ``experiment`` in ``destdir``, unless an
+    up-to-date one is already there (then return False).
+
+    If ``replace`` is set, an outdated description in ``destdir`` is
+    removed first; otherwise ``destdir`` must not exist.
+    """
+    if experiment.description_is_current(destdir):
+        return False
+    if replace and os.path.exists(destdir):
+        shutil.rmtree(destdir)
+
+    os.mkdir(destdir)
+    try:
+        experiment.generate_description(destdir)
     except Exception:
         # If there was a failure, remove any partially-generated resources
         shutil.rmtree(destdir)
         raise
+    return True
+
+
+def _init_from_string(spec_str, basedir, dest=None):
+    """Worker for ``experiment init --all-variants/--manifest``: specs are
+    passed as strings, which are cheaper to send to another process than
+    objects holding on to Ramble's classes.
+    """
+    import benchpark.spec
+
+    experiment = benchpark.spec.ExperimentSpec(spec_str).concretize().experiment
+    destdir = dest or os.path.join(basedir, experiment.experiment_uid())
+    if not write_experiment(experiment, destdir, replace=not dest):
+        return f"{destdir} (up to date)"
+    return destdir
+
+
+def _load_classes(spec_strs):
+    """Load the classes (and repo) for ``spec_strs`` before any worker is
+    forked, so that the workers inherit them. Specs that fail here fail
+    again (and are reported) in their worker.
+    """
+    import benchpark.spec
+
+    for spec_str in spec_strs:
+        try:
+            benchpark.spec.ExperimentSpec(spec_str).experiment_class
+        except Exception:
+            pass
+
+
+def _generate(tasks, jobs):
+    import benchpark.batch
+
+    results = benchpark.batch.run(_init_from_string, tasks, jobs)
+    if benchpark.batch.report(results, "experiments"):
+        sys.exit(1)
+
+
+def experiment_init_all(args):
+    """Generate an experiment under ``--basedir`` for every valid combination
+    of the variants that the spec leaves unset.
+    """
+    import benchpark.spec
+
+    if not args.basedir:
+        raise ValueError("--all-variants requires --basedir")
+    os.makedirs(args.basedir, exist_ok=True)
+
+    abstract_spec = benchpark.spec.ExperimentSpec(" ".join(args.spec))
+    # Load the class (and its repo) before any worker is forked
+    abstract_spec.experiment_class
+    spec_strs = [str(s) for s in benchpark.spec.all_concretizations(abstract_spec)]
+
+    _generate([(spec_str, args.basedir) for spec_str in spec_strs], args.jobs)
+
+
+def experiment_init_manifest(args):
+    """Generate an experiment for every spec in ``--manifest``, under
+    ``--basedir`` unless the manifest gives a ``dest`` for it.
+    """
+    import benchpark.batch
+
+    entries = benchpark.batch.read_manifest(args.manifest)
+    if not args.basedir and not all(dest for _, dest in entries):
+        raise ValueError("--manifest requires --basedir, unless every spec has a dest")
+    if args.basedir:
+        os.makedirs(args.basedir, exist_ok=True)
+
+    _load_classes(spec_str for spec_str, _ in entries)
+    _generate([(spec_str, args.basedir, dest) for spec_str, dest in entries], args.jobs)
+
+
+#: Up to this many points, ``experiment preview`` applies the exclusions of
+#: an experiment to count its instances even without ``--count``
+preview_count_limit = 100000
+
+
+def _print_table(rows, indent="  "):
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]) - 1)]
+    for row in rows:
+        cells = [cell.ljust(width) for cell, width in zip(row, widths)]
+        print(indent + "  ".join(cells + [row[-1]]))
+
+
+def _preview_experiment(matrix, limit, count_all):
+    import itertools
+
+    rows = [("n_nodes", "n_ranks", "n_gpus", "name")]
+    instances = iter(matrix)
+    for instance in itertools.islice(instances, limit):
+        resources = ["-" if value is None else value for value in instance.resources()]
+        rows.append((*resources, instance.name))
+    shown = len(rows) - 1
+
+    count = None
+    if not matrix.has_exclusions:
+        count = matrix.size
+        print(f"  {count} instances")
+    elif count_all or matrix.size <= preview_count_limit:
+        count = shown + sum(1 for _ in instances)
+        print(f"  {count} instances ({matrix.size} before exclusions)")
+    else:
+        print(f"  {matrix.size} instances before exclusions (--count to apply them)")
+
+    if shown:
+        _print_table(rows)
+    if count is None or shown < count:
+        print("  ... (--limit to show more)")
+    if matrix.undecided:
+        undefined = ", ".join(sorted(matrix.undefined))
+        print(
+            f"  {matrix.undecided} instances kept: cannot evaluate exclusions "
+            f"without {undefined} (see --system and --var)"
+        )
+
+
+def experiment_preview(args):
+    """Expand the experiments of a spec into their instances, as Ramble
+    would, without generating anything.
+    """
+    import benchpark.expansion
+    import benchpark.spec
+    import benchpark.yamlio
+
+    variables = {}
+    if args.system:
+        system_variables = os.path.join(args.system, "variables.yaml")
+        variables.update(benchpark.yamlio.load(system_variables)["variables"])
+    for assignment in args.var:
+        name, sep, value = assignment.partition("=")
+        if not sep:
+            raise ValueError(f"--var expects NAME=VALUE, not '{assignment}'")
+        variables[name] = value
+
+    experiment_spec = benchpark.spec.ExperimentSpec(" ".join(args.spec)).concretize()
+    print(experiment_spec)
+    applications = experiment_spec.experiment.compute_applications_section()
+    for app_name, workload_name, matrix in benchpark.expansion.application_matrices(
+        applications, variables
+    ):
+        print(f"\n{app_name} / {workload_name} / {matrix.name}")
+        _preview_experiment(matrix, args.limit, args.count)
 
 
 def experiment_list(args):
-    experiments = benchpark.repo.all_object_names(
-        benchpark.repo.ObjectTypes.experiments
-    )
+    import benchpark.repo_index
+
+    experiments = benchpark.repo_index.get("experiments").names()
     # TODO: prettier printing
     print("    ".join(experiments))
 
@@ -55,7 +235,63 @@ def setup_parser(root_parser):
         "--basedir", help="Generate a system dir under this, and place all files there"
     )
 
-    init_parser.add_argument("spec", nargs="+", help="Experiment spec")
+    init_parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="if the description dir already exists, update it in place "
+        "(rewriting only the files that changed) and report which experiment "
+        "instances were added, removed or invalidated",
+    )
+    init_parser.add_argument(
+        "--all-variants",
+        action="store_true",
+        help="generate one experiment (under --basedir) for every valid "
+        "combination of the variants the spec does not set",
+    )
+    init_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of experiments to generate at once with --all-variants "
+        "or --manifest",
+    )
+    init_parser.add_argument(
+        "--manifest",
+        help="generate an experiment for each spec listed in this YAML file",
+    )
+
+    init_parser.add_argument("spec", nargs="*", help="Experiment spec")
+
+    preview_parser = system_subparser.add_parser(
+        "preview",
+        help="show the instances the experiments of a spec expand to",
+    )
+    preview_parser.add_argument(
+        "--system",
+        help="a generated system description, whose variables are used "
+        "(e.g. in exclusions)",
+    )
+    preview_parser.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="define a variable (can be repeated)",
+    )
+    preview_parser.add_argument(
+        "--limit",
+        type=int,
+        default=10,
+        help="number of instances to show per experiment (default: 10)",
+    )
+    preview_parser.add_argument(
+        "--count",
+        action="store_true",
+        help="count the instances left after exclusions, however many points "
+        "an experiment has",
+    )
+    preview_parser.add_argument("spec", nargs="+", help="Experiment spec")
 
     system_subparser.add_parser("list")
 
@@ -64,6 +300,7 @@ def command(args):
     actions = {
         "init": experiment_init,
         "list": experiment_list,
+        "preview": experiment_preview,
     }
     if args.experiment_subcommand in actions:
         actions[args.experiment_subcommand](args)
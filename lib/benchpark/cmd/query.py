@@ -0,0 +1,76 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+import benchpark.yamlio
+
+#: The file that identifies each kind of generated description, as written
+#: by Experiment.generate_description and System.generate_description
+id_files = {"experiment": "experiment_id.yaml", "system": "system_id.yaml"}
+
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        "--dir",
+        dest="dirs",
+        action="append",
+        help="directory to search for generated experiments and systems "
+        "(default: the current directory); can be given more than once",
+    )
+    subparser.add_argument(
+        "-t", "--type", choices=list(id_files), help="only consider this kind of spec"
+    )
+    subparser.add_argument(
+        "--intersects",
+        action="store_true",
+        help="show specs that are compatible with the query, rather than "
+        "those that satisfy it",
+    )
+    subparser.add_argument(
+        "spec", nargs="+", help="spec to match, e.g. 'programming_model=cuda'"
+    )
+
+
+def find_descriptions(dirs, kinds=tuple(id_files)):
+    """Yield ``(kind, directory, spec string)`` for each experiment or system
+    description generated under ``dirs``.
+    """
+    for d in dirs:
+        for root, _, files in os.walk(d):
+            for kind in kinds:
+                if id_files[kind] not in files:
+                    continue
+                path = os.path.join(root, id_files[kind])
+                description_id = benchpark.yamlio.load(path)
+                yield kind, root, str(description_id[kind]["spec"])
+
+
+def command(args):
+    # Importing this bootstraps Ramble, so only do it when we need to
+    import benchpark.spec
+    from benchpark.spec_index import SpecIndex
+
+    kinds = [args.type] if args.type else list(id_files)
+    descriptions = list(find_descriptions(args.dirs or [os.getcwd()], kinds))
+
+    def _load(directory, spec_str):
+        # Only the variants matter here, so a spec that was concretized
+        # against an older repo is good enough
+        spec_json = os.path.join(directory, "spec.json")
+        if os.path.exists(spec_json):
+            return benchpark.spec.load_concrete_spec(spec_json, check_repo=False)
+        return benchpark.spec.Spec(spec_str)
+
+    index = SpecIndex(_load(d, spec) for _, d, spec in descriptions)
+    query = benchpark.spec.Spec(" ".join(args.spec))
+    if args.intersects:
+        mask = index.intersects_mask(query)
+    else:
+        mask = index.satisfies_mask(query)
+
+    for i in index.positions(mask):
+        kind, directory, spec = descriptions[i]
+        print(f"{kind:10}  {spec}\n            {directory}")
@@ -0,0 +1,34 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import benchpark.paths
+
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        "--socket",
+        default=str(benchpark.paths.server_socket),
+        help=f"Unix socket to listen on (default: {benchpark.paths.server_socket})",
+    )
+    subparser.add_argument(
+        "--no-warm-up",
+        action="store_true",
+        help="load the Experiment/System repos on the first request rather "
+        "than at startup",
+    )
+    subparser.add_argument(
+        "--stop", action="store_true", help="stop the server listening on --socket"
+    )
+
+
+def command(args):
+    import benchpark.server
+
+    if args.stop:
+        benchpark.server.send(args.socket, {"shutdown": True})
+        return
+
+    benchpark.paths.benchpark_home.mkdir(parents=True, exist_ok=True)
+    benchpark.server.serve(args.socket, warm_up=not args.no_warm_up)
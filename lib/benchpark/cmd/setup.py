@@ -5,21 +5,26 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import hashlib
 import os
 import pathlib
 import shutil
 import sys
 
-import yaml
-
+import benchpark.budget
 import benchpark.paths
+import benchpark.reconcile
 from benchpark.accounting import (
     benchpark_experiments,
     benchpark_modifiers,
     benchpark_systems,
 )
+from benchpark.cmd.budget import add_budget_arguments, plan
 from benchpark.debug import debug_print
-from benchpark.runtime import RuntimeResources
+from benchpark.runtime import RuntimeResources, run_parallel
+from benchpark.site_config import SiteConfig
+import benchpark.timing
+import benchpark.yamlio
 
 
 # Note: it would be nice to vendor spack.llnl.util.link_tree, but that
@@ -45,6 +50,47 @@ def symlink_tree(src, dst, include_fn=None):
             os.symlink(src_file, dst_symlink)
 
 
+def include_config(fname):
+    """Whether ``symlink_tree`` links ``fname`` into a workspace's configs"""
+    # Only .yaml files, and never those that start with "."
+    return fname.endswith(".yaml") and not fname.startswith(".")
+
+
+def config_inputs(sources, modifier):
+    """The inputs of a workspace besides its ramble.yaml and the system's
+    variables.yaml (which are compared by content): the modifier, and the
+    SHA-256 of each other config file, by where it is linked in the
+    workspace's configs. ``sources`` are ``(source dir, destination dir)``
+    pairs as given to ``symlink_tree`` and single ``(file, destination)``
+    pairs.
+    """
+    inputs = {"modifier": modifier}
+    for src, dst in sources:
+        src = pathlib.Path(src)
+        if src.is_file():
+            files = [(src, pathlib.Path(dst))]
+        else:
+            files = [
+                (pathlib.Path(d) / f, pathlib.Path(dst) / os.path.relpath(d, src) / f)
+                for d, _, names in os.walk(src)
+                for f in names
+                if include_config(f)
+            ]
+        for path, linked in files:
+            linked = linked.as_posix()
+            if linked in ("ramble.yaml", "variables.yaml"):
+                continue
+            with open(path, "rb") as f:
+                inputs[f"configs/{linked}"] = hashlib.sha256(f.read()).hexdigest()
+    return inputs
+
+
+#: Where ``benchpark setup`` keeps a copy of the ramble.yaml and system
+#: variables.yaml it set a workspace up with, and its other inputs (see
+#: ``config_inputs``), to reconcile the workspace with them later
+setup_state_dir = "setup-state"
+
+
 def setup_parser(root_parser):
     root_parser.add_argument(
         "experiment",
@@ -65,6 +111,14 @@ def setup_parser(root_parser):
         default="none",
         help="The modifier to apply to the experiment (default none)",
     )
+    add_budget_arguments(root_parser, strategy_option="--budget-strategy")
+    root_parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="keep an existing workspace, and only remove the run directories "
+        "of the experiment instances that were removed or changed since it was "
+        "last set up (by default, the workspace is cleared)",
+    )
 
 
 def benchpark_check_experiment(arg_str):
@@ -98,8 +152,7 @@ def benchpark_check_system(arg_str):
     if cfg_path.is_dir():
         system_id_path = cfg_path / "system_id.yaml"
         if system_id_path.exists():
-            with open(system_id_path, "r") as f:
-                data = yaml.safe_load(f)
+            data = benchpark.yamlio.load(system_id_path)
             name = data["system"]["name"]
             spec_hash = data["system"]["config-hash"]
             system_id = f"{name}-{spec_hash[:7]}"
@@ -131,6 +184,49 @@ def benchpark_check_modifier(arg_str):
     return found
 
 
+def reconcile_workspace(workspace_dir, ramble, variables, inputs):
+    """Prepare an existing workspace to be set up again with the ramble dict
+    ``ramble`` (the contents of its ``ramble`` key), ``variables`` and other
+    ``inputs`` (see ``config_inputs``). Only its configs and the run
+    directories of the experiment instances that were removed or invalidated
+    since the last setup are deleted, so builds, environments and other
+    results are kept. Return the ``Changes`` (None if the last setup left no
+    record).
+    """
+    workspace_dir = pathlib.Path(workspace_dir)
+    ramble_workspace_dir = workspace_dir / "workspace"
+    experiments_dir = ramble_workspace_dir / "experiments"
+    state_dir = workspace_dir / setup_state_dir
+
+    changes = None
+    print(f"Reconciling existing workspace {workspace_dir}")
+    if (state_dir / "ramble.yaml").exists():
+        old_ramble, old_variables = benchpark.budget.read_workspace(
+            state_dir, state_dir
+        )
+        old_inputs = {}
+        if (state_dir / "inputs.yaml").exists():
+            old_inputs = benchpark.yamlio.load(state_dir / "inputs.yaml")
+        changes = benchpark.reconcile.diff(
+            old_ramble["ramble"],
+            ramble,
+            old_variables,
+            variables,
+            benchpark.reconcile.changed_keys(old_inputs, inputs),
+        )
+        print(benchpark.reconcile.summary(changes))
+        for key in changes.removed + changes.invalidated:
+            run_dir = experiments_dir.joinpath(*key)
+            if run_dir.is_dir():
+                shutil.rmtree(run_dir)
+    else:
+        print("It was set up without a record: clearing its experiments")
+        shutil.rmtree(experiments_dir, ignore_errors=True)
+
+    shutil.rmtree(ramble_workspace_dir / "configs", ignore_errors=True)
+    return changes
+
+
 def command(args):
     """
     experiments_root/
@@ -155,19 +251,63 @@ def command(args):
     debug_print(f"specified modifier = {modifier}")
     benchpark_check_modifier(modifier)
 
+    # Read once, and only if needed
+    ramble = variables = None
+    if args.budget is not None or args.reconcile:
+        ramble, variables = benchpark.budget.read_workspace(
+            experiment_src_dir, configs_src_dir
+        )
+    dropped = []
+    if args.budget is not None:
+        # Before anything is cleared, in case nothing fits
+        try:
+            kept, dropped = plan(ramble, variables, args.budget, args.budget_strategy)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(benchpark.budget.summary(kept, dropped))
+        if dropped:
+            applications = benchpark.budget.restrict(
+                ramble["ramble"]["applications"], kept, dropped
+            )
+            ramble = {"ramble": dict(ramble["ramble"], applications=applications)}
+
+    modifier_config_dir = source_dir / "modifiers" / modifier / "configs"
+    template_name = "execute_experiment.tpl"
+    experiment_template_options = [
+        configs_src_dir / template_name,
+        experiment_src_dir / template_name,
+        source_dir / "common-resources" / template_name,
+    ]
+    for choice_template in experiment_template_options:
+        if os.path.exists(choice_template):
+            break
+    # Where each source of configs goes, relative to the workspace's configs
+    config_sources = [
+        (configs_src_dir, "."),
+        (experiment_src_dir, "."),
+        (modifier_config_dir, "."),
+        (source_dir / "configs" / "common", "auxiliary_software_files"),
+    ]
+    inputs = config_inputs(
+        config_sources + [(choice_template, template_name)], modifier
+    )
+
     workspace_dir = experiments_root / str(experiment_id) / str(system_id)
 
     if workspace_dir.exists():
-        if workspace_dir.is_dir():
-            print(f"Clearing existing workspace {workspace_dir}")
-            shutil.rmtree(workspace_dir)
-        else:
+        if not workspace_dir.is_dir():
             print(
                 f"Benchpark expects to manage {workspace_dir} as a directory, but it is not"
             )
             sys.exit(1)
+        elif args.reconcile:
+            reconcile_workspace(workspace_dir, ramble["ramble"], variables, inputs)
+        else:
+            print(f"Clearing existing workspace {workspace_dir}")
+            shutil.rmtree(workspace_dir)
 
-    workspace_dir.mkdir(parents=True)
+    workspace_dir.mkdir(parents=True, exist_ok=True)
 
     ramble_workspace_dir = workspace_dir / "workspace"
     ramble_configs_dir = ramble_workspace_dir / "configs"
@@ -178,58 +318,65 @@ def command(args):
 
     print(f"Setting up configs for Ramble workspace {ramble_configs_dir}")
 
-    modifier_config_dir = source_dir / "modifiers" / modifier / "configs"
     ramble_configs_dir.mkdir(parents=True)
-    ramble_logs_dir.mkdir(parents=True)
+    ramble_logs_dir.mkdir(parents=True, exist_ok=True)
     ramble_spack_experiment_configs_dir.mkdir(parents=True)
 
-    def include_fn(fname):
-        # Only include .yaml files
-        # Always exclude files that start with "."
-        if fname.startswith("."):
-            return False
-        if fname.endswith(".yaml"):
-            return True
-        return False
-
-    symlink_tree(configs_src_dir, ramble_configs_dir, include_fn)
-    symlink_tree(experiment_src_dir, ramble_configs_dir, include_fn)
-    symlink_tree(modifier_config_dir, ramble_configs_dir, include_fn)
-    symlink_tree(
-        source_dir / "configs" / "common",
-        ramble_spack_experiment_configs_dir,
-        include_fn,
-    )
+    with benchpark.timing.span("symlink configs"):
+        for src, dst in config_sources:
+            symlink_tree(src, ramble_configs_dir / dst, include_config)
+
+    if dropped:
+        # Only the instances that were kept are ever set up and submitted
+        ramble_yaml = ramble_configs_dir / "ramble.yaml"
+        ramble_yaml.unlink()
+        benchpark.yamlio.write(ramble_yaml, ramble)
 
-    template_name = "execute_experiment.tpl"
-    experiment_template_options = [
-        configs_src_dir / template_name,
-        experiment_src_dir / template_name,
-        source_dir / "common-resources" / template_name,
-    ]
-    for choice_template in experiment_template_options:
-        if os.path.exists(choice_template):
-            break
     os.symlink(
         choice_template,
-        ramble_configs_dir / "execute_experiment.tpl",
+        ramble_configs_dir / template_name,
     )
 
+    # Copied as they are, without being read
+    state_dir = workspace_dir / setup_state_dir
+    shutil.rmtree(state_dir, ignore_errors=True)
+    state_dir.mkdir()
+    shutil.copyfile(ramble_configs_dir / "ramble.yaml", state_dir / "ramble.yaml")
+    if (configs_src_dir / "variables.yaml").exists():
+        shutil.copyfile(
+            configs_src_dir / "variables.yaml", state_dir / "variables.yaml"
+        )
+    benchpark.yamlio.write(state_dir / "inputs.yaml", inputs)
+
     initializer_script = experiments_root / "setup.sh"
 
     per_workspace_setup = RuntimeResources(experiments_root)
 
-    spack, first_time_spack = per_workspace_setup.spack_first_time_setup()
-    ramble, first_time_ramble = per_workspace_setup.ramble_first_time_setup()
-
-    if first_time_spack:
-        spack("repo", "add", "--scope=site", f"{source_dir}/repo")
+    # Spack and Ramble do not depend on each other, so they are cloned and
+    # configured concurrently. Their site configs are written directly
+    # rather than through (slow to start) "config add" commands.
+    def setup_spack():
+        spack, first_time_spack = per_workspace_setup.spack_first_time_setup()
+        if first_time_spack:
+            spack_config = SiteConfig(
+                "spack", per_workspace_setup.spack_location, spack
+            )
+            spack_config.add_repo(f"{source_dir}/repo")
+            spack_config.write()
+
+    def setup_ramble():
+        ramble, first_time_ramble = per_workspace_setup.ramble_first_time_setup()
+        if first_time_ramble:
+            ramble_config = SiteConfig(
+                "ramble", per_workspace_setup.ramble_location, ramble
+            )
+            ramble_config.add_repo(f"{source_dir}/repo")
+            ramble_config.set("config:disable_progress_bar", True)
+            ramble_config.add_repo(f"{source_dir}/modifiers", section="modifier_repos")
+            ramble_config.set("config:spack:global:args", "-d")
+            ramble_config.write()
 
-    if first_time_ramble:
-        ramble(f"repo add --scope=site {source_dir}/repo")
-        ramble('config --scope=site add "config:disable_progress_bar:true"')
-        ramble(f"repo add -t modifiers --scope=site {source_dir}/modifiers")
-        ramble("config --scope=site add \"config:spack:global:args:'-d'\"")
+    run_parallel({"spack": setup_spack, "ramble": setup_ramble}, title="Setting up")
 
     if not initializer_script.exists():
         with open(initializer_script, "w") as f:
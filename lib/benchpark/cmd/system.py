@@ -9,11 +9,17 @@ import os
 import shutil
 import sys
 
-import benchpark.system
-import benchpark.spec
-
 
 def system_init(args):
+    # Importing these bootstraps Ramble, so only do it when we need to
+    import benchpark.system
+    import benchpark.spec
+
+    if args.manifest:
+        return system_init_manifest(args)
+    if not args.spec:
+        raise ValueError("Must specify a spec or --manifest")
+
     system_spec = benchpark.spec.SystemSpec(" ".join(args.spec))
     system_spec = system_spec.concretize()
 
@@ -30,17 +36,63 @@ def system_init(args):
         raise ValueError("Must specify one of: --dest, --basedir")
 
     try:
-        os.mkdir(destdir)
-        system.generate_description(destdir)
+        write_system(system, destdir)
     except FileExistsError:
         print(f"Abort: system description dir already exists ({destdir})")
         sys.exit(1)
+
+
+def write_system(system, destdir):
+    """Generate the description of ``system`` in ``destdir``, which must not
+    exist yet.
+    """
+    os.mkdir(destdir)
+    try:
+        system.generate_description(destdir)
     except Exception:
         # If there was a failure, remove any partially-generated resources
         shutil.rmtree(destdir)
         raise
 
 
+def _init_from_string(spec_str, basedir, dest=None):
+    """Worker for ``system init --manifest`` (see ``benchpark.batch``)."""
+    import benchpark.spec
+
+    system = benchpark.spec.SystemSpec(spec_str).concretize().system
+    system.initialize()
+    destdir = dest or os.path.join(basedir, system.system_uid())
+    write_system(system, destdir)
+    return destdir
+
+
+def system_init_manifest(args):
+    """Generate a system for every spec in ``--manifest``, under
+    ``--basedir`` unless the manifest gives a ``dest`` for it.
+    """
+    import benchpark.batch
+    import benchpark.spec
+
+    entries = benchpark.batch.read_manifest(args.manifest)
+    if not args.basedir and not all(dest for _, dest in entries):
+        raise ValueError("--manifest requires --basedir, unless every spec has a dest")
+    if args.basedir:
+        os.makedirs(args.basedir, exist_ok=True)
+
+    # Load the classes (and repo) before any worker is forked; specs that
+    # fail here fail again (and are reported) in their worker
+    for spec_str, _ in entries:
+        try:
+            benchpark.spec.SystemSpec(spec_str).system_class
+        except Exception:
+            pass
+
+    tasks = [(spec_str, args.basedir, dest) for spec_str, dest in entries]
+    results = benchpark.batch.run(_init_from_string, tasks, args.jobs)
+    if benchpark.batch.report(results, "systems"):
+        sys.exit(1)
+
+
 def system_list(args):
     raise NotImplementedError("'benchpark system list' is not available")
 
@@ -54,7 +106,19 @@ def setup_parser(root_parser):
         "--basedir", help="Generate a system dir under this, and place all files there"
     )
 
-    init_parser.add_argument("spec", nargs="+", help="System spec")
+    init_parser.add_argument(
+        "--manifest",
+        help="generate a system for each spec listed in this YAML file",
+    )
+    init_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of systems to generate at once with --manifest",
+    )
+
+    init_parser.add_argument("spec", nargs="*", help="System spec")
 
     system_subparser.add_parser("list")
 
@@ -5,16 +5,12 @@
 import argparse
 import collections
 import io
-import pytest
 import os
 import re
 import sys
 
-import llnl.util.filesystem
-import llnl.util.tty.color as color
-import llnl.util.tty.colify as colify
-
 import benchpark.paths
+import benchpark.runtime
 
 
 def setup_parser(subparser):
@@ -99,6 +95,10 @@ def setup_parser(subparser):
 
 def do_list(args, extra_args):
     """Print a lists of tests than what pytest offers."""
+    import llnl.util.filesystem
+    import llnl.util.tty.color as color
+    import llnl.util.tty.colify as colify
+    import pytest
 
     def colorize(c, prefix):
         if isinstance(prefix, tuple):
@@ -202,7 +202,11 @@ def add_back_pytest_args(args, unknown_args):
 
 
 def command(args, unknown_args):
-    global pytest
+    # pytest and the llnl utilities (vendored by Ramble) are only needed
+    # once we actually run the tests
+    benchpark.runtime.bootstrap()
+    import llnl.util.filesystem
+    import pytest
 
     if args.pytest_help:
         # make the pytest.main help output more accurate
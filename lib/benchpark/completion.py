@@ -0,0 +1,205 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Shell completion for ``benchpark``.
+
+The completion scripts in ``share/benchpark`` run ``benchpark _complete
+<line>``, which ``bin/benchpark`` hands straight to ``main()`` here without
+loading the rest of benchpark. Completions come from two caches in
+``~/.benchpark/cache``, so answering takes a few milliseconds and never
+bootstraps Ramble:
+
+* the subcommands and options of the command line, built once from the
+  argument parser and rebuilt when the sources defining it change, and
+* the variants of every experiment and system, from ``benchpark.repo_index``.
+"""
+
+import json
+import os
+import shlex
+
+import benchpark.paths
+import benchpark.repo_index
+
+#: Bump when the format of the cached command line description changes
+cli_cache_version = 1
+
+#: Subcommands whose positional arguments are a spec, and the repo that
+#: defines the objects the spec can name
+spec_commands = {
+    ("experiment", "init"): "experiments",
+    ("experiment", "preview"): "experiments",
+    ("system", "init"): "systems",
+}
+
+
+def _cli_cache_file():
+    return benchpark.paths.cache_path / "completion-cli.json"
+
+
+def _cli_sources():
+    """Stamp of the sources that define the command line."""
+    sources = [benchpark.paths.benchpark_root / "lib" / "main.py"]
+    sources.extend(sorted((benchpark.paths.lib_path / "cmd").glob("*.py")))
+    return {str(path): path.stat().st_mtime_ns for path in sources}
+
+
+def describe_parser(parser):
+    """The options (mapped to whether they take a value) and subcommands of
+    an ``argparse`` parser, recursively.
+    """
+    import argparse
+
+    description = {"options": {}, "subcommands": {}}
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            for name, subparser in action.choices.items():
+                description["subcommands"][name] = describe_parser(subparser)
+        for option in action.option_strings:
+            description["options"][option] = action.nargs != 0
+    return description
+
+
+def cli_description():
+    """The description of the ``benchpark`` command line (see
+    ``describe_parser``), from the cache if it is up to date.
+    """
+    sources = _cli_sources()
+    cache_file = _cli_cache_file()
+    try:
+        with open(cache_file) as f:
+            data = json.load(f)
+        if data["version"] == cli_cache_version and data["sources"] == sources:
+            return data["cli"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # Building the full parser imports every command module, which is what
+    # the cache is there to avoid
+    import main
+
+    cli = describe_parser(main.make_parser({}, list(main.commands)))
+    data = {"version": cli_cache_version, "sources": sources, "cli": cli}
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_name(f".{cache_file.name}.{os.getpid()}")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, cache_file)
+    return cli
+
+
+def _matching(candidates, partial):
+    return [c for c in candidates if c.startswith(partial)]
+
+
+def variant_values(declarations):
+    """Values a variant can be set to on the command line, given its
+    declarations in the repo index (a variant can be declared once for
+    each when-condition).
+    """
+    values = []
+    for declaration in declarations:
+        allowed = declaration["values"]
+        if allowed is None:
+            # Any value is allowed: only the default can be suggested
+            allowed = [declaration["default"]]
+        for value in allowed:
+            value = str(value).lower() if isinstance(value, bool) else str(value)
+            if value not in values:
+                values.append(value)
+    return values
+
+
+def complete_spec(object_type, words, partial):
+    """Candidates for ``partial``, the next word of a spec after ``words``:
+    the object name, a variant name or a variant value.
+    """
+    index = benchpark.repo_index.get(object_type)
+    spec_words = " ".join(words).split()
+    names = [w.split(".")[-1] for w in spec_words if w.split(".")[-1] in index]
+    if not names:
+        return [] if "=" in partial else _matching(index.names(), partial)
+
+    declarations = {}
+    for declaration in index.variants(names[0]):
+        declarations.setdefault(declaration["name"], []).append(declaration)
+
+    if "=" in partial:
+        name, value = partial.split("=", 1)
+        if name not in declarations:
+            return []
+        values = variant_values(declarations[name])
+        return [f"{name}={v}" for v in _matching(values, value)]
+
+    already_set = {w.split("=", 1)[0] for w in spec_words if "=" in w}
+    return [
+        f"{name}="
+        for name in _matching(declarations, partial)
+        if name not in already_set
+    ]
+
+
+def complete(words):
+    """Candidates for the last of ``words``, the arguments after
+    ``benchpark`` on the command line (the last one being the word under
+    the cursor, possibly empty).
+    """
+    *done, partial = words or [""]
+
+    node = cli_description()
+    path = []
+    positionals = []
+    takes_value = False
+    for word in done:
+        if takes_value:
+            takes_value = False
+        elif word.startswith("-"):
+            takes_value = node["options"].get(word, False)
+        elif not positionals and word in node["subcommands"]:
+            node = node["subcommands"][word]
+            path.append(word)
+        else:
+            positionals.append(word)
+
+    if takes_value:
+        # Leave option values (mostly paths) to the shell
+        return []
+    if partial.startswith("-"):
+        return _matching(node["options"], partial)
+
+    object_type = spec_commands.get(tuple(path))
+    if object_type:
+        return complete_spec(object_type, positionals, partial)
+    if not positionals:
+        return _matching(node["subcommands"], partial)
+    return []
+
+
+def split_line(line):
+    """Split a (partial) command line into words, the last of which is the
+    word being completed (empty if the line ends with a space).
+    """
+    for closing in ("", '"', "'"):
+        try:
+            words = shlex.split(line + closing)
+            break
+        except ValueError:
+            continue
+    else:
+        words = line.split()
+
+    if not line or line[-1].isspace():
+        words.append("")
+    return words
+
+
+def main(argv):
+    """Print the completions of the command line in ``argv[0]`` (up to the
+    cursor), one per line.
+    """
+    words = split_line(argv[0] if argv else "")
+    for candidate in complete(words[1:]):
+        print(candidate)
+    return 0
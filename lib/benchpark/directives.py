@@ -101,7 +101,7 @@ def _make_when_spec(
         return benchpark.spec.Spec()
 
     # This is conditional on the spec
-    return benchpark.spec.Spec(value)
+    return benchpark.spec.parse_spec(benchpark.spec.Spec, value)
 
 
 @benchpark_directive("variants")
@@ -0,0 +1,367 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Expansion of the experiments in a Ramble applications section.
+
+Ramble only expands an experiment into its instances at ``ramble workspace
+setup``. This does the same expansion ahead of time, following Ramble's
+rules:
+
+* Variables whose value is a list are vectors. ``zips`` group vectors of the
+  same length, which are then iterated together.
+* Each entry of ``matrix``/``matrices`` is the cross product of the vectors
+  and zips it names. Several matrices are iterated together, so they must
+  have the same size.
+* Vectors and zips that no matrix uses are iterated together, and crossed
+  with the matrices.
+* ``exclude`` removes instances, either by ``where`` expressions or by
+  ``variables``, ``zips`` and ``matrices`` defined like the experiment's.
+* ``{name}`` in a value is replaced by the (expanded) value of the variable
+  ``name``, and a value that uses other variables is evaluated if it is
+  arithmetic (e.g. ``{n_nodes}*{processes_per_node}``).
+
+Instances are generated lazily: an experiment is counted (``size``) and
+walked without materializing its points, however many there are.
+"""
+
+import ast
+import collections
+import math
+import operator
+import re
+
+#: ``{name}`` references in a value (``\\{`` is a literal brace)
+_reference = re.compile(r"(?<!\\)\{([^{}]+)\}")
+
+#: Variables describing the resources an instance uses
+resource_variables = ("n_nodes", "n_ranks", "n_gpus")
+
+_operators = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+#: Functions that expressions can call (e.g. ``int({sys_cores_per_node} / 6)``)
+_functions = {
+    "abs": abs,
+    "ceil": math.ceil,
+    "float": float,
+    "floor": math.floor,
+    "int": int,
+    "max": max,
+    "min": min,
+}
+
+
+def _evaluate(node):
+    if isinstance(node, ast.Constant) and isinstance(
+        node.value, (int, float, str, bool)
+    ):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _operators:
+        return _operators[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _operators:
+        return _operators[type(node.op)](_evaluate(node.operand))
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in _functions
+        and not node.keywords
+    ):
+        return _functions[node.func.id](*(_evaluate(arg) for arg in node.args))
+    if isinstance(node, ast.BoolOp):
+        values = (_evaluate(value) for value in node.values)
+        return all(values) if isinstance(node.op, ast.And) else any(values)
+    if isinstance(node, ast.Compare):
+        left = _evaluate(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _operators:
+                break
+            right = _evaluate(comparator)
+            if not _operators[type(op)](left, right):
+                return False
+            left = right
+        else:
+            return True
+    raise ValueError(f"not a supported expression: {ast.dump(node)}")
+
+
+def evaluate(expression):
+    """Value of an arithmetic, comparison or boolean ``expression`` over
+    literals, which may call the functions in ``_functions``. Raise
+    ValueError for anything else (e.g. a name).
+    """
+    try:
+        node = ast.parse(expression.strip(), mode="eval").body
+    except SyntaxError:
+        raise ValueError(f"not an expression: {expression}")
+    return _evaluate(node)
+
+
+def _format(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+class Instance:
+    """One point of an experiment: the values of its variables, expanded on
+    demand.
+    """
+
+    def __init__(self, variables, name=None, point=None):
+        self._raw = variables
+        self._expanded = {}
+        #: The rendered name of the experiment
+        self.name = name
+        #: The values of the experiment's list variables at this instance
+        self.point = point or {}
+
+    def __contains__(self, name):
+        return name in self._raw
+
+    def get(self, name, default=None):
+        """The expanded value of variable ``name`` (``default`` if it is not
+        defined)."""
+        if name not in self._raw:
+            return default
+        if name not in self._expanded:
+            # Guards against variables that refer to themselves
+            self._expanded[name] = f"{{{name}}}"
+            raw = _format(self._raw[name])
+            value = self.expand(raw)
+            if value != raw and not _reference.search(value):
+                try:
+                    value = _format(evaluate(value))
+                except (ValueError, TypeError, ArithmeticError):
+                    pass
+            self._expanded[name] = value
+        return self._expanded[name]
+
+    def values(self):
+        """The expanded values of all the variables, by name."""
+        return {name: self.get(name) for name in self._raw}
+
+    def expand(self, text):
+        """``text`` with every ``{name}`` of a defined variable replaced by
+        its value. References to undefined variables are left as they are.
+        """
+
+        def _replace(match):
+            return self.get(match.group(1), match.group(0))
+
+        return _reference.sub(_replace, text)
+
+    def resources(self):
+        """The number of nodes, ranks and GPUs (as strings, None where
+        unknown). ``n_ranks`` and ``n_nodes`` are derived from each other
+        through ``processes_per_node``, like Ramble's allocation modifier.
+        """
+        n_nodes, n_ranks, n_gpus = (self.get(name) for name in resource_variables)
+        try:
+            ppn = int(self.get("processes_per_node"))
+            if n_ranks is None and n_nodes is not None:
+                n_ranks = str(int(n_nodes) * ppn)
+            elif n_nodes is None and n_ranks is not None:
+                n_nodes = str(math.ceil(int(n_ranks) / ppn))
+        except (TypeError, ValueError, ZeroDivisionError):
+            pass
+        return n_nodes, n_ranks, n_gpus
+
+    def undefined(self, text):
+        """Names of the undefined variables ``text`` refers to."""
+        return sorted(set(_reference.findall(self.expand(text))))
+
+
+#: A dimension of an experiment: the variables it sets, and their values at
+#: each of its points (a tuple of values per point)
+_Axis = collections.namedtuple("_Axis", ["names", "points"])
+
+
+def _axes(variables, zips):
+    """The axes of the zips and of the list variables not in a zip, by name"""
+    axes = {}
+    zipped = set()
+    for zip_name, members in zips.items():
+        columns = []
+        for member in members:
+            values = variables.get(member)
+            if not isinstance(values, list):
+                raise ValueError(f"zip '{zip_name}': '{member}' is not a list")
+            columns.append(values)
+        if len(set(len(c) for c in columns)) > 1:
+            raise ValueError(f"zip '{zip_name}': its variables differ in length")
+        axes[zip_name] = _Axis(tuple(members), list(zip(*columns)))
+        zipped.update(members)
+
+    for name, values in variables.items():
+        if isinstance(values, list) and name not in zipped:
+            axes[name] = _Axis((name,), [(value,) for value in values])
+    return axes
+
+
+def _matrix_entries(definition):
+    """The matrices of an experiment (or exclude) definition, each a list of
+    the names of the axes it crosses.
+    """
+    entries = []
+    for key in ("matrix", "matrices"):
+        value = definition.get(key) or []
+        if key == "matrix" and value:
+            value = [value]
+        for entry in value:
+            if isinstance(entry, dict):
+                entries.extend(list(components) for components in entry.values())
+            elif isinstance(entry, str):
+                entries.append([entry])
+            else:
+                entries.append(list(entry))
+    return entries
+
+
+class ExperimentMatrix:
+    """The instances of one experiment of a Ramble applications section.
+
+    ``name`` is the experiment's name (a template of its variables),
+    ``definition`` its dict in ``applications:...:experiments``, and
+    ``variables`` the variables defined outside of it (which it overrides).
+    """
+
+    def __init__(self, name, definition, variables=None):
+        self.name = name
+        self.variables = dict(variables or {})
+        self.variables.update(definition.get("variables") or {})
+
+        axes = _axes(self.variables, definition.get("zips") or {})
+        self._matrices = []
+        in_matrix = set()
+        for components in _matrix_entries(definition):
+            missing = [c for c in components if c not in axes]
+            if missing:
+                raise ValueError(
+                    f"{name}: matrix uses {', '.join(missing)}, which are not "
+                    "list variables or zips"
+                )
+            self._matrices.append([axes[c] for c in components])
+            in_matrix.update(components)
+
+        sizes = set(math.prod(len(a.points) for a in m) for m in self._matrices)
+        if len(sizes) > 1:
+            raise ValueError(f"{name}: matrices must all have the same size")
+        self._matrix_size = sizes.pop() if sizes else 1
+
+        self._vectors = [axes[n] for n in axes if n not in in_matrix]
+        lengths = set(len(axis.points) for axis in self._vectors)
+        if len(lengths) > 1:
+            raise ValueError(
+                f"{name}: list variables that are not in a matrix must all "
+                "have the same length"
+            )
+        self._vector_size = lengths.pop() if lengths else 1
+
+        exclude = definition.get("exclude") or {}
+        self.where = list(exclude.get("where") or [])
+        self._excluded_names, self._excluded = self._excluded_points(exclude)
+
+        #: Names of undefined variables that kept ``where`` expressions from
+        #: being evaluated, and how many instances were kept because of them
+        self.undefined = set()
+        self.undecided = 0
+
+    @staticmethod
+    def _excluded_points(exclude):
+        definition = {k: v for k, v in exclude.items() if k != "where"}
+        if not definition.get("variables"):
+            return (), frozenset()
+        excluded = ExperimentMatrix("exclude", definition)
+        names = tuple(sorted(excluded.variables))
+        points = set()
+        for point in excluded.points():
+            values = dict(excluded.variables, **point)
+            points.add(tuple(_format(values[n]) for n in names))
+        return names, frozenset(points)
+
+    @property
+    def size(self):
+        """Number of points, before exclusions."""
+        return self._vector_size * self._matrix_size
+
+    @property
+    def has_exclusions(self):
+        return bool(self.where or self._excluded)
+
+    def points(self):
+        """Generate the values of the list variables at each point."""
+        for v in range(self._vector_size):
+            base = {}
+            for axis in self._vectors:
+                base.update(zip(axis.names, axis.points[v]))
+            for m in range(self._matrix_size):
+                point = dict(base)
+                for matrix in self._matrices:
+                    # Like itertools.product, the last axis varies fastest
+                    index = m
+                    for axis in reversed(matrix):
+                        index, i = divmod(index, len(axis.points))
+                        point.update(zip(axis.names, axis.points[i]))
+                yield point
+
+    def _is_excluded(self, instance):
+        if self._excluded:
+            values = tuple(_format(instance._raw.get(n)) for n in self._excluded_names)
+            if values in self._excluded:
+                return True
+
+        undecided = False
+        for expression in self.where:
+            try:
+                if evaluate(instance.expand(expression)):
+                    return True
+            except (ValueError, TypeError, ArithmeticError):
+                # e.g. a system variable that isn't known here: keep it
+                self.undefined.update(instance.undefined(expression))
+                undecided = True
+        self.undecided += undecided
+        return False
+
+    def __iter__(self):
+        """Generate the instances that are not excluded."""
+        for point in self.points():
+            instance = Instance(dict(self.variables, **point), point=point)
+            if self._is_excluded(instance):
+                continue
+            instance.name = instance.expand(self.name)
+            yield instance
+
+
+def application_matrices(applications, variables=None):
+    """Generate ``(application, workload, ExperimentMatrix)`` for each
+    experiment of a Ramble applications section. ``variables`` are defined
+    for all of them (e.g. the system's); the application's and workload's
+    own variables override them.
+    """
+    for app_name, app in applications.items():
+        app_variables = dict(variables or {}, application_name=app_name)
+        app_variables.update(app.get("variables") or {})
+        for workload_name, workload in (app.get("workloads") or {}).items():
+            workload_variables = dict(app_variables, workload_name=workload_name)
+            workload_variables.update(workload.get("variables") or {})
+            for name, definition in (workload.get("experiments") or {}).items():
+                matrix = ExperimentMatrix(name, definition or {}, workload_variables)
+                yield app_name, workload_name, matrix
@@ -3,18 +3,22 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import hashlib
+import inspect
+import json
+import pathlib
 from typing import Dict
-import yaml  # TODO: some way to ensure yaml available
 
 from benchpark.directives import ExperimentSystemBase
+import benchpark.reconcile
 import benchpark.spec
-import benchpark.paths
 import benchpark.repo
 import benchpark.runtime
+import benchpark.timing
 import benchpark.variant
+import benchpark.yamlio
 
-bootstrapper = benchpark.runtime.RuntimeResources(benchpark.paths.benchpark_home)
-bootstrapper.bootstrap()
+benchpark.runtime.bootstrap()
 
 import ramble.language.language_base  # noqa
 import ramble.language.language_helpers  # noqa
@@ -93,6 +97,80 @@ class Experiment(ExperimentSystemBase):
         }
 
     def write_ramble_dict(self, filepath):
-        ramble_dict = self.compute_ramble_dict()
-        with open(filepath, "w") as f:
-            yaml.dump(ramble_dict, f)
+        with benchpark.timing.span("compute ramble dict"):
+            ramble_dict = self.compute_ramble_dict()
+        with benchpark.timing.span("write ramble.yaml"):
+            benchpark.yamlio.write(filepath, ramble_dict)
+
+    def experiment_uid(self):
+        """SHA-256 of the concrete spec. Unlike ``hash()``, this is the same
+        in every process, so it can name the experiment's directory.
+        """
+        return hashlib.sha256(str(self.spec).encode("utf-8")).hexdigest()
+
+    def source_hash(self):
+        """SHA-256 of the source of this experiment's class and the classes
+        it inherits from, which determine what gets generated for a spec.
+        """
+        sha256_hash = hashlib.sha256()
+        for cls in type(self).__mro__:
+            if issubclass(cls, Experiment):
+                sha256_hash.update(pathlib.Path(inspect.getfile(cls)).read_bytes())
+        return sha256_hash.hexdigest()
+
+    def _experiment_id(self):
+        return {
+            "experiment": {
+                "name": self.__class__.__name__,
+                "spec": str(self.spec),
+                "config-hash": self.experiment_uid(),
+                "source-hash": self.source_hash(),
+            }
+        }
+
+    def generate_description(self, output_dir):
+        output_dir = pathlib.Path(output_dir)
+        self.write_ramble_dict(output_dir / "ramble.yaml")
+        self.spec.write_json(output_dir / "spec.json")
+
+        # Written last: a description with an experiment_id.yaml is complete
+        benchpark.yamlio.write(output_dir / "experiment_id.yaml", self._experiment_id())
+
+    def update_description(self, output_dir):
+        """Bring the description in ``output_dir`` up to date, rewriting only
+        the files whose content changed. Return the ``Changes`` (see
+        ``benchpark.reconcile``) to its ramble dict.
+        """
+        output_dir = pathlib.Path(output_dir)
+        ramble_yaml = output_dir / "ramble.yaml"
+        old = benchpark.yamlio.load(ramble_yaml) if ramble_yaml.exists() else {}
+        with benchpark.timing.span("compute ramble dict"):
+            new = self.compute_ramble_dict()
+        # Compared through YAML, which e.g. turns tuples into lists
+        new = benchpark.yamlio.loads(benchpark.yamlio.dump(new))
+
+        changes = benchpark.reconcile.diff(old.get("ramble") or {}, new["ramble"])
+        if changes.sections:
+            benchpark.yamlio.write(ramble_yaml, new)
+
+        spec_json = output_dir / "spec.json"
+        spec_dict = self.spec.to_dict()
+        if not spec_json.exists() or json.loads(spec_json.read_text()) != spec_dict:
+            self.spec.write_json(spec_json)
+
+        # Written last: a description with an experiment_id.yaml is complete
+        if not self.description_is_current(output_dir):
+            benchpark.yamlio.write(
+                output_dir / "experiment_id.yaml", self._experiment_id()
+            )
+        return changes
+
+    def description_is_current(self, output_dir):
+        """Whether ``output_dir`` holds a description generated for this spec
+        by the current version of the experiment.
+        """
+        experiment_id_path = pathlib.Path(output_dir) / "experiment_id.yaml"
+        if not experiment_id_path.exists():
+            return False
+        experiment_id = benchpark.yamlio.load(experiment_id_path)
+        return experiment_id == self._experiment_id()
@@ -16,6 +16,12 @@ def _source_location() -> pathlib.Path:
 benchpark_root = _source_location()
 lib_path = benchpark_root / "lib" / "benchpark"
 test_path = lib_path / "test"
+experiment_repo = benchpark_root / "var" / "exp_repo"
+system_repo = benchpark_root / "var" / "sys_repo"
 benchpark_home = pathlib.Path(os.path.expanduser("~/.benchpark"))
 global_ramble_path = benchpark_home / "ramble"
 global_spack_path = benchpark_home / "spack"
+git_mirrors_path = benchpark_home / "mirrors"
+store_path = benchpark_home / "store"
+server_socket = benchpark_home / "server.sock"
+cache_path = benchpark_home / "cache"
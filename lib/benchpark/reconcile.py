@@ -0,0 +1,159 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Differences between two versions of a ramble dict, in terms of what they
+mean for a workspace that was set up from the older one.
+
+Sections (``applications``, ``software``, ``modifiers``, ``config``, ...)
+are compared as a whole. For the applications, the experiment instances of
+both versions are expanded and matched by name:
+
+* instances only in the new version are added, those only in the old one
+  are removed;
+* an instance in both is invalidated if its expanded variables or the rest
+  of its experiment's definition (variants, env_vars, ...) changed, if the
+  Spack environment it uses changed, or if a section that applies to all
+  experiments (``global_sections``) changed.
+
+Inputs of a workspace that are not part of the ramble dict (e.g. the
+configs of the system, or the modifier it was set up with) are only
+compared by the caller: if any of them changed, every instance is
+invalidated.
+
+Everything else in the workspace (builds, environments and the run
+directories of the other instances) is still valid.
+"""
+
+import collections
+import hashlib
+import json
+
+import benchpark.expansion
+
+#: Sections of a ramble dict that apply to every experiment
+global_sections = ("include", "config", "modifiers")
+
+#: Keys of an experiment's definition that only describe how it expands
+#: into instances (the expanded variables are compared instead)
+_expansion_keys = ("variables", "zips", "matrix", "matrices", "exclude")
+
+#: Instances are ``(application, workload, experiment name)`` tuples
+Changes = collections.namedtuple(
+    "Changes",
+    ["sections", "added", "removed", "invalidated", "environments", "inputs"],
+    defaults=[[]],
+)
+
+
+def changed_keys(old, new):
+    """Keys whose values differ between two dicts"""
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+
+def changed_sections(old, new):
+    """Names of the sections that differ between two ramble dicts (the
+    contents of their ``ramble`` key).
+    """
+    return changed_keys(old, new)
+
+
+def changed_environments(old, new):
+    """Names of the Spack environments of two software sections that differ,
+    in their definition or in that of a package they use.
+    """
+    old_packages = old.get("packages") or {}
+    new_packages = new.get("packages") or {}
+    old_environments = old.get("environments") or {}
+    new_environments = new.get("environments") or {}
+
+    changed = set()
+    for name in set(old_environments) | set(new_environments):
+        environment = new_environments.get(name)
+        if old_environments.get(name) != environment:
+            changed.add(name)
+            continue
+        for package in (environment or {}).get("packages") or []:
+            if old_packages.get(package) != new_packages.get(package):
+                changed.add(name)
+                break
+    return changed
+
+
+def instances(ramble, variables=None):
+    """The instances of the experiments in a ramble dict, mapped to the
+    Spack environment they use and a digest of everything that defines them.
+    """
+    applications = ramble.get("applications") or {}
+    result = {}
+    for app_name, workload_name, matrix in benchpark.expansion.application_matrices(
+        applications, variables
+    ):
+        workload = applications[app_name]["workloads"][workload_name]
+        definition = workload["experiments"][matrix.name] or {}
+        rest = {k: v for k, v in definition.items() if k not in _expansion_keys}
+        for instance in matrix:
+            values = instance.values()
+            digest = hashlib.sha256(
+                json.dumps([values, rest], sort_keys=True, default=str).encode()
+            ).hexdigest()
+            environment = values.get("env_name") or app_name
+            result[(app_name, workload_name, instance.name)] = (environment, digest)
+    return result
+
+
+def diff(old, new, old_variables=None, new_variables=None, inputs=()):
+    """The ``Changes`` from ramble dict ``old`` to ``new`` (the contents of
+    their ``ramble`` key), expanded with ``old_variables`` and
+    ``new_variables`` respectively. ``inputs`` are the names of the other
+    inputs that changed.
+    """
+    sections = changed_sections(old, new)
+    environments = changed_environments(
+        old.get("software") or {}, new.get("software") or {}
+    )
+    old_instances = instances(old, old_variables)
+    new_instances = instances(new, new_variables)
+
+    invalidate_all = bool(inputs) or any(
+        section in global_sections for section in sections
+    )
+    invalidated = []
+    for key, (environment, digest) in new_instances.items():
+        if key not in old_instances:
+            continue
+        if (
+            invalidate_all
+            or environment in environments
+            or old_instances[key] != (environment, digest)
+        ):
+            invalidated.append(key)
+
+    return Changes(
+        sections,
+        [key for key in new_instances if key not in old_instances],
+        [key for key in old_instances if key not in new_instances],
+        invalidated,
+        sorted(environments),
+        list(inputs),
+    )
+
+
+def summary(changes):
+    """A description of ``changes``, listing the instances concerned."""
+    if not any(changes):
+        return "No changes"
+
+    lines = []
+    if changes.sections:
+        lines.append(f"Changed sections: {', '.join(changes.sections)}")
+    if changes.environments:
+        lines.append(f"Changed environments: {', '.join(changes.environments)}")
+    if changes.inputs:
+        lines.append(f"Changed inputs: {', '.join(changes.inputs)}")
+    for what in ("added", "removed", "invalidated"):
+        keys = getattr(changes, what)
+        lines.append(f"{what.capitalize()} instances: {len(keys)}")
+        lines.extend(f"  {'/'.join(key)}" for key in keys)
+    return "\n".join(lines)
@@ -6,18 +6,19 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import contextlib
+import functools
+import hashlib
+import os
 import sys
 from enum import Enum
 
 import benchpark.paths
 import benchpark.runtime
+import benchpark.timing
 
 # isort: off
 
-bootstrapper = benchpark.runtime.RuntimeResources(
-    benchpark.paths.benchpark_home
-)  # noqa
-bootstrapper.bootstrap()  # noqa
+benchpark.runtime.bootstrap()  # noqa
 
 import llnl.util.lang  # noqa
 import ramble.language.language_base  # noqa
@@ -80,6 +81,12 @@ def override_ramble_hardcoded_globals():
     ramble.language.language_base.namespaces = _old[2]
 
 
+repo_dirs = {
+    ObjectTypes.experiments: benchpark.paths.experiment_repo,
+    ObjectTypes.systems: benchpark.paths.system_repo,
+}
+
+
 # Experiments
 def _exprs():
     """Get the singleton RepoPath instance for Ramble.
@@ -88,8 +95,7 @@ def _exprs():
 
     TODO: consider not making this a singleton.
     """
-    experiments_repo = benchpark.paths.benchpark_root / "var" / "exp_repo"
-    return _add_repo(experiments_repo, ObjectTypes.experiments)
+    return _add_repo(repo_dirs[ObjectTypes.experiments], ObjectTypes.experiments)
 
 
 def _add_repo(repo_dir, obj_type):
@@ -98,16 +104,16 @@ def _add_repo(repo_dir, obj_type):
     else:
         raise ValueError(f"Repo dir does not exist: {repo_dir}")
 
-    with override_ramble_hardcoded_globals():
-        path = ramble.repository.RepoPath(*repo_dirs, object_type=obj_type)
+    with benchpark.timing.span(f"load {obj_type.name} repo"):
+        with override_ramble_hardcoded_globals():
+            path = ramble.repository.RepoPath(*repo_dirs, object_type=obj_type)
     sys.meta_path.append(path)
     return path
 
 
 # Systems
 def _systems():
-    systems_repo = benchpark.paths.benchpark_root / "var" / "sys_repo"
-    return _add_repo(systems_repo, ObjectTypes.systems)
+    return _add_repo(repo_dirs[ObjectTypes.systems], ObjectTypes.systems)
 
 
 paths = {
@@ -121,6 +127,44 @@ paths = {
 #####################################
 
 
+@functools.lru_cache(maxsize=None)
+def content_hash(object_type=default_type):
+    """SHA-256 of the files in the repo of ``object_type``: anything derived
+    from the repo's classes is out of date once this changes.
+    """
+    repo_dir = repo_dirs[object_type]
+    sha256_hash = hashlib.sha256()
+    for root, dirs, files in os.walk(repo_dir):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            sha256_hash.update(os.path.relpath(path, repo_dir).encode("utf-8"))
+            sha256_hash.update(b"\0")
+            with open(path, "rb") as f:
+                sha256_hash.update(f.read())
+            sha256_hash.update(b"\0")
+    return sha256_hash.hexdigest()
+
+
+def reset():
+    """Forget the loaded repos and the classes imported from them, so that
+    they are read again (e.g. after files in the repos changed).
+    """
+    content_hash.cache_clear()
+    for singleton in paths.values():
+        loaded = getattr(singleton, "_instance", None)
+        if loaded is None:
+            continue
+        if loaded in sys.meta_path:
+            sys.meta_path.remove(loaded)
+        singleton._instance = None
+
+    prefixes = tuple(f"{namespace}." for namespace in namespaces)
+    for module_name in list(sys.modules):
+        if module_name in namespaces or module_name.startswith(prefixes):
+            del sys.modules[module_name]
+
+
 def all_object_names(object_type=default_type):
     """Convenience wrapper around ``ramble.repository.all_object_names()``."""  # noqa: E501
     return paths[object_type].all_object_names()
@@ -0,0 +1,275 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""An on-disk index of the experiment and system repos.
+
+Loading a class from a repo means bootstrapping Ramble and importing the
+module that defines it. For listing the repo and auditing it, the index
+records what is needed instead (class names, namespaces, file paths,
+declared variants and the methods each class defines), read statically from
+the source with ``ast``: no repo module is ever executed.
+
+The index is kept in ``~/.benchpark/cache``. Each file is stored with its
+mtime, size and SHA-256, and only the files that changed since the index was
+written are read again.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import pathlib
+import re
+
+import benchpark.paths
+
+#: Bump when the format of index entries changes, to rebuild old indexes
+index_version = 2
+
+#: Layout of each repo type: the directory holding one subdirectory per
+#: object, and the file in it that defines the object's class
+repo_layouts = {
+    "experiments": ("experiments", "experiment.py"),
+    "systems": ("systems", "system.py"),
+}
+
+repo_dirs = {
+    "experiments": benchpark.paths.experiment_repo,
+    "systems": benchpark.paths.system_repo,
+}
+
+#: Arguments of the ``variant`` directive, in order
+_variant_params = [
+    "name",
+    "default",
+    "description",
+    "values",
+    "multi",
+    "validator",
+    "when",
+    "sticky",
+]
+
+
+def mod_to_class(mod_name):
+    """Class name for the object in ``mod_name``, the same way Ramble
+    derives it (e.g. ``amg2023`` -> ``Amg2023``, ``cts-ruby`` -> ``CtsRuby``).
+    """
+    class_name = "".join(part.capitalize() for part in re.split(r"[-_]", mod_name))
+    if re.match(r"^[0-9]", class_name):
+        class_name = f"_{class_name}"
+    return class_name
+
+
+def _literal(node):
+    """Value of an AST node if it is a literal, else raise ValueError."""
+    value = ast.literal_eval(node)
+    return list(value) if isinstance(value, tuple) else value
+
+
+def _variant_call(call):
+    """Arguments of a ``variant(...)`` call in a class body.
+
+    Arguments that are not literals (e.g. a callable for ``values``) cannot be
+    recorded; they are listed under ``dynamic``.
+    """
+    arguments = {}
+    dynamic = []
+    named = list(zip(_variant_params, call.args))
+    named.extend((keyword.arg, keyword.value) for keyword in call.keywords)
+    for param, node in named:
+        try:
+            arguments[param] = _literal(node)
+        except ValueError:
+            dynamic.append(param)
+
+    # The same values as the variant directive infers for a boolean default
+    values = arguments.get("values")
+    if "values" not in arguments and "values" not in dynamic:
+        if str(arguments.get("default")).upper() in ("TRUE", "FALSE"):
+            values = [True, False]
+
+    # Only what is needed to work with specs
+    return {
+        "name": arguments.get("name"),
+        "default": arguments.get("default"),
+        "values": values,
+        "multi": bool(arguments.get("multi")),
+        "when": arguments.get("when"),
+        "description": arguments.get("description", ""),
+        "dynamic": dynamic,
+    }
+
+
+def _object_class(tree, object_name):
+    """The ``ast.ClassDef`` of the object defined in a repo module."""
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    expected = mod_to_class(object_name)
+    for node in classes:
+        if node.name == expected:
+            return node
+    # Fall back to the last class defined in the module
+    return classes[-1] if classes else None
+
+
+def read_object_file(path, object_name):
+    """Index entry (without file metadata) for the class in ``path``."""
+    with open(path, "rb") as f:
+        source = f.read().decode("utf-8")
+    tree = ast.parse(source, filename=str(path))
+
+    node = _object_class(tree, object_name)
+    if node is None:
+        return {"class_name": None, "bases": [], "attributes": [], "variants": []}
+
+    attributes = []
+    variants = []
+    for statement in node.body:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            attributes.append(statement.name)
+        elif isinstance(statement, ast.Assign):
+            attributes.extend(
+                t.id for t in statement.targets if isinstance(t, ast.Name)
+            )
+        elif isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call):
+            func = statement.value.func
+            if isinstance(func, ast.Name) and func.id == "variant":
+                variants.append(_variant_call(statement.value))
+
+    return {
+        "class_name": node.name,
+        "bases": [ast.get_source_segment(source, base) for base in node.bases],
+        "attributes": attributes,
+        "variants": variants,
+    }
+
+
+def _repo_namespace(repo_dir):
+    # Only needed when repo.yaml changed: importing yaml is a large part of
+    # the time it takes to check an up-to-date index (e.g. for completion)
+    import benchpark.yamlio
+
+    return benchpark.yamlio.load(repo_dir / "repo.yaml")["repo"]["namespace"]
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class RepoIndex:
+    """Index of one repo, stored as JSON in ``cache_file``."""
+
+    def __init__(self, object_type, repo_dir=None, cache_file=None):
+        self.object_type = object_type
+        self.repo_dir = pathlib.Path(repo_dir or repo_dirs[object_type])
+        self.cache_file = pathlib.Path(
+            cache_file or benchpark.paths.cache_path / f"{object_type}-repo-index.json"
+        )
+        self.namespace = None
+        self.repo_yaml_mtime_ns = None
+        self.entries = {}
+        #: Names of the objects read again by the last ``update()``
+        self.reindexed = []
+
+    def _load(self):
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != index_version or data.get("repo_dir") != str(
+            self.repo_dir
+        ):
+            return {}
+        return data
+
+    def _save(self):
+        data = {
+            "version": index_version,
+            "repo_dir": str(self.repo_dir),
+            "namespace": self.namespace,
+            "repo_yaml_mtime_ns": self.repo_yaml_mtime_ns,
+            "entries": self.entries,
+        }
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_file.with_name(f".{self.cache_file.name}.{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.cache_file)
+
+    def update(self):
+        """Bring the index up to date with the repo, reading only the files
+        that changed, and write it back if anything did. Returns ``self``.
+        """
+        data = self._load()
+        cached = data.get("entries", {})
+        dir_name, file_name = repo_layouts[self.object_type]
+
+        repo_yaml_mtime = (self.repo_dir / "repo.yaml").stat().st_mtime_ns
+        if repo_yaml_mtime == data.get("repo_yaml_mtime_ns"):
+            self.namespace = data["namespace"]
+            changed = False
+        else:
+            self.namespace = _repo_namespace(self.repo_dir)
+            changed = True
+        self.repo_yaml_mtime_ns = repo_yaml_mtime
+        self.entries = {}
+        self.reindexed = []
+
+        objects_dir = self.repo_dir / dir_name
+        for object_name in sorted(os.listdir(objects_dir)):
+            path = objects_dir / object_name / file_name
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            entry = cached.get(object_name)
+            if (
+                entry is not None
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["size"] == stat.st_size
+            ):
+                self.entries[object_name] = entry
+                continue
+
+            # The file was touched: only read it again if its content changed
+            sha256 = _file_hash(path)
+            if entry is None or entry["sha256"] != sha256:
+                entry = read_object_file(path, object_name)
+                entry["file"] = str(path)
+                self.reindexed.append(object_name)
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=sha256)
+            self.entries[object_name] = entry
+            changed = True
+
+        changed = changed or set(self.entries) != set(cached)
+        if changed:
+            self._save()
+        return self
+
+    def names(self):
+        return sorted(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __getitem__(self, name):
+        return self.entries[name]
+
+    def variants(self, name):
+        """Declared variants of ``name``: dicts with the name, default,
+        allowed values (None if any value is allowed), whether the variant is
+        multi-valued, the when-condition and the description.
+        """
+        return self.entries[name]["variants"]
+
+
+def get(object_type):
+    """Up-to-date index of the default repo for ``object_type``, which is
+    either the name of a ``benchpark.repo.ObjectTypes`` member or the member.
+    """
+    return RepoIndex(getattr(object_type, "name", object_type)).update()
@@ -3,16 +3,25 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import codecs
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
 from contextlib import contextmanager
+import hashlib
 import os
 import pathlib
+import re
 import shlex
-import subprocess
 import sys
+import tempfile
+import time
 
-import yaml
-
+from benchpark.error import BenchparkError
 import benchpark.paths
+from benchpark.site_config import SiteConfig
+import benchpark.timing
+import benchpark.yamlio
 
 DEBUG = False
 
@@ -32,22 +41,306 @@ def working_dir(location):
         os.chdir(initial_dir)
 
 
-def git_clone_commit(url, commit, destination):
-    run_command(f"git clone -c feature.manyFiles=true {url} {destination}")
+def _git_mirror_location(url, mirror_root):
+    """Each upstream URL gets its own bare mirror, e.g. spack-1a2b3c4d.git"""
+    name = pathlib.PurePosixPath(url.rstrip("/")).name
+    if name.endswith(".git"):
+        name = name[: -len(".git")]
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:8]
+    return pathlib.Path(mirror_root) / f"{name}-{url_hash}.git"
+
+
+def _git_rev_parse(git_dir, commit):
+    """Return the full hash of ``commit`` in ``git_dir``, or None if it is
+    not there (yet).
+    """
+    try:
+        stdout, _ = run_command(
+            f"git -C {git_dir} rev-parse --verify --quiet {commit}^{{commit}}"
+        )
+    except RuntimeError:
+        return None
+    return stdout.strip()
+
+
+def _git_resolve_commit(url, commit, mirror_root):
+    """Full hash of ``commit``, which is a full hash, the name of a branch or
+    tag of ``url``, or an abbreviated hash.
+
+    A server only hands out commits by their full hash. Branches and tags,
+    and abbreviated hashes of the commits they point to, are looked up with
+    ``git ls-remote``. Any other abbreviated hash is looked for in the
+    history of the default branch: only its commit objects are fetched (no
+    trees or blobs), into a scratch repository that is discarded afterwards.
+    """
+    if re.fullmatch(r"[0-9a-f]{40}", commit):
+        return commit
+
+    stdout, _ = run_command(f"git ls-remote {url}")
+    refs = {}
+    for line in stdout.splitlines():
+        full_commit, ref = line.split("\t")
+        # An annotated tag is listed again, as ref^{}, with its commit
+        refs[ref[: -len("^{}")] if ref.endswith("^{}") else ref] = full_commit
+
+    for ref in (f"refs/tags/{commit}", f"refs/heads/{commit}"):
+        if ref in refs:
+            return refs[ref]
+    matches = set(c for c in refs.values() if c.startswith(commit))
+    if len(matches) == 1:
+        return matches.pop()
+
+    with tempfile.TemporaryDirectory(dir=mirror_root) as scratch:
+        run_command(f"git init --quiet --bare {scratch}")
+        run_command(
+            f"git -C {scratch} fetch --quiet --no-tags --filter=tree:0 {url} "
+            "HEAD:refs/heads/default"
+        )
+        full_commit = _git_rev_parse(scratch, commit)
+    if not full_commit:
+        raise RuntimeError(
+            f"Commit {commit} not found in the default branch of {url}: "
+            "pin its full hash in checkout-versions.yaml"
+        )
+    return full_commit
+
+
+def git_mirror_commit(url, commit, mirror_root=None):
+    """Make sure ``commit`` from ``url`` is available in a local bare mirror.
+
+    Only the pinned commit itself is fetched (``--depth=1``), and once it is
+    in the mirror no further network access is needed to set up clones of
+    it. Returns the mirror location and the full hash of the commit.
+
+    Blobs are not filtered out of this fetch: checking the commit out needs
+    every blob of its tree anyway, and a blob-filtered mirror would have to
+    fetch them from the network when a clone is checked out.
+    """
+    mirror_root = pathlib.Path(
+        mirror_root or benchpark.paths.git_mirrors_path
+    ).absolute()
+    mirror = _git_mirror_location(url, mirror_root)
+
+    if not mirror.exists():
+        mirror_root.mkdir(parents=True, exist_ok=True)
+        run_command(f"git init --quiet --bare {mirror}")
+        run_command(f"git -C {mirror} remote add origin {url}")
+
+    full_commit = _git_rev_parse(mirror, commit)
+    if full_commit:
+        debug_print(f"Found {commit} in mirror {mirror}")
+        return mirror, full_commit
+
+    full_commit = _git_resolve_commit(url, commit, mirror_root)
+
+    # Keep a ref to the commit so it survives garbage collection
+    debug_print(f"Fetching {full_commit} into mirror {mirror}")
+    run_command(
+        f"git -C {mirror} fetch --quiet --no-tags --depth=1 origin "
+        f"{full_commit}:refs/benchpark/{full_commit}"
+    )
+    return mirror, full_commit
+
+
+def _git_borrow(repo, git_dir, mirror, full_commit):
+    """Make the repository in ``repo`` (with its git directory in
+    ``git_dir``) use the objects of ``mirror`` rather than copies of them,
+    and record ``full_commit`` in it.
+    """
+    alternates = pathlib.Path(git_dir) / "objects" / "info" / "alternates"
+    with open(alternates, "w") as f:
+        f.write(f"{mirror / 'objects'}\n")
+    # The objects are already present through the mirror, so this only
+    # records the commit (and that the repository is shallow)
+    run_command(
+        f"git fetch --quiet --no-tags --depth=1 {mirror} "
+        f"{full_commit}:refs/benchpark/{full_commit}",
+        cwd=repo,
+    )
+
+
+def git_clone_commit(url, commit, destination, mirror_root=None):
+    """Check out ``commit`` of ``url`` in ``destination``.
+
+    The objects are borrowed from the local mirror (see
+    ``git_mirror_commit``) rather than copied, so after the first time this
+    costs no network access and very little disk.
+    """
+    mirror, full_commit = git_mirror_commit(url, commit, mirror_root)
+
+    # This may run in several threads at once (see run_parallel), so it must
+    # not change the working directory
+    run_command(f"git init --quiet {destination}")
+    run_command("git config feature.manyFiles true", cwd=destination)
+    run_command(f"git remote add origin {url}", cwd=destination)
+    _git_borrow(destination, pathlib.Path(destination) / ".git", mirror, full_commit)
+    run_command(f"git checkout --quiet --detach {full_commit}", cwd=destination)
+
+
+def git_store_commit(tool, url, commit, store_root=None, mirror_root=None):
+    """Return the shared repository for ``commit`` of ``tool`` (e.g. spack),
+    creating it if this is the first time that commit is needed.
+
+    Store entries are bare repositories named ``<tool>-<full commit hash>``,
+    so every experiments root that pins the same commit can use the same
+    entry. They hold no objects of their own either: those are borrowed from
+    the mirror.
+    """
+    mirror, full_commit = git_mirror_commit(url, commit, mirror_root)
+
+    store_root = pathlib.Path(store_root or benchpark.paths.store_path).absolute()
+    entry = store_root / f"{tool}-{full_commit}"
+    if entry.exists():
+        return entry, full_commit
+
+    # Build the entry off to the side and move it into place once it is
+    # complete, so an interrupted setup never looks like a valid entry
+    store_root.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=store_root) as scratch:
+        staging = pathlib.Path(scratch) / entry.name
+        run_command(f"git init --quiet --bare {staging}")
+        # Applies to the worktrees too
+        run_command(f"git -C {staging} config feature.manyFiles true")
+        run_command(f"git -C {staging} remote add origin {url}")
+        _git_borrow(staging, staging, mirror, full_commit)
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # Someone else created it in the meantime
+            if not entry.exists():
+                raise
+
+    return entry, full_commit
 
-    with working_dir(destination):
-        run_command(f"git checkout {commit}")
 
+def git_attach_store(tool, url, commit, destination, store_root=None, mirror_root=None):
+    """Check out ``commit`` of ``tool`` in ``destination`` as a git worktree
+    of the shared store entry.
 
-def run_command(command_str, env=None):
-    proc = subprocess.Popen(
-        shlex.split(command_str),
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
+    The worktree has its own files (so e.g. site-scope configuration stays
+    private to ``destination``), but the git objects are shared by every
+    worktree of the entry (through the mirror), so attaching is quick and
+    uses no network access.
+    """
+    entry, full_commit = git_store_commit(
+        tool, url, commit, store_root=store_root, mirror_root=mirror_root
     )
-    stdout, stderr = proc.communicate()
+    destination = pathlib.Path(destination).absolute()
+
+    # Forget worktrees whose experiments root has since been deleted
+    run_command(f"git -C {entry} worktree prune")
+    run_command(
+        f"git -C {entry} worktree add --quiet --detach {destination} {full_commit}"
+    )
+
+
+#: How many lines of each output stream ``run_command`` keeps in memory (for
+#: its return value and error messages); anything earlier is only streamed
+default_keep_lines = 10000
+
+_read_size = 64 * 1024
+
+
+class CommandTimeoutError(RuntimeError):
+    """A command run by ``run_command`` did not finish in time."""
+
+
+async def _pump(stream, tail, sinks):
+    """Copy ``stream`` line by line to each of ``sinks``, keeping the last
+    lines in ``tail``.
+    """
+
+    def emit(line):
+        tail.append(line)
+        for sink in sinks:
+            sink.write(line)
+            sink.flush()
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    partial = ""
+    while True:
+        chunk = await stream.read(_read_size)
+        if not chunk:
+            break
+        *lines, partial = (partial + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            emit(line + "\n")
+        # Don't let a huge line without newlines grow unbounded
+        if len(partial) > _read_size:
+            emit(partial)
+            partial = ""
+
+    partial += decoder.decode(b"", final=True)
+    if partial:
+        emit(partial)
+
+
+async def run_command_async(
+    command_str,
+    env=None,
+    cwd=None,
+    echo=False,
+    log_path=None,
+    timeout=None,
+    keep_lines=default_keep_lines,
+):
+    """Run a command, streaming its output as it is produced.
+
+    Args:
+        command_str: the command line (split with ``shlex``)
+        env: environment for the command (default: inherit ours)
+        cwd: directory to run the command in
+        echo: if True, copy the command's output to our stdout/stderr
+        log_path: if given, append the command's output to this file
+        timeout: seconds after which the command is killed and
+            ``CommandTimeoutError`` raised
+        keep_lines: how many of the last lines of stdout/stderr to keep
+            in memory and return
+
+    Returns the (possibly truncated) stdout and stderr. If the command is
+    cancelled or times out, it is killed before this returns.
+    """
+    import asyncio
+
+    args = shlex.split(command_str)
+    stdout_tail = collections.deque(maxlen=keep_lines)
+    stderr_tail = collections.deque(maxlen=keep_lines)
+
+    with contextlib.ExitStack() as stack:
+        stdout_sinks = [sys.stdout] if echo else []
+        stderr_sinks = [sys.stderr] if echo else []
+        if log_path:
+            log = stack.enter_context(open(log_path, "a"))
+            stdout_sinks.append(log)
+            stderr_sinks.append(log)
+
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            env=env,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    _pump(proc.stdout, stdout_tail, stdout_sinks),
+                    _pump(proc.stderr, stderr_tail, stderr_sinks),
+                    proc.wait(),
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            raise CommandTimeoutError(
+                f"Command timed out after {timeout}s: {command_str}"
+            )
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+    stdout = "".join(stdout_tail)
+    stderr = "".join(stderr_tail)
     if proc.returncode != 0:
         raise RuntimeError(
             f"Failed command: {command_str}\nOutput: {stdout}\nError: {stderr}"
@@ -56,15 +349,83 @@ def run_command(command_str, env=None):
     return (stdout, stderr)
 
 
+def run_command(command_str, env=None, **kwargs):
+    """Run a command to completion; see ``run_command_async`` for options."""
+    # asyncio is slow to import, and most CLI invocations never need it
+    import asyncio
+
+    args = shlex.split(command_str)
+    with benchpark.timing.span(f"run {' '.join(args[:2])}"):
+        return asyncio.run(run_command_async(command_str, env=env, **kwargs))
+
+
+class ParallelTaskError(BenchparkError):
+    """One or more of the tasks given to ``run_parallel`` failed."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        message = "\n".join(f"{name} failed: {e}" for name, e in errors.items())
+        super().__init__(message)
+
+
+def run_parallel(tasks, title="Running"):
+    """Run independent tasks concurrently, reporting each as it finishes.
+
+    ``tasks`` maps a name for each task to a callable taking no arguments.
+    The tasks are expected to spend their time waiting on git or child
+    processes, so threads are enough. Every task runs to completion even if
+    another one fails; the failures are then raised together as a
+    ``ParallelTaskError``.
+
+    Returns a dict mapping each task name to what its callable returned.
+    """
+    results = {}
+    errors = {}
+    if not tasks:
+        return results
+
+    def _timed(name, fn, parent):
+        with benchpark.timing.span(name, parent=parent):
+            return fn()
+
+    start = time.time()
+    print(f"{title}: {', '.join(tasks)}")
+    parent = benchpark.timing.current()
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = {
+            executor.submit(_timed, name, fn, parent): name
+            for name, fn in tasks.items()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+                status = "done"
+            except Exception as e:
+                errors[name] = e
+                status = "FAILED"
+            elapsed = time.time() - start
+            print(f"  [{done}/{len(tasks)}] {name}: {status} ({elapsed:.1f}s)")
+
+    if errors:
+        raise ParallelTaskError(errors) from next(iter(errors.values()))
+    return results
+
+
 class Command:
     def __init__(self, exe_path, env):
         self.exe_path = exe_path
         self.env = env
 
-    def __call__(self, *args):
+    def _command_str(self, args):
         opts_str = " ".join(args)
-        cmd_str = f"{self.exe_path} {opts_str}"
-        return run_command(cmd_str, env=self.env)
+        return f"{self.exe_path} {opts_str}"
+
+    def __call__(self, *args, **kwargs):
+        """Run the command with ``args``; keyword arguments (e.g. ``echo``,
+        ``log_path``, ``timeout``) are passed on to ``run_command``.
+        """
+        return run_command(self._command_str(args), env=self.env, **kwargs)
 
 
 class RuntimeResources:
@@ -72,18 +433,44 @@ class RuntimeResources:
         self.root = benchpark.paths.benchpark_root
         self.dest = pathlib.Path(dest)
 
-        checkout_versions_location = self.root / "checkout-versions.yaml"
-        with open(checkout_versions_location, "r") as yaml_file:
-            data = yaml.safe_load(yaml_file)
-            self.ramble_commit = data["versions"]["ramble"]
-            self.spack_commit = data["versions"]["spack"]
-
         self.ramble_location = self.dest / "ramble"
         self.spack_location = self.dest / "spack"
 
+        self._versions = None
+        self.bootstrapped = False
+
+    def _checkout_versions(self):
+        # Only needed when something has to be cloned, so read it on demand
+        if self._versions is None:
+            checkout_versions_location = self.root / "checkout-versions.yaml"
+            data = benchpark.yamlio.load(checkout_versions_location)
+            self._versions = data["versions"]
+        return self._versions
+
+    @property
+    def ramble_commit(self):
+        return self._checkout_versions()["ramble"]
+
+    @property
+    def spack_commit(self):
+        return self._checkout_versions()["spack"]
+
     def bootstrap(self):
+        if self.bootstrapped:
+            return
+
+        with benchpark.timing.span("bootstrap"):
+            self._bootstrap()
+
+    def _bootstrap(self):
+        # Spack and Ramble are cloned independently, so fetch them together
+        missing = {}
         if not self.ramble_location.exists():
-            self._install_ramble()
+            missing["ramble"] = self._install_ramble
+        if not self.spack_location.exists():
+            missing["spack"] = self._install_spack
+        run_parallel(missing, title="Cloning")
+
         ramble_lib_path = self.ramble_location / "lib" / "ramble"
         externals = str(ramble_lib_path / "external")
         if externals not in sys.path:
@@ -95,12 +482,13 @@ class RuntimeResources:
         # Spack does not go in sys.path, but we will manually access modules from it
         # The reason for this oddity is that spack modules will compete with the internal
         # spack modules from ramble
-        if not self.spack_location.exists():
-            self._install_spack()
+
+        self.bootstrapped = True
 
     def _install_ramble(self):
         debug_print(f"Cloning Ramble to {self.ramble_location}")
-        git_clone_commit(
+        git_attach_store(
+            "ramble",
             "https://github.com/GoogleCloudPlatform/ramble.git",
             self.ramble_commit,
             self.ramble_location,
@@ -109,8 +497,11 @@ class RuntimeResources:
 
     def _install_spack(self):
         debug_print(f"Cloning Spack to {self.spack_location}")
-        git_clone_commit(
-            "https://github.com/spack/spack.git", self.spack_commit, self.spack_location
+        git_attach_store(
+            "spack",
+            "https://github.com/spack/spack.git",
+            self.spack_commit,
+            self.spack_location,
         )
         debug_print(f"Done cloning Spack ({self.spack_location})")
 
@@ -129,12 +520,9 @@ class RuntimeResources:
         if not self.spack_location.exists():
             first_time = True
             self._install_spack()
-            spack(
-                "config",
-                "--scope=site",
-                "add",
-                f"config:misc_cache:{spack_cache_location}",
-            )
+            spack_config = SiteConfig("spack", self.spack_location, spack)
+            spack_config.set("config:misc_cache", str(spack_cache_location))
+            spack_config.write()
         return spack, first_time
 
     def spack_first_time_setup(self):
@@ -148,3 +536,32 @@ class RuntimeResources:
 
     def ramble(self):
         return self._ramble()[0]
+
+
+_global_resources = None
+
+
+def global_resources():
+    """Return the RuntimeResources for the Ramble/Spack copies that
+    Benchpark itself imports from (under ``~/.benchpark``).
+
+    Creating the object is cheap: nothing is cloned or added to ``sys.path``
+    until ``bootstrap()`` is called.
+    """
+    global _global_resources
+    if _global_resources is None:
+        _global_resources = RuntimeResources(benchpark.paths.benchpark_home)
+    return _global_resources
+
+
+def bootstrap():
+    """Make Ramble (and its vendored ``llnl`` and ``spack``) importable.
+
+    This clones Ramble/Spack the first time it is needed and is a no-op on
+    later calls, so modules that require Ramble at import time call this
+    right before importing it, and commands that do not need Ramble never
+    pay for it.
+    """
+    resources = global_resources()
+    resources.bootstrap()
+    return resources
@@ -0,0 +1,293 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""A long-running Benchpark process that serves commands over a Unix socket.
+
+Most of the time of a short command like ``benchpark experiment init`` goes
+into starting Python, importing Ramble and loading the experiment/system
+repos. ``benchpark serve`` pays for that once and keeps it in memory; a
+``benchpark`` invoked with ``BENCHPARK_SERVER=<socket>`` in its environment
+sends its arguments to the server instead of doing the work itself.
+
+Each request is a single line of JSON::
+
+    {"argv": ["experiment", "init", ...], "cwd": "/where/the/client/runs",
+     "env": {...the client's environment...}}
+
+and gets a single line back::
+
+    {"status": 0, "stdout": "...", "stderr": "..."}
+
+The command runs in the client's working directory and environment.
+Variables that are only read when Benchpark, Ramble and Spack are loaded
+(``startup_variables`` and ``startup_prefixes``) cannot be changed that way, so a client whose
+values for them differ from the server's gets ``{"refused": "<reason>"}``
+back, and runs the command itself. So does a client that gets no valid
+reply at all.
+
+Requests are handled one at a time, since commands change process-wide
+state (the working directory, the environment, ``sys.stdout``).
+"""
+
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+
+import benchpark.paths
+import benchpark.timing
+from benchpark.runtime import working_dir
+
+#: The repos whose classes the server keeps loaded
+watched_dirs = [
+    benchpark.paths.benchpark_root / "var" / "exp_repo",
+    benchpark.paths.benchpark_root / "var" / "sys_repo",
+]
+
+
+#: Variables read when Benchpark, Ramble and Spack are loaded, which the
+#: server only does once
+startup_variables = ("HOME",)
+
+#: Prefixes of other such variables
+startup_prefixes = ("SPACK_", "RAMBLE_")
+
+
+def _startup_environment(env):
+    return {
+        name: value
+        for name, value in env.items()
+        if name in startup_variables or name.startswith(startup_prefixes)
+    }
+
+
+@contextlib.contextmanager
+def _environment(env):
+    """Replace ``os.environ`` with ``env`` for the duration of the block"""
+    saved = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def _snapshot(dirs):
+    """Map each file under ``dirs`` to its modification time and size."""
+    files = {}
+    for d in dirs:
+        for root, _, filenames in os.walk(d):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def _invalidate_repos():
+    # Nothing to forget if no command has loaded the repos yet
+    repo = sys.modules.get("benchpark.repo")
+    if repo is not None:
+        repo.reset()
+
+
+def _warm_up():
+    """Import Ramble and load every experiment and system class."""
+    import benchpark.repo
+
+    for object_type in benchpark.repo.ObjectTypes:
+        repo_path = benchpark.repo.paths[object_type]
+        for name in repo_path.all_object_names():
+            repo_path.get_obj_class(name)
+
+
+def _run_main(argv):
+    """Run ``benchpark <argv>`` in this process, returning its exit status."""
+    import main
+
+    # Timings are per-command, not per-server
+    benchpark.timing.reset()
+    try:
+        # Never forwarded: with BENCHPARK_SERVER set to this server's own
+        # socket, that would wait forever on the request being handled
+        status = main.main(argv, use_server=False)
+    except SystemExit as e:
+        status = e.code
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+    if status is None:
+        return 0
+    if isinstance(status, int):
+        return status
+    print(status, file=sys.stderr)
+    return 1
+
+
+def _parse_request(line):
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("not a JSON object")
+    if not request.get("shutdown") and not isinstance(request.get("argv"), list):
+        raise ValueError("no argv list")
+    return request
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = _parse_request(line)
+        except ValueError as e:
+            response = {"status": 1, "stdout": "", "stderr": f"Invalid request: {e}\n"}
+        else:
+            response = self.server.handle_request_data(request)
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class BenchparkServer(socketserver.UnixStreamServer):
+    """Runs Benchpark commands sent to ``socket_path`` in this process.
+
+    Before each command, files in ``watch`` are checked for changes; if any
+    changed, the loaded repos are dropped so the command sees the new
+    Experiment/System definitions.
+    """
+
+    def __init__(self, socket_path, watch=None, on_change=_invalidate_repos):
+        self.socket_path = str(socket_path)
+        self.watch = watched_dirs if watch is None else watch
+        self.on_change = on_change
+        self.environment = _startup_environment(os.environ)
+        self._files = _snapshot(self.watch)
+        self.requests_served = 0
+
+        if os.path.exists(self.socket_path):
+            if _is_listening(self.socket_path):
+                raise RuntimeError(f"A server is already listening on {socket_path}")
+            os.unlink(self.socket_path)
+
+        # Only the user who started the server may send it commands
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(self.socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def check_for_changes(self):
+        files = _snapshot(self.watch)
+        changed = files != self._files
+        self._files = files
+        if changed:
+            self.on_change()
+        return changed
+
+    def handle_request_data(self, request):
+        if request.get("shutdown"):
+            # shutdown() waits for serve_forever() to return, and that is
+            # waiting for this request, so it has to be called from elsewhere
+            import threading
+
+            threading.Thread(target=self.shutdown).start()
+            return {"status": 0, "stdout": "", "stderr": ""}
+
+        env = request.get("env", os.environ)
+        startup = _startup_environment(env)
+        if startup != self.environment:
+            names = sorted(
+                name
+                for name in set(startup) | set(self.environment)
+                if startup.get(name) != self.environment.get(name)
+            )
+            return {"refused": f"{', '.join(names)} differ from the server's"}
+
+        self.check_for_changes()
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            with working_dir(request.get("cwd", os.getcwd())), _environment(env):
+                status = _run_main(list(request["argv"]))
+        self.requests_served += 1
+        return {
+            "status": status,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def _is_listening(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def send(socket_path, request):
+    """Send ``request`` to the server at ``socket_path``; return its reply,
+    or None if it closed the connection without a valid one (e.g. it was
+    killed while handling the request).
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(str(socket_path))
+        s.sendall(json.dumps(request).encode() + b"\n")
+        with s.makefile("rb") as f:
+            line = f.readline()
+    try:
+        response = json.loads(line)
+    except ValueError:
+        return None
+    return response if isinstance(response, dict) else None
+
+
+def forward(socket_path, argv):
+    """Run ``benchpark <argv>`` on the server, and print its output here.
+    Return its exit status, or None if the server did not run it.
+    """
+    request = {"argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ)}
+    try:
+        response = send(socket_path, request)
+    except OSError as e:
+        response = {"refused": str(e)}
+    if response is None:
+        response = {"refused": "no valid reply"}
+    if "refused" in response:
+        print(
+            f"Running the command here, not on the server ({response['refused']})",
+            file=sys.stderr,
+        )
+        return None
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["status"]
+
+
+def serve(socket_path, warm_up=True):
+    if warm_up:
+        _warm_up()
+    with BenchparkServer(socket_path) as server:
+        print(f"Serving Benchpark commands on {socket_path}")
+        print(f"Run commands with BENCHPARK_SERVER={socket_path} benchpark ...")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
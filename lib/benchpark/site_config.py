@@ -0,0 +1,203 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import ast
+import copy
+import pathlib
+import shlex
+
+from benchpark.debug import debug_print
+import benchpark.yamlio
+
+#: The site-scope settings Benchpark knows how to write without asking the
+#: tool to do it. For each tool this maps a config path (as passed to
+#: ``<tool> config add``) to the file in the tool's source that defines the
+#: schema for that section. Values are validated against that schema (see
+#: ``read_schema``) before anything is written. A setting that is not listed
+#: here, or whose schema cannot be read from the checkout (i.e. the section
+#: changed in that version of the tool), or that cannot be validated because
+#: jsonschema is not installed, goes through the CLI.
+known_schemas = {
+    "spack": {
+        "repos": "lib/spack/spack/schema/repos.py",
+        "config:misc_cache": "lib/spack/spack/schema/config.py",
+    },
+    "ramble": {
+        "repos": "lib/ramble/ramble/schema/repos.py",
+        "modifier_repos": "lib/ramble/ramble/schema/modifier_repos.py",
+        "config:disable_progress_bar": "lib/ramble/ramble/schema/config.py",
+        "config:spack:global:args": "lib/ramble/ramble/schema/config.py",
+    },
+}
+
+
+def _dict_value(node, key):
+    """The value of ``key`` in the AST of a dict display, or None"""
+    if isinstance(node, ast.Dict):
+        for k, v in zip(node.keys, node.values):
+            if isinstance(k, ast.Constant) and k.value == key:
+                return v
+    return None
+
+
+def read_schema(schema_file, path):
+    """The JSON schema for the setting at config ``path`` (e.g.
+    ``config:misc_cache``), from the ``properties`` defined by the tool's
+    schema module ``schema_file``, or None if it is not there.
+
+    The module is read without being imported (it needs the tool's own
+    modules), so only a schema written as a literal can be used.
+    """
+    with open(schema_file) as f:
+        tree = ast.parse(f.read(), filename=str(schema_file))
+
+    node = None
+    for statement in tree.body:
+        if isinstance(statement, ast.Assign):
+            targets = statement.targets
+        elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+            targets = [statement.target]
+        else:
+            continue
+        if any(isinstance(t, ast.Name) and t.id == "properties" for t in targets):
+            node = statement.value
+
+    for depth, key in enumerate(path.split(":")):
+        if depth:
+            node = _dict_value(node, "properties")
+        node = _dict_value(node, key)
+    if node is None:
+        return None
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+#: ``<tool> repo add`` option selecting each repo section
+repo_type_options = {"repos": "", "modifier_repos": "-t modifiers "}
+
+
+class SiteConfig:
+    """Edits the site-scope configuration (``etc/<tool>/*.yaml``) of a
+    Spack or Ramble checkout.
+
+    Starting ``spack``/``ramble`` just to run ``config add`` or ``repo add``
+    takes seconds per call, so settings with a known schema are written
+    directly, once per file, when ``write()`` is called. Other settings are
+    handed to ``command`` (a ``benchpark.runtime.Command`` for the tool).
+    """
+
+    def __init__(self, tool, prefix, command=None):
+        self.tool = tool
+        self.prefix = pathlib.Path(prefix)
+        self.command = command
+        self.config_dir = self.prefix / "etc" / tool
+        self._data = {}
+        self._deferred = []
+        self._schemas = {}
+
+    def _schema_for(self, path):
+        """The JSON schema for ``path``, or None if it must go through the
+        CLI.
+        """
+        if path not in self._schemas:
+            schema = None
+            schema_file = known_schemas[self.tool].get(path)
+            if schema_file and (self.prefix / schema_file).exists():
+                try:
+                    import jsonschema  # noqa: F401
+                except ImportError:
+                    debug_print("jsonschema is not installed")
+                else:
+                    schema = read_schema(self.prefix / schema_file, path)
+            self._schemas[path] = schema
+        return self._schemas[path]
+
+    def _validate(self, path, value, where=""):
+        import jsonschema
+
+        try:
+            jsonschema.validate(value, self._schemas[path])
+        except jsonschema.ValidationError as e:
+            raise ValueError(
+                f"{where}Invalid {self.tool} setting {path}: {e.message}"
+            ) from None
+
+    def _check(self, name, data):
+        """Raise ValueError if a known setting in section ``name``, as it
+        will be written (existing settings included), does not match the
+        tool's schema.
+        """
+        for path, schema in self._schemas.items():
+            section, *keys = path.split(":")
+            if section != name or schema is None:
+                continue
+            node = data
+            for key in [section] + keys:
+                if not isinstance(node, dict) or key not in node:
+                    break
+                node = node[key]
+            else:
+                self._validate(path, node, f"{name}.yaml in {self.config_dir}: ")
+
+    def _section(self, name):
+        if name not in self._data:
+            data = None
+            config_file = self.config_dir / f"{name}.yaml"
+            if config_file.exists():
+                # Copied, since the section is edited in place
+                data = copy.deepcopy(benchpark.yamlio.load(config_file))
+            self._data[name] = data or {}
+        return self._data[name]
+
+    def add_repo(self, repo_path, section="repos"):
+        """Equivalent of ``<tool> repo add --scope=site``"""
+        repo_path = str(repo_path)
+        if self._schema_for(section) is None:
+            option = repo_type_options[section]
+            self._deferred.append(f"repo add {option}--scope=site {repo_path}")
+            return
+
+        data = self._section(section)
+        repos = data.setdefault(section, [])
+        if not isinstance(repos, list):
+            raise ValueError(f"{section}.yaml in {self.config_dir} is not a list")
+        # Like the tools, put newly added repos first
+        if repo_path not in repos:
+            repos.insert(0, repo_path)
+
+    def set(self, path, value):
+        """Equivalent of ``<tool> config --scope=site add <path>:<value>``"""
+        if self._schema_for(path) is None:
+            entry = shlex.quote(f"{path}:{value}")
+            self._deferred.append(f"config --scope=site add {entry}")
+            return
+
+        self._validate(path, value)
+
+        section, *keys = path.split(":")
+        node = self._section(section).setdefault(section, {})
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+
+    def write(self):
+        self.config_dir.mkdir(parents=True, exist_ok=True)
+        for name, data in self._data.items():
+            self._check(name, data)
+        for name, data in self._data.items():
+            destination = self.config_dir / f"{name}.yaml"
+            debug_print(f"Writing {destination}")
+            # Written atomically, so the tool never sees a partial file
+            benchpark.yamlio.write(destination, data)
+        self._data = {}
+
+        for args in self._deferred:
+            if self.command is None:
+                raise ValueError(f"No {self.tool} command to run '{args}'")
+            debug_print(f"Falling back to '{self.tool} {args}'")
+            self.command(args)
+        self._deferred = []
@@ -5,19 +5,22 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
+import collections
+import collections.abc
 import enum
+import functools
 import io
 import json
 import pathlib
 import re
-from typing import Iterable, Iterator, List, Match, Optional, Union
+from typing import Iterable, Iterator, List, Mapping, Match, Optional, Union
 
-import benchpark.paths
 import benchpark.repo
 import benchpark.runtime
+import benchpark.timing
+import benchpark.yamlio
 
-bootstrapper = benchpark.runtime.RuntimeResources(benchpark.paths.benchpark_home)
-bootstrapper.bootstrap()
+benchpark.runtime.bootstrap()
 
 import llnl.util.lang  # noqa
 
@@ -29,7 +32,7 @@ class VariantMap(llnl.util.lang.HashableMap):
     def __init__(self, init: "VariantMap" = None):
         super().__init__()
         if init:
-            self.dict = init.dict.copy()
+            self.dict = dict(init.items())
 
     def __setitem__(self, name: str, values: Union[str, Iterable]):
         if name in self.dict:
@@ -55,6 +58,17 @@ class VariantMap(llnl.util.lang.HashableMap):
             name in self and set(self[name]) >= set(other[name]) for name in other
         )
 
+    def _key(self) -> tuple:
+        return tuple(sorted(self.dict.items()))
+
+    def __eq__(self, other):
+        if not isinstance(other, (VariantMap, FrozenVariantMap)):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
     def constrain(self, other: "VariantMap") -> None:
         for name in other:
             self_values = list(self.dict.get(name, []))
@@ -99,11 +113,78 @@ class VariantMap(llnl.util.lang.HashableMap):
         return string.getvalue()
 
 
-class ConcreteVariantMap(VariantMap):
-    def __setitem__(self, name, values):
-        raise TypeError(f"{self.__class__} is immutable.")
+class FrozenVariantMap(collections.abc.Mapping):
+    """Immutable variants, for specs that are shared or concrete.
+
+    These are compared and hashed far more often than they are built (e.g.
+    every ``satisfies()`` in an experiment), so the sorted items, their hash
+    and the set of values of each variant are computed once, up front.
+    """
+
+    __slots__ = "_values", "_sets", "_items", "_hash"
+
+    def __init__(self, init: Optional[Mapping] = None):
+        values = {}
+        for name, value in sorted((init or {}).items()):
+            values[name] = (value,) if isinstance(value, str) else tuple(value)
+        self._values = values
+        self._sets = {name: frozenset(v) for name, v in values.items()}
+        self._items = tuple(values.items())
+        self._hash = hash(self._items)
+
+    def __getitem__(self, name: str) -> tuple:
+        return self._values[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
 
-    def intersects(self, other: VariantMap) -> bool:
+    def _key(self) -> tuple:
+        return self._items
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenVariantMap):
+            return self._hash == other._hash and self._items == other._items
+        if isinstance(other, VariantMap):
+            return self._items == other._key()
+        return NotImplemented
+
+    def __hash__(self):
+        return self._hash
+
+    def intersects(self, other: Mapping) -> bool:
+        if isinstance(other, ConcreteVariantMap):
+            return other.intersects(self)
+
+        # always possible to constrain since abstract variants are multi-value
+        return True
+
+    def satisfies(self, other: Mapping) -> bool:
+        if isinstance(other, FrozenVariantMap):
+            other_sets = other._sets
+        else:
+            other_sets = {name: frozenset(v) for name, v in other.items()}
+
+        sets = self._sets
+        for name, other_values in other_sets.items():
+            values = sets.get(name)
+            if values is None or not values >= other_values:
+                return False
+        return True
+
+    stringify = staticmethod(VariantMap.stringify)
+    __str__ = VariantMap.__str__
+
+
+class ConcreteVariantMap(FrozenVariantMap):
+    __slots__ = ()
+
+    def intersects(self, other: Mapping) -> bool:
         return self.satisfies(other)
 
 
@@ -189,16 +270,13 @@ class Spec(object):
         self._variants = other.variants
 
     def _parse(self, string: str):
-        specs = SpecParser(
-            type(self), string
-        ).all_specs()  # parse spec of appropriate type
-        assert len(specs) == 1, f"{string} does not parse to one spec"
-
-        self._dup(specs[0])
+        self._dup(parse_spec(type(self), string))  # parse spec of appropriate type
+        # The parsed spec is shared, so this one needs variants of its own
+        self._variants = VariantMap(self._variants)
 
     def intersects(self, other: Union[str, "Spec"]) -> bool:
         if not isinstance(other, Spec):
-            other = Spec(other)  # subclasses do not override intersects behavior
+            other = parse_spec(Spec, other)  # subclasses do not override intersects
         return (
             (self.name is None or other.name is None or self.name == other.name)
             and (
@@ -211,7 +289,7 @@ class Spec(object):
 
     def satisfies(self, other: Union[str, "Spec"]) -> bool:
         if not isinstance(other, Spec):
-            other = Spec(other)  # subclasses do not override satisfies behavior
+            other = parse_spec(Spec, other)  # subclasses do not override satisfies
         return (
             (other.name is None or self.name == other.name)
             and (other.namespace is None or self.namespace == other.namespace)
@@ -220,7 +298,7 @@ class Spec(object):
 
     def constrain(self, other: Union[str, "Spec"]) -> None:
         if not isinstance(other, Spec):
-            other = Spec(other)
+            other = parse_spec(Spec, other)
         if other.name:
             if self.name and self.name != other.name:
                 raise Exception
@@ -244,6 +322,8 @@ class Spec(object):
 
 
 class ExperimentSpec(Spec):
+    object_type = benchpark.repo.ObjectTypes.experiments
+
     @property
     def experiment_class(self):
         return repo_path.get_obj_class(self.name)
@@ -260,7 +340,8 @@ class ExperimentSpec(Spec):
 class ConcreteSpec(Spec):
     def __init__(self, str_or_spec: Union[str, Spec]):
         super().__init__(str_or_spec)
-        self._concretize()
+        with benchpark.timing.span(f"concretize {self.name}"):
+            self._concretize()
 
     @property
     def name(self):
@@ -286,12 +367,47 @@ class ConcreteSpec(Spec):
     def variants(self, value: str):
         raise TypeError(f"{self.__class__} is immutable")
 
+    def to_dict(self) -> dict:
+        """A JSON/YAML-friendly form of this spec, which ``from_dict`` (or
+        ``load_concrete_spec``) turns back into a concrete spec.
+        """
+        return {
+            "type": self.object_type.name,
+            "name": self.name,
+            "namespace": self.namespace,
+            "variants": {name: list(values) for name, values in self.variants.items()},
+            "repo-hash": benchpark.repo.content_hash(self.object_type),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ConcreteSpec":
+        """Rebuild a spec written by ``to_dict`` without concretizing it (and
+        so without importing its class).
+        """
+        spec = cls.__new__(cls)
+        spec._name = data["name"]
+        spec._namespace = data["namespace"]
+        spec._variants = ConcreteVariantMap(data["variants"])
+        return spec
+
+    def write_json(self, path):
+        # Atomically, like the rest of a description: a truncated spec.json
+        # next to a complete experiment_id.yaml would be taken as valid
+        with benchpark.yamlio.atomic_write(path) as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
     def _concretize(self):
         if not self.name:
             raise AnonymousSpecError(f"Cannot concretize anonymous {type(self)} {self}")
 
+        # The first lookup imports the class from its repo
+        with benchpark.timing.span(f"load class {self.name}"):
+            object_class = self.object_class
+
         if not self.namespace:
-            self._namespace = self.object_class.namespace
+            self._namespace = object_class.namespace
+
+        index = variant_index(object_class)
 
         # For variants that are set, set whatever they imply
         variants_to_check = set(
@@ -304,9 +420,8 @@ class ConcreteSpec(Spec):
 
             conditions = [
                 w
-                for w, v_by_n in self.object_class.variants.items()
-                for n, v in v_by_n.items()
-                if n == name and v.validate_values_bool(values)
+                for w, v in index.by_name.get(name, ())
+                if v.validate_values_bool(values)
             ]
 
             if not conditions:
@@ -323,36 +438,168 @@ class ConcreteSpec(Spec):
                     variants_to_check.add((n, v))
             self.constrain(cond)
 
-        # Concretize variants that aren't set
+        # Concretize variants that aren't set. Each variant comes after the
+        # ones its conditions depend on, so one pass is enough unless the
+        # conditions depend on each other in a cycle.
         changed = True
         while changed:
             changed = False
-
-            for when, variants_by_name in self.object_class.variants.items():
-                for name, variant in variants_by_name.items():
+            for name in index.order:
+                if name in self.variants:
+                    continue
+                for when, variant in index.by_name[name]:
                     if self.satisfies(when):
-                        if name not in self.variants:
-                            changed = True
-                            self._variants[name] = variant.default
+                        self._variants[name] = variant.default
+                        changed = index.cyclic
+                        break
 
         # Validate all set variant values
         for name, values in self.variants.items():
-            try:
-                variant = next(
-                    v
-                    for w, v_by_n in self.object_class.variants.items()
-                    for n, v in v_by_n.items()
-                    if self.satisfies(w) and n == name
-                )
-            except StopIteration:
+            variant = next(
+                (v for w, v in index.by_name.get(name, ()) if self.satisfies(w)),
+                None,
+            )
+            if variant is None:
                 raise Exception(f"{name} is not a valid variant of {self.name}")
 
-            variant.validate_values(self.variants[name])
+            variant.validate_values(values)
 
         # Convert to immutable type
         self._variants = ConcreteVariantMap(self.variants)
 
 
+class VariantIndex:
+    """The variants of an Experiment/System class, arranged for concretizing.
+
+    ``by_name`` maps each variant name to the ``(when, Variant)`` pairs that
+    declare it, in declaration order. ``order`` lists the variant names so
+    that each comes after the variants named in its ``when`` conditions;
+    ``cyclic`` is True if that is impossible.
+    """
+
+    def __init__(self, variants):
+        self.by_name = {}
+        for when, variants_by_name in variants.items():
+            for name, variant in variants_by_name.items():
+                self.by_name.setdefault(name, []).append((when, variant))
+
+        # The variants each variant's conditions depend on
+        depends_on = {
+            name: set(
+                n
+                for when, _ in entries
+                for n in when.variants
+                if n != name and n in self.by_name
+            )
+            for name, entries in self.by_name.items()
+        }
+        self.order = _topological_order(depends_on)
+        self.cyclic = len(self.order) < len(self.by_name)
+        if self.cyclic:
+            self.order += [name for name in self.by_name if name not in self.order]
+
+
+def _topological_order(depends_on):
+    """Order the keys of ``depends_on`` so each comes after its dependencies.
+
+    Keys that are part of (or depend on) a cycle are left out.
+    """
+    remaining = {name: len(deps) for name, deps in depends_on.items()}
+    dependents = collections.defaultdict(list)
+    for name, deps in depends_on.items():
+        for dep in deps:
+            dependents[dep].append(name)
+
+    order = [name for name, count in remaining.items() if count == 0]
+    for name in order:  # order grows while we iterate over it
+        for dependent in dependents[name]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                order.append(dependent)
+    return order
+
+
+def variant_index(object_class) -> VariantIndex:
+    """The ``VariantIndex`` of ``object_class``, built on first use."""
+    # Look in the class itself: an index inherited from a base class
+    # would be missing the variants this class adds
+    index = object_class.__dict__.get("_variant_index")
+    if index is None:
+        index = VariantIndex(object_class.variants)
+        object_class._variant_index = index
+    return index
+
+
+def _variant_domain(variant) -> List[str]:
+    """The values to try for ``variant`` when enumerating concrete specs.
+
+    Variants that accept arbitrary values only get their default.
+    """
+    if variant.values is None:
+        return [str(variant.default)]
+    return [str(v).lower() if isinstance(v, bool) else str(v) for v in variant.values]
+
+
+def all_concretizations(spec: Spec) -> Iterator[ConcreteSpec]:
+    """Lazily generate every valid concrete spec that satisfies ``spec``.
+
+    Each variant that ``spec`` leaves unset takes each of its allowed values
+    in turn, if the ``when`` conditions for the variant hold for the values
+    chosen so far. Multi-valued variants only take one value at a time.
+    """
+    index = variant_index(spec.object_class)
+
+    def _copy(other):
+        # Specs share the variants they are copied from
+        copy = type(spec)(other)
+        copy._variants = VariantMap(other.variants)
+        return copy
+
+    partial = _copy(spec)
+    seen = set()
+
+    def _choose(position):
+        if position == len(index.order):
+            try:
+                concrete = _copy(partial).concretize()
+            except Exception:
+                return
+            if str(concrete) not in seen:
+                seen.add(str(concrete))
+                yield concrete
+            return
+
+        name = index.order[position]
+        if name in spec.variants:
+            yield from _choose(position + 1)
+            return
+
+        if index.cyclic:
+            # Conditions may depend on variants not chosen yet: try leaving
+            # this one to the concretizer as well as every value it can take
+            choices = [None] + list(
+                llnl.util.lang.dedupe(
+                    value
+                    for _, v in index.by_name[name]
+                    for value in _variant_domain(v)
+                )
+            )
+        else:
+            variant = next(
+                (v for w, v in index.by_name[name] if partial.satisfies(w)), None
+            )
+            choices = _variant_domain(variant) if variant else [None]
+
+        for value in choices:
+            if value is not None:
+                partial.variants[name] = value
+            yield from _choose(position + 1)
+            if value is not None:
+                del partial.variants[name]
+
+    return _choose(0)
+
+
 class ConcreteExperimentSpec(ConcreteSpec, ExperimentSpec):
     @property
     def experiment(self) -> "benchpark.Experiment":
@@ -360,6 +607,8 @@ class ConcreteExperimentSpec(ConcreteSpec, ExperimentSpec):
 
 
 class SystemSpec(Spec):
+    object_type = benchpark.repo.ObjectTypes.systems
+
     @property
     def system_class(self):
         cls = sys_repo.get_obj_class(self.name)
@@ -384,6 +633,31 @@ class ConcreteSystemSpec(ConcreteSpec, SystemSpec):
         return self.system_class(self)
 
 
+concrete_spec_types = {
+    benchpark.repo.ObjectTypes.experiments: ConcreteExperimentSpec,
+    benchpark.repo.ObjectTypes.systems: ConcreteSystemSpec,
+}
+
+
+def load_concrete_spec(path, check_repo: bool = True) -> ConcreteSpec:
+    """Read a spec written by ``ConcreteSpec.write_json``.
+
+    If the repo it was concretized against has changed since, it is
+    concretized again (unless ``check_repo`` is False), since its class may
+    now give it different variants.
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    object_type = benchpark.repo.ObjectTypes[data["type"]]
+    spec_type = concrete_spec_types[object_type]
+    spec = spec_type.from_dict(data)
+
+    if check_repo and data["repo-hash"] != benchpark.repo.content_hash(object_type):
+        return spec_type(Spec(str(spec)))
+    return spec
+
+
 # PARSING STUFF BELOW HERE
 
 #: Valid name for specs and variants. Here we are not using
@@ -569,6 +843,42 @@ def tokenize(text: str) -> Iterable[Token]:
         raise SpecTokenizationError(matches, text)
 
 
+#: Token kinds other than whitespace, in order of precedence
+SIGNIFICANT_TOKEN_TYPES = [token for token in TokenType if token != TokenType.WS]
+#: Regex to scan a valid text, skipping the whitespace before each token. The
+#: token regexes have no capturing groups, so the index of the group that
+#: matched is the position of its kind in ``SIGNIFICANT_TOKEN_TYPES``.
+SIGNIFICANT_TOKENS = re.compile(
+    r"\s*(?:" + "|".join(f"({token.regex})" for token in SIGNIFICANT_TOKEN_TYPES) + ")"
+)
+_KIND_BY_GROUP = [None] + SIGNIFICANT_TOKEN_TYPES
+
+
+def tokenize_significant(text: str) -> Iterator[Token]:
+    """Return a token generator from the text passed as input, without the
+    whitespace tokens.
+
+    Equivalent to filtering ``WS`` out of ``tokenize(text)``, but faster, as
+    this runs for every spec that is parsed.
+
+    Raises:
+        SpecTokenizationError: if we can't tokenize anymore, but didn't reach the
+            end of the input text.
+    """
+    end = 0
+    for match in SIGNIFICANT_TOKENS.finditer(text):
+        if match.start() != end:
+            break
+        group = match.lastindex
+        end = match.end()
+        yield Token(_KIND_BY_GROUP[group], match.group(group), match.start(group), end)
+
+    if end != len(text) and not text[end:].isspace():
+        # Let the general tokenizer find and report the error
+        for _ in tokenize(text):
+            pass
+
+
 class TokenContext:
     """Token context passed around by parsers"""
 
@@ -607,18 +917,14 @@ class SpecParser(object):
             self.literal_str = " ".join([quote_kvp(arg) for arg in literal])
         else:
             self.literal_str = literal
-        self.ctx = TokenContext(
-            filter(lambda x: x.kind != TokenType.WS, tokenize(self.literal_str))
-        )
+        self.ctx = TokenContext(tokenize_significant(self.literal_str))
         self.type = type
 
     def tokens(self) -> List[Token]:
         """Return the entire list of token from the initial text. White spaces are
         filtered out.
         """
-        return list(
-            filter(lambda x: x.kind != TokenType.WS, tokenize(self.literal_str))
-        )
+        return list(tokenize_significant(self.literal_str))
 
     def next_spec(self) -> Optional[Spec]:
         """Return the next spec parsed from text.
@@ -666,6 +972,37 @@ class SpecParser(object):
         return list(iter(self.next_spec, None))
 
 
+#: Number of distinct spec strings ``parse_spec`` remembers
+parse_cache_size = 4096
+
+
+@functools.lru_cache(maxsize=parse_cache_size)
+def parse_spec(spec_type: type, literal: str) -> Spec:
+    """Parse ``literal`` into a single spec of ``spec_type``.
+
+    The same string is parsed over and over (``satisfies()`` arguments,
+    ``when=`` conditions), so results are cached and shared: the returned
+    spec must not be modified. Use ``spec_type(literal)`` for a spec of
+    your own. ``parse_spec.cache_info()`` reports the hit rate.
+    """
+    specs = SpecParser(spec_type, literal).all_specs()
+    assert len(specs) == 1, f"{literal} does not parse to one spec"
+
+    spec = specs[0]
+    spec._variants = FrozenVariantMap(spec.variants)
+    return spec
+
+
+def parse_cache_summary() -> str:
+    info = parse_spec.cache_info()
+    lookups = info.hits + info.misses
+    hit_rate = 100.0 * info.hits / lookups if lookups else 0.0
+    return (
+        f"{lookups} lookups, {info.hits} hits ({hit_rate:.1f}%), "
+        f"{info.currsize}/{info.maxsize} specs cached"
+    )
+
+
 # ERROR HANDLING BELOW HERE
 
 
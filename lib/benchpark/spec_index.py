@@ -0,0 +1,89 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import collections
+from typing import Iterable, List
+
+
+class SpecIndex:
+    """Answers ``satisfies``/``intersects`` queries for many specs at once.
+
+    Each indexed spec is a bit position. For every name, namespace and
+    (variant, value), the index keeps the set of specs that have it as a
+    bitset (a Python int), so a query is a handful of bitwise ANDs over all
+    the specs instead of a ``Spec.satisfies`` call per spec.
+
+    The indexed specs should be concrete (or at least have every variant
+    set): their variants are taken as they are.
+    """
+
+    def __init__(self, specs: Iterable = ()):
+        self.specs = []
+        self._all = 0
+        self._by_name = collections.defaultdict(int)
+        self._by_namespace = collections.defaultdict(int)
+        self._by_value = collections.defaultdict(int)
+        for spec in specs:
+            self.add(spec)
+
+    def __len__(self):
+        return len(self.specs)
+
+    def add(self, spec):
+        bit = 1 << len(self.specs)
+        self.specs.append(spec)
+        self._all |= bit
+        self._by_name[spec.name] |= bit
+        self._by_namespace[spec.namespace] |= bit
+        for name, values in spec.variants.items():
+            for value in values:
+                self._by_value[(name, value)] |= bit
+
+    def _variants_mask(self, query) -> int:
+        mask = self._all
+        for name, values in query.variants.items():
+            for value in values:
+                mask &= self._by_value.get((name, value), 0)
+                if not mask:
+                    return 0
+        return mask
+
+    def satisfies_mask(self, query) -> int:
+        """Bitset of the specs ``s`` for which ``s.satisfies(query)``"""
+        mask = self._variants_mask(query)
+        if query.name is not None:
+            mask &= self._by_name.get(query.name, 0)
+        if query.namespace is not None:
+            mask &= self._by_namespace.get(query.namespace, 0)
+        return mask
+
+    def intersects_mask(self, query) -> int:
+        """Bitset of the specs ``s`` for which ``s.intersects(query)``"""
+        mask = self._variants_mask(query)
+        # Unlike satisfies(), a missing name/namespace on either side matches
+        by_name, by_namespace = self._by_name, self._by_namespace
+        if query.name is not None:
+            mask &= by_name.get(query.name, 0) | by_name.get(None, 0)
+        if query.namespace is not None:
+            mask &= by_namespace.get(query.namespace, 0) | by_namespace.get(None, 0)
+        return mask
+
+    @staticmethod
+    def positions(mask: int) -> List[int]:
+        """Positions (in the order specs were added) of the bits in ``mask``"""
+        # Most of the work is in bin(), which is much faster than clearing
+        # the lowest set bit of a large int one bit at a time
+        bits = bin(mask)[:1:-1]
+        return [i for i, bit in enumerate(bits) if bit == "1"]
+
+    def select(self, mask: int) -> List:
+        """The indexed specs whose bits are set in ``mask``, in index order"""
+        return [self.specs[i] for i in self.positions(mask)]
+
+    def satisfying(self, query) -> List:
+        return self.select(self.satisfies_mask(query))
+
+    def intersecting(self, query) -> List:
+        return self.select(self.intersects_mask(query))
@@ -9,17 +9,17 @@ import os
 import pathlib
 import sys
 
-import benchpark.paths
 from benchpark.directives import ExperimentSystemBase
 import benchpark.repo
-from benchpark.runtime import RuntimeResources
+import benchpark.runtime
+import benchpark.timing
+import benchpark.yamlio
 
 from typing import Dict, Tuple
 import benchpark.spec
 import benchpark.variant
 
-bootstrapper = RuntimeResources(benchpark.paths.benchpark_home)  # noqa
-bootstrapper.bootstrap()  # noqa
+bootstrapper = benchpark.runtime.bootstrap()  # noqa
 
 import ramble.config as cfg  # noqa
 import ramble.language.language_helpers  # noqa
@@ -39,10 +39,11 @@ schemas = {
 
 
 def load_schema(schema_id, schema_path):
-    schema_spec = importlib.util.spec_from_file_location(schema_id, schema_path)
-    schema = importlib.util.module_from_spec(schema_spec)
-    sys.modules[schema_id] = schema
-    schema_spec.loader.exec_module(schema)
+    with benchpark.timing.span(f"load {schema_id}"):
+        schema_spec = importlib.util.spec_from_file_location(schema_id, schema_path)
+        schema = importlib.util.module_from_spec(schema_spec)
+        sys.modules[schema_id] = schema
+        schema_spec.loader.exec_module(schema)
     return schema
 
 
@@ -93,16 +94,21 @@ class System(ExperimentSystemBase):
         output_dir = pathlib.Path(output_dir)
 
         variables_yaml = output_dir / "variables.yaml"
-        with open(variables_yaml, "w") as f:
-            f.write(self.variables_yaml())
+        with benchpark.timing.span("write variables.yaml"):
+            with benchpark.yamlio.atomic_write(variables_yaml) as f:
+                f.write(self.variables_yaml())
 
-        self.external_packages(output_dir)
-        self.compiler_description(output_dir)
+        with benchpark.timing.span("write packages.yaml"):
+            self.external_packages(output_dir)
+        with benchpark.timing.span("write compilers.yaml"):
+            self.compiler_description(output_dir)
+
+        self.spec.write_json(output_dir / "spec.json")
 
         spec_hash = self.system_uid()
 
         system_id_path = output_dir / "system_id.yaml"
-        with open(system_id_path, "w") as f:
+        with benchpark.yamlio.atomic_write(system_id_path) as f:
             f.write(
                 f"""\
 system:
@@ -120,7 +126,8 @@ system:
         for selection in selections[1:]:
             cfg.merge_yaml(data, cfg.read_config_file(selection, schema))
 
-        with open(dst_path, "w") as outstream:
+        # Spack's dumper keeps the ordering (and types) of Spack's config
+        with benchpark.yamlio.atomic_write(dst_path) as outstream:
             syaml.dump_config(data, outstream)
 
     def external_pkg_configs(self):
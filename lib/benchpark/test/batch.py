@@ -0,0 +1,87 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+import pytest
+
+import benchpark.batch
+from benchpark.batch import Result, read_manifest
+
+
+def _worker(spec, basedir, dest=None):
+    if "bad" in spec:
+        raise ValueError(f"cannot generate {spec}")
+    if "crash" in spec:
+        os._exit(1)
+    return dest or os.path.join(basedir, spec.replace(" ", "-"))
+
+
+def test_read_manifest(tmpdir):
+    manifest = tmpdir.join("specs.yaml")
+    manifest.write(
+        """\
+specs:
+- amg2023 programming_model=cuda
+- spec: saxpy
+  dest: nightly/saxpy
+"""
+    )
+    assert read_manifest(str(manifest)) == [
+        ("amg2023 programming_model=cuda", None),
+        ("saxpy", "nightly/saxpy"),
+    ]
+
+    manifest.write("- kripke\n- quicksilver\n")
+    assert read_manifest(str(manifest)) == [("kripke", None), ("quicksilver", None)]
+
+
+@pytest.mark.parametrize("content", ["specs: amg2023\n", "- dest: x\n", "42\n"])
+def test_read_manifest_errors(tmpdir, content):
+    manifest = tmpdir.join("specs.yaml")
+    manifest.write(content)
+    with pytest.raises(ValueError, match="specs.yaml"):
+        read_manifest(str(manifest))
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_run_isolates_errors(jobs):
+    tasks = [("a", "base"), ("bad spec", "base"), ("c x=1", "base", "there")]
+    results = benchpark.batch.run(_worker, tasks, jobs)
+
+    assert [(r.spec, r.ok, r.output) for r in results] == [
+        ("a", True, os.path.join("base", "a")),
+        ("bad spec", False, "ValueError: cannot generate bad spec"),
+        ("c x=1", True, "there"),
+    ]
+    assert all(r.seconds >= 0 for r in results)
+
+
+def test_run_survives_dead_worker():
+    if benchpark.batch.process_pool(2) is None:
+        pytest.skip("processes cannot be forked here")
+    specs = ["a1", "a2", "crash", "a4", "a5", "bad", "a7"]
+    results = benchpark.batch.run(_worker, [(spec, "base") for spec in specs], 2)
+
+    assert [r.spec for r in results] == specs
+    # Only the spec whose worker died fails, besides the one that raised
+    assert [r.spec for r in results if not r.ok] == ["crash", "bad"]
+    assert "BrokenProcessPool" in results[2].output
+
+
+def test_report(capsys):
+    results = [
+        Result("amg2023 programming_model=cuda", True, "out/1234", 1.5),
+        Result("saxpy", False, "ValueError: no", 0.25),
+    ]
+    assert benchpark.batch.report(results, "experiments") == 1
+
+    assert capsys.readouterr().out.splitlines() == [
+        "        time   spec                            output",
+        "ok      1.50s  amg2023 programming_model=cuda  out/1234",
+        "FAILED  0.25s  saxpy                           ValueError: no",
+        "",
+        "Generated 1 of 2 experiments",
+    ]
@@ -0,0 +1,157 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import collections
+
+import pytest
+
+import benchpark.budget
+import benchpark.cmd.budget
+import benchpark.paths
+from benchpark.expansion import Instance
+
+#: Like the variables.yaml of a system description
+system_variables = {
+    "timeout": "120",
+    "scheduler": "flux",
+    "sys_cores_per_node": "64",
+    "sys_gpus_per_node": "8",
+    "max_request": "1000",
+    "n_ranks": "1000001",
+    "n_nodes": "1000001",
+}
+
+applications = {
+    "app": {
+        "workloads": {
+            "problem": {
+                "experiments": {
+                    "app_{n_nodes}_{n}": {
+                        "variables": {
+                            "n_ranks_per_node": "8",
+                            "n_nodes": ["1", "2", "4", "8"],
+                            "n": ["10", "20", "30"],
+                        },
+                        "matrix": ["n_nodes", "n"],
+                    },
+                    "app_gpu_{n_gpus}": {
+                        "variables": {"n_gpus": ["8", "16"], "timeout": "30"},
+                    },
+                }
+            }
+        }
+    }
+}
+
+
+@pytest.mark.parametrize(
+    "variables,expected",
+    [
+        # The placeholders of the system are determined from the rest
+        ({"n_ranks_per_node": "8", "n_nodes": "2"}, (2, 16, None, 120)),
+        ({"n_ranks": "100"}, (2, 100, None, 120)),
+        ({"n_ranks": "64", "omp_num_threads": "4"}, (4, 64, None, 120)),
+        ({"n_gpus": "12", "timeout": "30"}, (2, 12, 12, 30)),
+    ],
+)
+def test_allocation(variables, expected):
+    instance = Instance(dict(system_variables, **variables))
+    assert benchpark.budget.allocation(instance) == expected
+
+
+@pytest.mark.parametrize(
+    "variables,error",
+    [
+        ({}, "Must specify one of"),
+        ({"n_ranks": "8", "n_cores_per_rank": "128"}, "more cores per rank"),
+        ({"n_gpus": "8", "sys_gpus_per_node": None}, "sys_gpus_per_node"),
+        ({"n_nodes": "100", "n_ranks_per_node": "64"}, "exceeds maximum"),
+    ],
+)
+def test_allocation_errors(variables, error):
+    instance = Instance(dict(system_variables, **variables))
+    with pytest.raises(ValueError, match=error):
+        benchpark.budget.allocation(instance)
+
+
+def test_estimate():
+    estimates = list(benchpark.budget.estimate(applications, system_variables))
+    assert len(estimates) == 14
+    assert estimates[0].name == "app_1_10"
+    assert estimates[0].point == {"n_nodes": "1", "n": "10"}
+    # 3 * (1 + 2 + 4 + 8) nodes for 2 hours, and 1 + 2 nodes for half an hour
+    assert benchpark.budget.total(estimates) == 91.5
+
+
+def _prune(budget, strategy):
+    estimates = list(benchpark.budget.estimate(applications, system_variables))
+    kept, dropped = benchpark.budget.prune(estimates, budget, strategy)
+    assert len(kept) + len(dropped) == len(estimates)
+    assert benchpark.budget.total(kept) <= budget
+    return kept, dropped
+
+
+def test_prune_largest_first():
+    kept, dropped = _prune(40, "largest-first")
+    assert [e.name for e in dropped] == ["app_4_30", "app_8_10", "app_8_20", "app_8_30"]
+    assert max(e.n_nodes for e in kept) == 4
+
+
+def test_prune_stratified():
+    kept, _ = _prune(40, "stratified")
+    # Every scale is represented
+    scales = collections.Counter(e.n_nodes for e in kept)
+    assert set(scales) == {1, 2, 4, 8}
+
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        _prune(40, "random")
+
+
+def test_spread():
+    assert benchpark.budget._spread(1) == [0]
+    assert benchpark.budget._spread(4) == [0, 2, 1, 3]
+    assert sorted(benchpark.budget._spread(7)) == list(range(7))
+
+
+@pytest.mark.parametrize("strategy", list(benchpark.budget.strategies))
+def test_restrict(strategy):
+    kept, dropped = _prune(20, strategy)
+    restricted = benchpark.budget.restrict(applications, kept, dropped)
+
+    # The restricted section expands to the instances that were kept
+    estimates = benchpark.budget.estimate(restricted, system_variables)
+    assert sorted(e.name for e in estimates) == sorted(e.name for e in kept)
+    # And the original is left alone
+    assert len(list(benchpark.budget.estimate(applications, system_variables))) == 14
+
+
+def test_restrict_removes_empty_sections():
+    kept, dropped = _prune(1, "largest-first")
+    assert [e.name for e in kept] == ["app_gpu_8"]
+    restricted = benchpark.budget.restrict(applications, kept, dropped)
+    experiments = restricted["app"]["workloads"]["problem"]["experiments"]
+    assert list(experiments) == ["app_gpu_{n_gpus}"]
+
+    restricted = benchpark.budget.restrict(applications, [], kept + dropped)
+    assert restricted == {}
+
+
+def test_budget_command(capsys):
+    experiment_dir = benchpark.paths.benchpark_root / "experiments/saxpy/openmp"
+    system_dir = (
+        benchpark.paths.benchpark_root
+        / "configs/LLNL-Tioga-HPECray-zen3-MI250X-Slingshot"
+    )
+    ramble, variables = benchpark.budget.read_workspace(experiment_dir, system_dir)
+    kept, dropped = benchpark.cmd.budget.plan(ramble, variables, 10, "largest-first")
+    assert [e.n_nodes for e in kept] == [1, 1, 1, 1]
+    assert len(dropped) == 4
+
+    print(benchpark.budget.summary(kept, dropped))
+    total = capsys.readouterr().out.splitlines()[-1]
+    assert total.split() == "total 4 of 8 8.0 of 24.0".split()
+
+    with pytest.raises(ValueError, match="No experiment instance fits"):
+        benchpark.cmd.budget.plan(ramble, variables, 1)
@@ -0,0 +1,141 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+import benchpark.paths
+from benchpark.completion import complete, split_line
+
+#: Wall-clock budget (in seconds) for answering a completion in a new
+#: process, not counting the interpreter's own startup
+completion_budget = float(os.environ.get("BENCHPARK_COMPLETION_BUDGET", "0.2"))
+
+benchpark_exe = str(benchpark.paths.benchpark_root / "bin" / "benchpark")
+completion_script = str(
+    benchpark.paths.benchpark_root / "share" / "benchpark" / "benchpark-completion.bash"
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmpdir, monkeypatch):
+    cache_path = pathlib.Path(tmpdir) / "cache"
+    monkeypatch.setattr(benchpark.paths, "cache_path", cache_path)
+    return cache_path
+
+
+@pytest.mark.parametrize(
+    "words,expected",
+    [
+        (["exp"], ["experiment"]),
+        (["experiment", ""], ["init", "preview", "list"]),
+        (["--ti"], ["--timings"]),
+        (["experiment", "init", "--a"], ["--all-variants"]),
+        (["experiment", "init", "--dest", ""], []),
+        (["experiment", "init", "amg"], ["amg2023"]),
+        (["experiment", "preview", "amg"], ["amg2023"]),
+        (["system", "init", "ti"], ["tioga"]),
+        (["experiment", "init", "amg2023", "prog"], ["programming_model="]),
+        (
+            ["experiment", "init", "amg2023", "programming_model=c"],
+            ["programming_model=cuda"],
+        ),
+        (
+            ["experiment", "init", "amg2023", "workload=problem1", "w"],
+            [],
+        ),
+        (["system", "init", "tioga", "gtl="], ["gtl=true", "gtl=false"]),
+        (["system", "init", "tioga", "nope="], []),
+        (["audit", ""], []),
+    ],
+)
+def test_complete(words, expected):
+    assert complete(words) == expected
+
+
+def test_cli_description_is_cached(cache_path, monkeypatch):
+    complete([""])
+    assert (cache_path / "completion-cli.json").exists()
+
+    import main
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the parser was built again")
+
+    monkeypatch.setattr(main, "make_parser", fail)
+    assert "experiment" in complete([""])
+
+
+@pytest.mark.parametrize(
+    "line,expected",
+    [
+        ("benchpark ", ["benchpark", ""]),
+        ("benchpark exp", ["benchpark", "exp"]),
+        (
+            "benchpark experiment init 'amg2023",
+            ["benchpark", "experiment", "init", "amg2023"],
+        ),
+    ],
+)
+def test_split_line(line, expected):
+    assert split_line(line) == expected
+
+
+def _run(args, env):
+    start = time.perf_counter()
+    result = subprocess.run(args, env=env, check=True, capture_output=True, text=True)
+    return result.stdout, time.perf_counter() - start
+
+
+def test_completion_process(tmpdir):
+    env = dict(os.environ, HOME=str(tmpdir))
+    line = "benchpark experiment init amg2023 p"
+    # The first completion builds the caches
+    _run([sys.executable, benchpark_exe, "_complete", line], env)
+
+    _, startup = _run([sys.executable, "-c", "pass"], env)
+    output, elapsed = _run([sys.executable, benchpark_exe, "_complete", line], env)
+    print(f"completion: {elapsed * 1000:.1f} ms ({startup * 1000:.1f} ms startup)")
+    assert output == "programming_model=\n"
+    assert elapsed - startup < completion_budget
+
+    script = f"""
+import sys
+sys.path.insert(0, "{benchpark.paths.benchpark_root / 'lib'}")
+import benchpark.completion
+benchpark.completion.main(["{line}"])
+assert "ramble" not in sys.modules, "ramble was imported"
+assert "main" not in sys.modules, "main was imported"
+"""
+    _run([sys.executable, "-c", script], env)
+
+
+@pytest.mark.skipif(not shutil.which("bash"), reason="bash is not available")
+def test_bash_completion(tmpdir):
+    # As bash sees it: "=" is a word break
+    script = f"""
+source {completion_script}
+COMP_LINE="benchpark experiment init amg2023 programming_model=cu"
+COMP_POINT=${{#COMP_LINE}}
+COMP_WORDS=({benchpark_exe} experiment init amg2023 programming_model = cu)
+COMP_CWORD=6
+_benchpark
+echo "${{COMPREPLY[@]}}"
+COMP_WORDS=({benchpark_exe} experiment init amg2023 programming_model =)
+COMP_LINE="benchpark experiment init amg2023 programming_model="
+COMP_POINT=${{#COMP_LINE}}
+COMP_CWORD=5
+_benchpark
+echo "${{COMPREPLY[@]}}"
+"""
+    env = dict(os.environ, HOME=str(tmpdir))
+    output, _ = _run(["bash", "-c", script], env)
+    assert output.splitlines() == ["cuda", "=openmp =cuda =rocm"]
@@ -0,0 +1,164 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import time
+
+import pytest
+
+from benchpark.spec import (
+    ConcreteSpec,
+    Spec,
+    VariantIndex,
+    all_concretizations,
+    variant_index,
+)
+from benchpark.variant import Variant
+
+#: Wall-clock budget (in seconds) for concretizing a spec of a synthetic
+#: class with ``benchmark_variants`` chained conditional variants (only
+#: checked with BENCHPARK_BENCHMARKS=1)
+concretize_budget = float(os.environ.get("BENCHPARK_CONCRETIZE_BUDGET", "1.0"))
+benchmark_variants = 500
+
+
+def synthetic_spec_type(declarations):
+    """A spec type whose object class declares ``declarations``, a list of
+    ``(when, name, default, values)``.
+    """
+    variants = {}
+    for when, name, default, values in declarations:
+        when_spec = Spec(when) if when else Spec()
+        variants.setdefault(when_spec, {})[name] = Variant(name, default, "", values)
+
+    object_class = type(
+        "Synthetic", (), {"variants": variants, "namespace": "synthetic"}
+    )
+
+    class SyntheticSpec(Spec):
+        def concretize(self):
+            return ConcreteSyntheticSpec(self)
+
+    SyntheticSpec.object_class = object_class
+
+    class ConcreteSyntheticSpec(ConcreteSpec, SyntheticSpec):
+        pass
+
+    return SyntheticSpec
+
+
+def chain(n, reverse=False):
+    """``n`` variants, each only available when the previous one is on."""
+    declarations = [(None, "v0", "on", ("on", "off"))]
+    for i in range(1, n):
+        declarations.append((f"v{i - 1}=on", f"v{i}", "on", ("on", "off")))
+    return declarations[::-1] if reverse else declarations
+
+
+def test_variant_index_order():
+    index = VariantIndex(
+        synthetic_spec_type(chain(5, reverse=True)).object_class.variants
+    )
+    assert index.order == ["v0", "v1", "v2", "v3", "v4"]
+    assert not index.cyclic
+
+    cycle = [("b=x", "a", "x", ("x", "y")), ("a=x", "b", "x", ("x", "y"))]
+    index = VariantIndex(synthetic_spec_type(cycle).object_class.variants)
+    assert index.cyclic
+    assert sorted(index.order) == ["a", "b"]
+
+
+def test_index_is_built_once():
+    spec_type = synthetic_spec_type(chain(3))
+    spec_type("x").concretize()
+    index = variant_index(spec_type.object_class)
+    spec_type("x v0=off").concretize()
+    assert variant_index(spec_type.object_class) is index
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_concretize_conditional_variants(reverse):
+    spec_type = synthetic_spec_type(chain(4, reverse=reverse))
+
+    assert str(spec_type("x").concretize()) == "synthetic.x v0=on v1=on v2=on v3=on"
+    # Turning off a variant removes the ones that depend on it
+    assert str(spec_type("x v1=off").concretize()) == "synthetic.x v0=on v1=off"
+    # Setting a variant sets what it depends on
+    assert str(spec_type("x v2=off").concretize()) == "synthetic.x v0=on v1=on v2=off"
+
+    for invalid in ("x v9=on", "x v0=maybe"):
+        with pytest.raises(Exception, match="not a valid variant"):
+            spec_type(invalid).concretize()
+
+
+def test_concretize_cyclic_conditions():
+    cycle = [
+        (None, "a", "x", ("x", "y")),
+        ("a=x", "b", "x", ("x", "y")),
+        ("b=x", "c", "x", ("x", "y")),
+        ("c=y", "a", "y", ("x", "y")),
+    ]
+    spec = synthetic_spec_type(cycle)("x").concretize()
+    assert str(spec) == "synthetic.x a=x b=x c=x"
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_all_concretizations(reverse):
+    spec_type = synthetic_spec_type(chain(3, reverse=reverse))
+
+    specs = [str(s) for s in all_concretizations(spec_type("x"))]
+    assert specs == [
+        "synthetic.x v0=on v1=on v2=on",
+        "synthetic.x v0=on v1=on v2=off",
+        "synthetic.x v0=on v1=off",
+        "synthetic.x v0=off",
+    ]
+
+    # Variants set in the spec are kept
+    specs = [str(s) for s in all_concretizations(spec_type("x v1=on"))]
+    assert specs == ["synthetic.x v0=on v1=on v2=on", "synthetic.x v0=on v1=on v2=off"]
+
+
+def test_all_concretizations_is_lazy():
+    free = [(None, f"v{i}", "a", ("a", "b")) for i in range(40)]
+    spec_type = synthetic_spec_type(free)
+    first = next(all_concretizations(spec_type("x")))
+    assert all(values == ("a",) for values in first.variants.values())
+
+
+def test_all_concretizations_cyclic():
+    cycle = [
+        (None, "a", "x", ("x", "y")),
+        ("a=x", "b", "x", ("x", "y")),
+        ("b=y", "a", "y", ("x", "y")),
+    ]
+    specs = sorted(str(s) for s in all_concretizations(synthetic_spec_type(cycle)("x")))
+    assert specs == [
+        "synthetic.x a=x b=x",
+        "synthetic.x a=x b=y",
+        "synthetic.x a=y",
+    ]
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_concretize_long_chain(reverse):
+    spec_type = synthetic_spec_type(chain(benchmark_variants, reverse=reverse))
+    spec = spec_type("x").concretize()
+    assert len(spec.variants) == benchmark_variants
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("reverse", [False, True])
+def test_concretize_benchmark(reverse):
+    spec_type = synthetic_spec_type(chain(benchmark_variants, reverse=reverse))
+    # Index outside the timed region, as the class would already be loaded
+    variant_index(spec_type.object_class)
+
+    start = time.perf_counter()
+    spec = spec_type("x").concretize()
+    elapsed = time.perf_counter() - start
+
+    assert len(spec.variants) == benchmark_variants
+    assert elapsed < concretize_budget
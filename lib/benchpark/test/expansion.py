@@ -0,0 +1,209 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import itertools
+import time
+
+import pytest
+
+import benchpark.cmd.experiment
+from benchpark.expansion import ExperimentMatrix, application_matrices, evaluate
+
+#: The experiment amg2023 generates for programming_model=openmp
+amg2023_openmp = {
+    "amg2023": {
+        "workloads": {
+            "problem1": {
+                "experiments": {
+                    "amg2023_omp_{n_nodes}_{n_threads_per_proc}_{nx}": {
+                        "variables": {
+                            "n_nodes": ["1", "2"],
+                            "n_ranks": "8",
+                            "n_threads_per_proc": ["4", "6", "12"],
+                            "nx": ["55", "110"],
+                            "ny": ["55", "110"],
+                            "nz": ["55", "110"],
+                        },
+                        "zips": {"size": ["nx", "ny", "nz"]},
+                        "exclude": {
+                            "where": [
+                                "{n_threads_per_proc} * {n_ranks} > "
+                                "{n_nodes} * {sys_cores_per_node}"
+                            ]
+                        },
+                        "matrices": [
+                            {
+                                "size_nodes_threads": [
+                                    "size",
+                                    "n_nodes",
+                                    "n_threads_per_proc",
+                                ]
+                            }
+                        ],
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+def _names(matrix):
+    return [instance.name for instance in matrix]
+
+
+@pytest.mark.parametrize(
+    "expression,value",
+    [
+        ("2 * 3 + 1", 7),
+        ("12 * 8 > 1 * 48", True),
+        ("1 < 2 < 3 and not 0", True),
+        ("'cuda' == 'rocm' or 4 // 3 == 1", True),
+        ("int(64 / 6) + max(1, 2)", 12),
+    ],
+)
+def test_evaluate(expression, value):
+    assert evaluate(expression) == value
+
+
+@pytest.mark.parametrize(
+    "expression", ["x + 1", "__import__('os')", "1 +", "[1]", "int(x=1)"]
+)
+def test_evaluate_rejects(expression):
+    with pytest.raises(ValueError):
+        evaluate(expression)
+
+
+def test_amg2023_expansion():
+    ((app, workload, matrix),) = application_matrices(
+        amg2023_openmp, {"sys_cores_per_node": "48"}
+    )
+    assert (app, workload) == ("amg2023", "problem1")
+    assert matrix.size == 12
+
+    names = _names(matrix)
+    # 12 threads * 8 ranks > 1 node * 48 cores
+    assert len(names) == 10
+    assert names[:3] == [
+        "amg2023_omp_1_4_55",
+        "amg2023_omp_1_6_55",
+        "amg2023_omp_2_4_55",
+    ]
+    assert matrix.undecided == 0
+
+
+def test_undefined_variables_keep_instances():
+    ((_, _, matrix),) = application_matrices(amg2023_openmp)
+    assert len(_names(matrix)) == 12
+    assert matrix.undecided == 12
+    assert matrix.undefined == {"sys_cores_per_node"}
+
+
+def test_vectors_are_crossed_with_matrices():
+    # Like saxpy: n_nodes is not in the matrix, so it is iterated on its own
+    matrix = ExperimentMatrix(
+        "saxpy_{n}_{n_nodes}_{omp_num_threads}",
+        {
+            "variables": {
+                "n_nodes": ["1", "2"],
+                "omp_num_threads": ["2", "4"],
+                "n": ["512", "1024"],
+            },
+            "matrices": [{"size_threads": ["n", "omp_num_threads"]}],
+        },
+    )
+    assert matrix.size == 8
+    assert _names(matrix) == [
+        f"saxpy_{n}_{nodes}_{threads}"
+        for nodes in ("1", "2")
+        for n in ("512", "1024")
+        for threads in ("2", "4")
+    ]
+
+
+def test_vectors_and_zips_iterate_together():
+    matrix = ExperimentMatrix(
+        "{a}_{b}_{c}",
+        {"variables": {"a": ["1", "2"], "b": ["x", "y"], "c": "z"}},
+    )
+    assert _names(matrix) == ["1_x_z", "2_y_z"]
+
+    with pytest.raises(ValueError, match="same length"):
+        ExperimentMatrix("e", {"variables": {"a": ["1", "2"], "b": ["x"]}})
+    with pytest.raises(ValueError, match="same size"):
+        ExperimentMatrix(
+            "e",
+            {"variables": {"a": ["1", "2"], "b": ["x"]}, "matrices": [["a"], ["b"]]},
+        )
+    with pytest.raises(ValueError, match="not list variables"):
+        ExperimentMatrix("e", {"variables": {"a": "1"}, "matrix": ["a"]})
+
+
+def test_expansion_and_math():
+    matrix = ExperimentMatrix(
+        "run_{n_ranks}",
+        {
+            "variables": {
+                "n_nodes": ["1", "4"],
+                "processes_per_node": "{cores}",
+                "cores": 36,
+                "n_ranks": "{n_nodes}*{processes_per_node}",
+                "label": "{n_ranks} ranks ({undefined})",
+            }
+        },
+    )
+    instances = list(matrix)
+    assert [i.name for i in instances] == ["run_36", "run_144"]
+    assert instances[1].get("label") == "144 ranks ({undefined})"
+    assert instances[1].resources() == ("4", "144", None)
+
+    # A literal value is left alone, even if it looks like arithmetic
+    matrix = ExperimentMatrix("{cuda}", {"variables": {"cuda": "11-8-0"}})
+    assert _names(matrix) == ["11-8-0"]
+
+
+def test_exclude_variables():
+    matrix = ExperimentMatrix(
+        "{a}{b}",
+        {
+            "variables": {"a": ["1", "2", "3"], "b": ["x", "y"]},
+            "matrix": ["a", "b"],
+            "exclude": {
+                "variables": {"a": ["1", "3"], "b": "y"},
+            },
+        },
+    )
+    assert _names(matrix) == ["1x", "2x", "2y", "3x"]
+
+
+def test_millions_of_points_are_lazy():
+    # 100 ** 4 = 100 million points
+    variables = {name: [str(i) for i in range(100)] for name in "abcd"}
+    matrix = ExperimentMatrix(
+        "{a}_{b}_{c}_{d}", {"variables": variables, "matrix": list("abcd")}
+    )
+
+    start = time.perf_counter()
+    assert matrix.size == 100**4
+    first = _names(itertools.islice(matrix, 3))
+    elapsed = time.perf_counter() - start
+
+    assert first == ["0_0_0_0", "0_0_0_1", "0_0_0_2"]
+    assert elapsed < 1.0
+
+
+def test_preview_output(capsys):
+    ((_, _, matrix),) = application_matrices(amg2023_openmp)
+    benchpark.cmd.experiment._preview_experiment(matrix, 2, False)
+
+    assert capsys.readouterr().out.splitlines() == [
+        "  12 instances (12 before exclusions)",
+        "  n_nodes  n_ranks  n_gpus  name",
+        "  1        8        -       amg2023_omp_1_4_55",
+        "  1        8        -       amg2023_omp_1_6_55",
+        "  ... (--limit to show more)",
+        "  12 instances kept: cannot evaluate exclusions without "
+        "sys_cores_per_node (see --system and --var)",
+    ]
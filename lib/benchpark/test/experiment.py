@@ -2,9 +2,11 @@
 # Benchpark Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: Apache-2.0
+import pytest
 import yaml
 
 import benchpark.experiment
+import benchpark.repo
 import benchpark.spec
 
 
@@ -79,3 +81,87 @@ def test_default_modifiers_section():
     modifiers_section = experiment.compute_modifiers_section()
 
     assert modifiers_section == [{"name": "allocation"}]
+
+
+def test_experiment_uid():
+    spec = benchpark.spec.ExperimentSpec("saxpy").concretize()
+    same = benchpark.spec.ExperimentSpec(str(spec)).concretize()
+    other = benchpark.spec.ExperimentSpec("saxpy programming_model=cuda").concretize()
+
+    uid = spec.experiment.experiment_uid()
+    assert len(uid) == 64
+    assert same.experiment.experiment_uid() == uid
+    assert other.experiment.experiment_uid() != uid
+
+
+def test_description_is_current(monkeypatch, tmpdir):
+    spec = benchpark.spec.ExperimentSpec("saxpy").concretize()
+    experiment = spec.experiment
+    for name in ["include", "config", "modifiers", "applications", "spack"]:
+        monkeypatch.setattr(experiment, f"compute_{name}_section", lambda: True)
+
+    assert not experiment.description_is_current(tmpdir)
+    experiment.generate_description(tmpdir)
+    assert experiment.description_is_current(tmpdir)
+
+    other = benchpark.spec.ExperimentSpec("saxpy programming_model=cuda").concretize()
+    assert not other.experiment.description_is_current(tmpdir)
+
+    # Changing the experiment's source makes the description outdated
+    monkeypatch.setattr(experiment, "source_hash", lambda: "changed")
+    assert not experiment.description_is_current(tmpdir)
+
+
+def test_spec_json_roundtrip(monkeypatch, tmpdir):
+    spec = benchpark.spec.ExperimentSpec("saxpy programming_model=cuda").concretize()
+    path = tmpdir.join("spec.json")
+    spec.write_json(path)
+
+    concretized = []
+    concretize = benchpark.spec.ConcreteSpec._concretize
+    monkeypatch.setattr(
+        benchpark.spec.ConcreteSpec,
+        "_concretize",
+        lambda self: concretized.append(self) or concretize(self),
+    )
+
+    loaded = benchpark.spec.load_concrete_spec(path)
+    assert isinstance(loaded, benchpark.spec.ConcreteExperimentSpec)
+    assert loaded == spec and str(loaded) == str(spec)
+    assert not concretized
+    with pytest.raises(TypeError):
+        loaded.variants["other"] = "value"
+
+    # Specs written against another version of the repo are concretized again
+    monkeypatch.setattr(benchpark.repo, "content_hash", lambda object_type: "changed")
+    assert benchpark.spec.load_concrete_spec(path) == spec
+    assert len(concretized) == 1
+
+
+def test_update_description(monkeypatch, tmpdir):
+    spec = benchpark.spec.ExperimentSpec("saxpy").concretize()
+    experiment = spec.experiment
+    experiment.generate_description(tmpdir)
+    ramble_yaml = tmpdir.join("ramble.yaml")
+    mtime = ramble_yaml.mtime()
+
+    # Nothing is rewritten when nothing changed
+    changes = experiment.update_description(tmpdir)
+    assert not any(changes)
+    assert ramble_yaml.mtime() == mtime
+
+    applications = experiment.compute_applications_section()
+    ((workload_name, workload),) = applications["saxpy"]["workloads"].items()
+    ((experiment_name, definition),) = workload["experiments"].items()
+    definition["variables"]["n"] = ["512", "2048"]
+    monkeypatch.setattr(
+        experiment, "compute_applications_section", lambda: applications
+    )
+
+    changes = experiment.update_description(tmpdir)
+    assert changes.sections == ["applications"]
+    assert changes.added and changes.removed and not changes.invalidated
+    assert all("2048" in key[2] for key in changes.added)
+    assert all("1024" in key[2] for key in changes.removed)
+    assert experiment.description_is_current(tmpdir)
+    assert not any(experiment.update_description(tmpdir))
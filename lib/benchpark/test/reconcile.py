@@ -0,0 +1,215 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import copy
+
+import benchpark.cmd.setup
+import benchpark.reconcile
+import benchpark.yamlio
+
+#: The contents of the ramble key of saxpy's ramble.yaml
+saxpy = {
+    "include": ["./configs"],
+    "config": {"deprecated": True},
+    "modifiers": [{"name": "allocation"}],
+    "applications": {
+        "saxpy": {
+            "workloads": {
+                "problem": {
+                    "experiments": {
+                        "saxpy_{n}_{n_nodes}": {
+                            "variants": {"package_manager": "spack"},
+                            "variables": {
+                                "n_ranks": "8",
+                                "n_nodes": ["1", "2"],
+                                "n": ["512", "1024"],
+                            },
+                            "matrix": ["n", "n_nodes"],
+                        }
+                    }
+                }
+            }
+        }
+    },
+    "software": {
+        "packages": {"saxpy": {"pkg_spec": "saxpy@1.0.0 +openmp"}},
+        "environments": {"saxpy": {"packages": ["default-mpi", "saxpy"]}},
+    },
+}
+
+
+def _experiment(ramble):
+    return ramble["applications"]["saxpy"]["workloads"]["problem"]["experiments"][
+        "saxpy_{n}_{n_nodes}"
+    ]
+
+
+def _names(keys):
+    return sorted(key[2] for key in keys)
+
+
+def test_no_changes():
+    changes = benchpark.reconcile.diff(saxpy, copy.deepcopy(saxpy))
+    assert not any(changes)
+    assert benchpark.reconcile.summary(changes) == "No changes"
+
+
+def test_added_removed_and_invalidated():
+    new = copy.deepcopy(saxpy)
+    variables = _experiment(new)["variables"]
+    variables["n"] = ["512", "2048"]
+    variables["n_ranks"] = "16"
+
+    changes = benchpark.reconcile.diff(saxpy, new)
+    assert changes.sections == ["applications"]
+    assert _names(changes.added) == ["saxpy_2048_1", "saxpy_2048_2"]
+    assert _names(changes.removed) == ["saxpy_1024_1", "saxpy_1024_2"]
+    # n_ranks changed for the instances that are in both
+    assert _names(changes.invalidated) == ["saxpy_512_1", "saxpy_512_2"]
+
+    summary = benchpark.reconcile.summary(changes).splitlines()
+    assert summary[:3] == [
+        "Changed sections: applications",
+        "Added instances: 2",
+        "  saxpy/problem/saxpy_2048_1",
+    ]
+
+
+def test_definition_changes_invalidate():
+    new = copy.deepcopy(saxpy)
+    _experiment(new)["variants"]["package_manager"] = "user-managed"
+    changes = benchpark.reconcile.diff(saxpy, new)
+    assert len(changes.invalidated) == 4 and not changes.added
+
+
+def test_software_changes_invalidate_their_environment():
+    new = copy.deepcopy(saxpy)
+    new["software"]["packages"]["saxpy"]["pkg_spec"] = "saxpy@1.0.0 +openmp +debug"
+    new["software"]["packages"]["unused"] = {"pkg_spec": "unused"}
+
+    changes = benchpark.reconcile.diff(saxpy, new)
+    assert changes.sections == ["software"]
+    assert changes.environments == ["saxpy"]
+    assert len(changes.invalidated) == 4
+
+    # A package no environment uses does not invalidate anything
+    del new["software"]["packages"]["unused"]
+    new["software"]["packages"]["saxpy"] = saxpy["software"]["packages"]["saxpy"]
+    new["software"]["packages"]["other"] = {"pkg_spec": "other"}
+    changes = benchpark.reconcile.diff(saxpy, new)
+    assert changes.sections == ["software"] and not changes.invalidated
+
+
+def test_global_sections_invalidate_all():
+    new = copy.deepcopy(saxpy)
+    new["modifiers"].append({"name": "caliper"})
+    changes = benchpark.reconcile.diff(saxpy, new)
+    assert changes.sections == ["modifiers"]
+    assert len(changes.invalidated) == 4
+
+
+def test_variable_changes():
+    # e.g. the timeout of the system changed
+    changes = benchpark.reconcile.diff(saxpy, saxpy, {"timeout": "60"}, {})
+    assert not changes.sections
+    assert len(changes.invalidated) == 4
+    assert benchpark.reconcile.summary(changes) != "No changes"
+
+
+#: The other inputs of the saxpy workspace
+inputs = {"modifier": "none", "configs/compilers.yaml": "0123"}
+
+
+def _workspace(tmpdir, ramble, variables):
+    workspace_dir = tmpdir.join("saxpy", "system")
+    experiments = workspace_dir.join("workspace", "experiments", "saxpy", "problem")
+    for n in ("512", "1024"):
+        for nodes in ("1", "2"):
+            experiments.join(f"saxpy_{n}_{nodes}").ensure("execute_experiment")
+    workspace_dir.join("workspace", "software", "saxpy").ensure("spack.yaml")
+    workspace_dir.join("workspace", "configs").ensure("ramble.yaml")
+    if ramble:
+        state_dir = workspace_dir.mkdir(benchpark.cmd.setup.setup_state_dir)
+        benchpark.yamlio.write(str(state_dir.join("ramble.yaml")), {"ramble": ramble})
+        benchpark.yamlio.write(
+            str(state_dir.join("variables.yaml")), {"variables": variables}
+        )
+        benchpark.yamlio.write(str(state_dir.join("inputs.yaml")), inputs)
+    return workspace_dir, experiments
+
+
+def test_reconcile_workspace(tmpdir, capsys):
+    workspace_dir, experiments = _workspace(tmpdir, saxpy, {"timeout": "60"})
+
+    new = copy.deepcopy(saxpy)
+    _experiment(new)["variables"]["n"] = ["512", "2048"]
+    changes = benchpark.cmd.setup.reconcile_workspace(
+        workspace_dir, new, {"timeout": "60"}, inputs
+    )
+    assert _names(changes.removed) == ["saxpy_1024_1", "saxpy_1024_2"]
+    assert not changes.invalidated
+
+    # Only the run directories of the removed instances are deleted
+    assert sorted(p.basename for p in experiments.listdir()) == [
+        "saxpy_512_1",
+        "saxpy_512_2",
+    ]
+    assert workspace_dir.join("workspace", "software", "saxpy", "spack.yaml").check()
+    assert not workspace_dir.join("workspace", "configs").check()
+    assert "Removed instances: 2" in capsys.readouterr().out
+
+
+def test_reconcile_workspace_without_record(tmpdir):
+    workspace_dir, experiments = _workspace(tmpdir, None, None)
+
+    assert (
+        benchpark.cmd.setup.reconcile_workspace(workspace_dir, saxpy, {}, inputs)
+        is None
+    )
+    assert not experiments.check()
+    assert workspace_dir.join("workspace", "software", "saxpy", "spack.yaml").check()
+
+
+def test_reconcile_workspace_changed_inputs(tmpdir, capsys):
+    workspace_dir, experiments = _workspace(tmpdir, saxpy, {"timeout": "60"})
+
+    changed = dict(inputs, modifier="caliper")
+    changes = benchpark.cmd.setup.reconcile_workspace(
+        workspace_dir, saxpy, {"timeout": "60"}, changed
+    )
+    assert changes.inputs == ["modifier"]
+    assert len(changes.invalidated) == 4
+    assert not experiments.listdir()
+    assert "Changed inputs: modifier" in capsys.readouterr().out
+
+
+def test_config_inputs(tmpdir):
+    system = tmpdir.mkdir("system")
+    system.join("variables.yaml").write("variables: {}\n")
+    system.join("compilers.yaml").write("compilers: []\n")
+    system.join(".hidden.yaml").write("")
+    common = tmpdir.mkdir("common")
+    common.mkdir("spack").join("packages.yaml").write("packages: {}\n")
+    template = tmpdir.join("execute_experiment.tpl")
+    template.write("{command}\n")
+
+    sources = [
+        (system, "."),
+        (common, "auxiliary_software_files"),
+        (template, "execute_experiment.tpl"),
+    ]
+    inputs = benchpark.cmd.setup.config_inputs(sources, "none")
+    assert sorted(inputs) == [
+        "configs/auxiliary_software_files/spack/packages.yaml",
+        "configs/compilers.yaml",
+        "configs/execute_experiment.tpl",
+        "modifier",
+    ]
+
+    system.join("compilers.yaml").write("compilers: [gcc]\n")
+    changed = benchpark.cmd.setup.config_inputs(sources, "none")
+    assert benchpark.reconcile.changed_keys(inputs, changed) == [
+        "configs/compilers.yaml"
+    ]
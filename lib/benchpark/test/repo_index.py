@@ -0,0 +1,162 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import benchpark.cmd.audit
+import benchpark.paths
+from benchpark.repo_index import RepoIndex, mod_to_class, read_object_file
+
+saxpy_source = """
+from benchpark.directives import variant
+from benchpark.experiment import Experiment
+
+
+def helper():
+    pass
+
+
+class Saxpy(Experiment):
+    variant(
+        "programming_model",
+        default="openmp",
+        values=("openmp", "cuda", "rocm"),
+        description="on-node parallelism model",
+    )
+
+    variant("n", "512", when="programming_model=cuda")
+
+    variant("size", default="1", values=lambda x: x.isdigit())
+
+    variant("caliper", default=False, description="profile with Caliper")
+
+    tags = ["test"]
+
+    def compute_applications_section(self):
+        pass
+"""
+
+
+@pytest.fixture()
+def repo(tmpdir):
+    repo = tmpdir.mkdir("repo")
+    repo.join("repo.yaml").write("repo:\n  namespace: testing\n")
+    experiments = repo.mkdir("experiments")
+    experiments.mkdir("saxpy").join("experiment.py").write(saxpy_source)
+    experiments.mkdir("no-class").join("experiment.py").write("x = 1\n")
+    experiments.mkdir("empty")
+    return repo
+
+
+def _index(repo):
+    return RepoIndex(
+        "experiments", repo_dir=str(repo), cache_file=str(repo / "index.json")
+    )
+
+
+def test_mod_to_class():
+    assert mod_to_class("amg2023") == "Amg2023"
+    assert mod_to_class("cts-ruby") == "CtsRuby"
+    assert mod_to_class("3d_fft") == "_3dFft"
+
+
+def test_index_reads_sources(repo):
+    index = _index(repo).update()
+
+    assert index.namespace == "testing"
+    assert index.names() == ["no-class", "saxpy"]
+
+    saxpy = index["saxpy"]
+    assert saxpy["class_name"] == "Saxpy"
+    assert saxpy["bases"] == ["Experiment"]
+    assert saxpy["attributes"] == ["tags", "compute_applications_section"]
+    assert saxpy["file"] == str(repo / "experiments" / "saxpy" / "experiment.py")
+
+    model, n, size, caliper = index.variants("saxpy")
+    assert model["values"] == ["openmp", "cuda", "rocm"]
+    assert model["default"] == "openmp"
+    assert model["when"] is None
+    assert (n["name"], n["default"], n["when"]) == (
+        "n",
+        "512",
+        "programming_model=cuda",
+    )
+    # A predicate for the values can't be recorded without running it
+    assert size["values"] is None
+    assert size["dynamic"] == ["values"]
+    # Like the variant directive, a boolean default implies the values
+    assert caliper["values"] == [True, False]
+    assert n["values"] is None
+
+    assert index["no-class"]["class_name"] is None
+
+
+def test_dotted_bases(tmpdir):
+    source = tmpdir.join("experiment.py")
+    source.write(
+        "class Amg2023(benchpark.experiment.Experiment, mixins.Caliper):\n    pass\n"
+    )
+    entry = read_object_file(str(source), "amg2023")
+    assert entry["bases"] == ["benchpark.experiment.Experiment", "mixins.Caliper"]
+
+
+def test_index_is_incremental(repo):
+    first = _index(repo).update()
+    assert first.reindexed == ["no-class", "saxpy"]
+    saved = os.stat(first.cache_file).st_mtime_ns
+
+    # Nothing changed: the index is not read again or written back
+    second = _index(repo).update()
+    assert second.reindexed == []
+    assert second.entries == first.entries
+    assert os.stat(second.cache_file).st_mtime_ns == saved
+
+    # Touching a file without changing it only updates its metadata
+    source = repo / "experiments" / "saxpy" / "experiment.py"
+    os.utime(source, ns=(0, 0))
+    assert _index(repo).update().reindexed == []
+    assert _index(repo).update()["saxpy"]["mtime_ns"] == 0
+
+    source.write(saxpy_source.replace('"512"', '"1024"'))
+    repo.join("experiments", "no-class").remove()
+    third = _index(repo).update()
+    assert third.reindexed == ["saxpy"]
+    assert third.names() == ["saxpy"]
+    assert third.variants("saxpy")[1]["default"] == "1024"
+
+
+def test_corrupt_index_is_rebuilt(repo):
+    repo.join("index.json").write("{not json")
+    assert _index(repo).update().reindexed == ["no-class", "saxpy"]
+
+
+def test_audit_from_index(repo):
+    entry = _index(repo).update()["saxpy"]
+    assert benchpark.cmd.audit.audit_experiment(entry) == [
+        "Saxpy does not implement compute_spack_section"
+    ]
+
+
+def test_index_does_not_import_repos(tmpdir):
+    script = """
+import sys
+import benchpark.cmd.audit
+import benchpark.cmd.experiment
+benchpark.cmd.experiment.experiment_list(None)
+benchpark.cmd.audit.command(None)
+assert "ramble" not in sys.modules, "ramble was imported"
+assert not any(m.startswith("benchpark.expr") for m in sys.modules)
+"""
+    env = dict(os.environ, HOME=str(tmpdir))
+    env["PYTHONPATH"] = str(benchpark.paths.benchpark_root / "lib")
+    result = subprocess.run(
+        [sys.executable, "-c", script], env=env, check=True, capture_output=True
+    )
+    assert b"saxpy" in result.stdout
+    assert (tmpdir / ".benchpark" / "cache" / "experiments-repo-index.json").exists()
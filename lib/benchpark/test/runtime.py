@@ -0,0 +1,229 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+import pytest
+
+import benchpark.paths
+import benchpark.runtime
+
+
+def test_resources_are_lazy(tmpdir):
+    resources = benchpark.runtime.RuntimeResources(tmpdir)
+
+    # Nothing is read or cloned until it is needed
+    assert resources._versions is None
+    assert not resources.bootstrapped
+    assert not (tmpdir / "ramble").exists()
+
+    assert resources.ramble_commit
+    assert resources.spack_commit
+
+
+def test_cli_import_does_not_bootstrap(tmpdir):
+    """Importing the CLI and its commands must not clone or import Ramble."""
+    script = """\
+import sys
+import main
+import benchpark.cmd.audit
+import benchpark.cmd.experiment
+import benchpark.cmd.query
+import benchpark.cmd.setup
+import benchpark.cmd.system
+import benchpark.cmd.unit_test
+assert "ramble" not in sys.modules, "ramble was imported"
+assert "llnl" not in sys.modules, "llnl was imported"
+"""
+    env = dict(os.environ, HOME=str(tmpdir))
+    env["PYTHONPATH"] = str(benchpark.paths.benchpark_root / "lib")
+    subprocess.run([sys.executable, "-c", script], env=env, check=True)
+
+    assert not (tmpdir / ".benchpark").exists()
+
+
+@pytest.fixture
+def upstream_repo(tmpdir, monkeypatch):
+    """A local bare repository with a few commits, standing in for GitHub."""
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "benchpark")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "benchpark@example.com")
+
+    work = tmpdir / "work"
+    git = benchpark.runtime.run_command
+    git(f"git init --quiet {work}")
+    with benchpark.runtime.working_dir(work):
+        commits = []
+        for i in range(3):
+            with open(f"file{i}", "w") as f:
+                f.write(f"{i}\n")
+            git(f"git add file{i}")
+            git(f"git commit --quiet -m commit{i}")
+            commits.append(git("git rev-parse HEAD")[0].strip())
+        git("git tag -a -m v1 v1 HEAD~1")
+
+    upstream = tmpdir / "upstream.git"
+    git(f"git clone --quiet --bare {work} {upstream}")
+    git(f"git -C {upstream} config uploadpack.allowFilter true")
+    return f"file://{upstream}", upstream, commits
+
+
+@pytest.mark.parametrize("pin", ["full", "tag", "abbreviated tag"])
+def test_git_clone_commit(upstream_repo, tmpdir, pin):
+    url, upstream, commits = upstream_repo
+    pinned = {"full": commits[1], "tag": "v1", "abbreviated tag": commits[1][:7]}[pin]
+    mirrors = tmpdir / "mirrors"
+
+    dest = tmpdir / "dest"
+    benchpark.runtime.git_clone_commit(url, pinned, dest, mirror_root=mirrors)
+
+    assert (dest / "file1").exists()
+    assert not (dest / "file2").exists()
+    # Only the pinned commit was fetched
+    assert (dest / ".git" / "shallow").exists()
+    git = benchpark.runtime.run_command
+    assert git(f"git -C {dest} rev-parse HEAD")[0].strip() == commits[1]
+    assert git(f"git -C {dest} remote get-url origin")[0].strip() == url
+
+    # Later clones are served from the mirror, without touching the upstream
+    # (a branch or tag still has to be looked up there, as it may move)
+    if pin == "tag":
+        return
+    upstream.remove()
+    dest2 = tmpdir / "dest2"
+    benchpark.runtime.git_clone_commit(url, pinned, dest2, mirror_root=mirrors)
+    assert (dest2 / "file1").exists()
+    assert len(mirrors.listdir()) == 1
+
+
+def test_git_clone_abbreviated_commit(upstream_repo, tmpdir):
+    # Not a branch or tag: found in the history of the default branch
+    url, _, commits = upstream_repo
+    mirrors = tmpdir / "mirrors"
+    dest = tmpdir / "dest"
+    benchpark.runtime.git_clone_commit(url, commits[0][:7], dest, mirror_root=mirrors)
+
+    git = benchpark.runtime.run_command
+    assert git(f"git -C {dest} rev-parse HEAD")[0].strip() == commits[0]
+    assert (dest / ".git" / "shallow").exists()
+    # The scratch repository used to find it is gone
+    assert len(mirrors.listdir()) == 1
+
+    with pytest.raises(RuntimeError, match="full hash"):
+        benchpark.runtime.git_clone_commit(
+            url, "0000000", tmpdir / "dest2", mirror_root=mirrors
+        )
+
+
+def test_git_attach_store(upstream_repo, tmpdir):
+    url, _, commits = upstream_repo
+    store = tmpdir / "store"
+    mirrors = tmpdir / "mirrors"
+
+    roots = [tmpdir / "root1", tmpdir / "root2"]
+    for root in roots:
+        benchpark.runtime.git_attach_store(
+            "tool",
+            url,
+            commits[0],
+            root / "tool",
+            store_root=store,
+            mirror_root=mirrors,
+        )
+
+    # Both roots share a single store entry, named after the full commit
+    assert [x.basename for x in store.listdir()] == [f"tool-{commits[0]}"]
+    for root in roots:
+        assert (root / "tool" / "file0").exists()
+        assert (root / "tool" / ".git").isfile()  # a worktree
+
+    # The entry is bare, and the objects are stored once, in the mirror
+    entry = store / f"tool-{commits[0]}"
+    git = benchpark.runtime.run_command
+    assert git(f"git -C {entry} rev-parse --is-bare-repository")[0].strip() == "true"
+    assert not (entry / "file0").exists()
+    (mirror,) = mirrors.listdir()
+    for root in roots:
+        stats = dict(
+            line.split(": ", 1)
+            for line in git(f"git -C {root / 'tool'} count-objects -v")[0].splitlines()
+        )
+        assert (stats["count"], stats["in-pack"]) == ("0", "0")
+        assert stats["alternate"] == str(mirror / "objects")
+
+    # Files written in one root are not visible in the other
+    (roots[0] / "tool" / "site.yaml").write("x")
+    assert not (roots[1] / "tool" / "site.yaml").exists()
+
+
+def test_run_parallel():
+    def task(value):
+        def _run():
+            time.sleep(0.2)
+            return value
+
+        return _run
+
+    start = time.time()
+    results = benchpark.runtime.run_parallel({"a": task(1), "b": task(2)})
+    assert time.time() - start < 0.35
+    assert results == {"a": 1, "b": 2}
+
+
+def test_run_parallel_collects_errors():
+    finished = []
+
+    def fail(name):
+        def _run():
+            raise ValueError(f"{name} broke")
+
+        return _run
+
+    tasks = {"a": fail("a"), "b": lambda: finished.append("b"), "c": fail("c")}
+    with pytest.raises(benchpark.runtime.ParallelTaskError) as e:
+        benchpark.runtime.run_parallel(tasks)
+
+    assert finished == ["b"]
+    assert sorted(e.value.errors) == ["a", "c"]
+    assert "a broke" in str(e.value) and "c broke" in str(e.value)
+
+
+def _python(code):
+    return f"{sys.executable} -c {shlex.quote(code)}"
+
+
+def test_run_command_streams_to_log(tmpdir, capsys):
+    log = tmpdir / "out.log"
+    code = (
+        "import sys\nfor i in range(5): print(i, flush=True)\nsys.stderr.write('oops')"
+    )
+    stdout, stderr = benchpark.runtime.run_command(
+        _python(code), echo=True, log_path=log, keep_lines=2
+    )
+
+    # Everything is streamed, but only the tail is kept in memory
+    assert stdout == "3\n4\n"
+    assert stderr == "oops"
+    assert capsys.readouterr().out == "0\n1\n2\n3\n4\n"
+    assert sorted(log.read().split()) == ["0", "1", "2", "3", "4", "oops"]
+
+
+def test_run_command_failure():
+    with pytest.raises(RuntimeError, match="Output: out"):
+        benchpark.runtime.run_command(_python("print('out'); raise SystemExit(3)"))
+
+
+def test_run_command_timeout(tmpdir):
+    marker = tmpdir / "finished"
+    code = f"import time; time.sleep(5); open({str(marker)!r}, 'w')"
+    start = time.time()
+    with pytest.raises(benchpark.runtime.CommandTimeoutError):
+        benchpark.runtime.run_command(_python(code), timeout=0.3)
+    assert time.time() - start < 3
+    assert not marker.exists()
@@ -0,0 +1,139 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+import benchpark.server
+
+
+@pytest.fixture
+def server(tmpdir):
+    """A server running in a thread, watching a scratch repo directory."""
+    repo_dir = tmpdir.mkdir("repo")
+    repo_dir.join("experiment.py").write("a")
+    changes = []
+
+    server = benchpark.server.BenchparkServer(
+        tmpdir / "server.sock",
+        watch=[str(repo_dir)],
+        on_change=lambda: changes.append(1),
+    )
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server, repo_dir, changes
+
+    benchpark.server.send(server.socket_path, {"shutdown": True})
+    thread.join()
+    server.server_close()
+
+
+def test_server_runs_commands(server, tmpdir, capsys):
+    server, _, _ = server
+
+    status = benchpark.server.forward(server.socket_path, ["list", "experiments"])
+    assert status == 0
+    assert "Experiments:" in capsys.readouterr().out
+
+    response = benchpark.server.send(
+        server.socket_path, {"argv": ["list", "nonsense"], "cwd": str(tmpdir)}
+    )
+    assert response["status"] == 1
+    assert "Invalid benchpark list" in response["stderr"]
+    assert server.requests_served == 2
+
+
+def test_server_notices_repo_changes(server):
+    server, repo_dir, changes = server
+
+    benchpark.server.send(server.socket_path, {"argv": ["list"]})
+    assert changes == []
+
+    repo_dir.join("experiment.py").write("ab")
+    benchpark.server.send(server.socket_path, {"argv": ["list"]})
+    assert changes == [1]
+
+    repo_dir.join("new.py").write("")
+    assert server.check_for_changes()
+    assert not server.check_for_changes()
+
+
+def test_only_one_server_per_socket(server):
+    server, _, _ = server
+    with pytest.raises(RuntimeError, match="already listening"):
+        benchpark.server.BenchparkServer(server.socket_path, watch=[])
+
+
+def test_server_does_not_forward_to_itself(server, monkeypatch):
+    server, _, _ = server
+    # As when the server is started from a shell that has it exported
+    monkeypatch.setenv("BENCHPARK_SERVER", server.socket_path)
+
+    response = benchpark.server.send(
+        server.socket_path, {"argv": ["experiment", "list"]}
+    )
+    assert response["status"] == 0
+    assert "saxpy" in response["stdout"]
+
+
+def test_server_uses_client_cwd_and_environment(server, tmpdir, monkeypatch):
+    server, _, _ = server
+    monkeypatch.setattr(
+        benchpark.server,
+        "_run_main",
+        lambda argv: print(os.getcwd(), os.environ.get("BENCHPARK_TEST")),
+    )
+    env = dict(os.environ, BENCHPARK_TEST="client")
+    response = benchpark.server.send(
+        server.socket_path, {"argv": ["list"], "cwd": str(tmpdir), "env": env}
+    )
+    assert response["stdout"] == f"{tmpdir} client\n"
+    assert "BENCHPARK_TEST" not in os.environ
+
+    # Read when Spack is loaded: the server cannot change it for a command
+    env["SPACK_USER_CONFIG_PATH"] = str(tmpdir)
+    response = benchpark.server.send(server.socket_path, {"argv": ["list"], "env": env})
+    assert "SPACK_USER_CONFIG_PATH" in response["refused"]
+
+
+def test_server_rejects_invalid_requests(server):
+    server, _, _ = server
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(server.socket_path)
+        s.sendall(b"not json\n")
+        with s.makefile("rb") as f:
+            response = json.loads(f.readline())
+    assert response["status"] == 1
+    assert "Invalid request" in response["stderr"]
+
+    response = benchpark.server.send(server.socket_path, ["list"])
+    assert "not a JSON object" in response["stderr"]
+
+
+def test_forward_falls_back_without_reply(tmpdir, capsys):
+    # A server that dies while handling the request
+    socket_path = str(tmpdir / "dead.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+
+    def accept_and_close():
+        connection, _ = listener.accept()
+        with connection, connection.makefile("rb") as f:
+            f.readline()
+
+    thread = threading.Thread(target=accept_and_close)
+    thread.start()
+    assert benchpark.server.forward(socket_path, ["list"]) is None
+    thread.join()
+    listener.close()
+    assert "no valid reply" in capsys.readouterr().err
+
+    # Nothing listening any more
+    assert benchpark.server.forward(socket_path, ["list"]) is None
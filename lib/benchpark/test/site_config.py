@@ -0,0 +1,151 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import pathlib
+
+import pytest
+import yaml
+
+from benchpark.site_config import SiteConfig, known_schemas, read_schema
+
+jsonschema = pytest.importorskip("jsonschema")
+
+#: Trimmed-down versions of Ramble's schema modules
+ramble_schemas = {
+    "repos": """
+properties = {
+    "repos": {"type": "array", "default": [], "items": {"type": "string"}}
+}
+""",
+    "modifier_repos": """
+properties = {
+    "modifier_repos": {"type": "array", "default": [], "items": {"type": "string"}}
+}
+""",
+    "config": """
+import ramble.schema.types
+
+properties: dict = {
+    "config": {
+        "type": "object",
+        "default": {},
+        "properties": {
+            "disable_progress_bar": {"type": "boolean", "default": False},
+            "spack": {
+                "type": "object",
+                "properties": {
+                    "global": {
+                        "type": "object",
+                        "properties": {"args": {"type": "string"}},
+                    }
+                },
+            },
+            "shell": ramble.schema.types.shell,
+        },
+    }
+}
+""",
+}
+
+
+@pytest.fixture
+def ramble_prefix(tmpdir):
+    """A stand-in for a Ramble checkout that provides every known schema."""
+    prefix = pathlib.Path(str(tmpdir)) / "ramble"
+    for path, schema_file in known_schemas["ramble"].items():
+        (prefix / schema_file).parent.mkdir(parents=True, exist_ok=True)
+        (prefix / schema_file).write_text(ramble_schemas[path.split(":")[0]])
+    return prefix
+
+
+class RecordingCommand:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, *args):
+        self.calls.append(" ".join(args))
+
+
+def _load(prefix, name):
+    with open(prefix / "etc" / "ramble" / f"{name}.yaml") as f:
+        return yaml.safe_load(f)
+
+
+def test_write_site_config(ramble_prefix):
+    command = RecordingCommand()
+    config = SiteConfig("ramble", ramble_prefix, command)
+    config.add_repo("/first/repo")
+    config.add_repo("/second/repo")
+    config.add_repo("/first/repo")
+    config.add_repo("/mods", section="modifier_repos")
+    config.set("config:disable_progress_bar", True)
+    config.set("config:spack:global:args", "-d")
+    config.write()
+
+    assert command.calls == []
+    assert _load(ramble_prefix, "repos") == {"repos": ["/second/repo", "/first/repo"]}
+    assert _load(ramble_prefix, "modifier_repos") == {"modifier_repos": ["/mods"]}
+    assert _load(ramble_prefix, "config") == {
+        "config": {"disable_progress_bar": True, "spack": {"global": {"args": "-d"}}}
+    }
+
+    # Existing settings are kept
+    config = SiteConfig("ramble", ramble_prefix, command)
+    config.add_repo("/third/repo")
+    config.write()
+    assert _load(ramble_prefix, "repos")["repos"][0] == "/third/repo"
+    assert len(_load(ramble_prefix, "repos")["repos"]) == 3
+
+
+def test_read_schema(ramble_prefix):
+    config_schema = ramble_prefix / known_schemas["ramble"]["config:spack:global:args"]
+    assert read_schema(config_schema, "config:spack:global:args") == {"type": "string"}
+    assert read_schema(config_schema, "config:disable_progress_bar")["type"] == (
+        "boolean"
+    )
+    assert read_schema(config_schema, "config:spack:global:flags") is None
+    # Not a literal
+    assert read_schema(config_schema, "config:shell") is None
+
+
+def test_site_config_rejects_invalid_values(ramble_prefix):
+    config = SiteConfig("ramble", ramble_prefix)
+    with pytest.raises(ValueError, match="disable_progress_bar"):
+        config.set("config:disable_progress_bar", "yes")
+
+    # Settings already in the file are checked too, before anything is written
+    config_dir = ramble_prefix / "etc" / "ramble"
+    config_dir.mkdir(parents=True)
+    (config_dir / "repos.yaml").write_text("repos:\n- path: /old/repo\n")
+    config = SiteConfig("ramble", ramble_prefix)
+    config.add_repo("/new/repo")
+    config.set("config:disable_progress_bar", True)
+    with pytest.raises(ValueError, match="repos.yaml"):
+        config.write()
+    assert not (config_dir / "config.yaml").exists()
+
+
+def test_site_config_falls_back_to_cli(ramble_prefix):
+    # Without a schema file, the tool's own command has to do the work
+    (ramble_prefix / known_schemas["ramble"]["modifier_repos"]).unlink()
+    # Nor can a schema that is not in the (literal) properties be checked
+    config_schema = ramble_prefix / known_schemas["ramble"]["config:spack:global:args"]
+    config_schema.write_text(ramble_schemas["config"].replace('"global"', '"flags"'))
+
+    command = RecordingCommand()
+    config = SiteConfig("ramble", ramble_prefix, command)
+    config.add_repo("/mods", section="modifier_repos")
+    config.set("config:unknown_setting", "value")
+    config.set("config:spack:global:args", "-d")
+    config.set("config:disable_progress_bar", True)
+    config.write()
+
+    assert command.calls == [
+        "repo add -t modifiers --scope=site /mods",
+        "config --scope=site add config:unknown_setting:value",
+        "config --scope=site add config:spack:global:args:-d",
+    ]
+    assert _load(ramble_prefix, "config") == {"config": {"disable_progress_bar": True}}
+    assert not (ramble_prefix / "etc" / "ramble" / "modifier_repos.yaml").exists()
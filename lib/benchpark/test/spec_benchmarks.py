@@ -0,0 +1,134 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Throughput benchmarks for spec parsing.
+
+The benchmarks only run with ``BENCHPARK_BENCHMARKS=1``: run
+``BENCHPARK_BENCHMARKS=1 benchpark unit-test -s
+lib/benchpark/test/spec_benchmarks.py`` to see the timings.
+"""
+
+import timeit
+
+import pytest
+
+from benchpark.spec import (
+    Spec,
+    SpecParser,
+    SpecTokenizationError,
+    TokenType,
+    parse_spec,
+    quote_kvp,
+    tokenize,
+    tokenize_significant,
+)
+
+realistic_specs = [
+    "amg2023",
+    "saxpy programming_model=openmp",
+    "amg2023 programming_model=cuda workload=problem1 experiment=strong",
+    "builtin.kripke programming_model=rocm experiment=weak",
+    "x+debug~shared cflags='-O3 -g' ldflags=\"-Wl,-rpath=$ORIGIN/_libs\"",
+    "quicksilver experiment=weak  +caliper   ",
+]
+
+large_spec = "big " + " ".join(
+    f"v{i}=value{i},other{i}" if i % 3 else f"+flag{i}" for i in range(200)
+)
+
+all_specs = realistic_specs + [large_spec]
+
+
+def _filter_tokenize(text):
+    """The whitespace filtering that SpecParser used to do."""
+    return list(filter(lambda x: x.kind != TokenType.WS, tokenize(text)))
+
+
+def _best_time(fn, number):
+    """Best time per call (in microseconds) over a few repetitions."""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def _report(what, text, per_call):
+    label = text if len(text) < 40 else f"{text[:37]}..."
+    print(f"{what:>24}: {per_call:9.2f} us  {label}")
+
+
+@pytest.mark.parametrize("text", all_specs + ["", "   ", "+ debug", "x\t+debug\n"])
+def test_tokenize_significant_matches_tokenize(text):
+    fast = list(tokenize_significant(text))
+    reference = _filter_tokenize(text)
+    assert fast == reference
+    assert [(t.start, t.end) for t in fast] == [(t.start, t.end) for t in reference]
+
+
+@pytest.mark.parametrize("text", ["cflags=''-Wl,a,b,c''", "x ^y", "x=", "x @1.0"])
+def test_tokenize_significant_errors(text):
+    with pytest.raises(SpecTokenizationError) as reference:
+        _filter_tokenize(text)
+    with pytest.raises(SpecTokenizationError) as fast:
+        list(tokenize_significant(text))
+    assert str(fast.value) == str(reference.value)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("text", all_specs)
+def test_tokenize_benchmark(text):
+    number = 20 if text == large_spec else 2000
+    reference = _best_time(lambda: _filter_tokenize(text), number)
+    fast = _best_time(lambda: list(tokenize_significant(text)), number)
+
+    _report("tokenize (filtered)", text, reference)
+    _report("tokenize_significant", text, fast)
+    assert fast < reference
+
+
+@pytest.mark.parametrize("text", all_specs)
+def test_parse(text):
+    (spec,) = SpecParser(Spec, text).all_specs()
+    # Printing a spec gives a string that parses back to the same spec
+    assert SpecParser(Spec, str(spec)).all_specs() == [spec]
+    assert Spec(str(spec)) == spec
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("text", all_specs)
+def test_parse_benchmark(text):
+    number = 20 if text == large_spec else 2000
+    _report(
+        "SpecParser.all_specs",
+        text,
+        _best_time(lambda: SpecParser(Spec, text).all_specs(), number),
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("text", all_specs)
+def test_roundtrip_benchmark(text):
+    spec = Spec(text)
+
+    def roundtrip():
+        # Parse every time, rather than hit the cache of parsed specs
+        parse_spec.cache_clear()
+        return Spec(str(spec))
+
+    number = 20 if text == large_spec else 2000
+    _report("Spec.__str__", text, _best_time(lambda: str(spec), number))
+    _report("Spec(str(spec))", text, _best_time(roundtrip, number))
+
+
+def test_quote_kvp():
+    assert quote_kvp("cflags=-O3 -g") == "cflags='-O3 -g'"
+    assert quote_kvp("workload=problem1") == "workload=problem1"
+
+
+@pytest.mark.benchmark
+def test_quote_kvp_benchmark():
+    args = ["amg2023", "cflags=-O3 -g", "workload=problem1", "+debug"] * 50
+    _report(
+        "quote_kvp",
+        f"{len(args)} CLI arguments",
+        _best_time(lambda: [quote_kvp(arg) for arg in args], 200),
+    )
@@ -0,0 +1,108 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import itertools
+import time
+
+import pytest
+
+from benchpark.cmd.query import find_descriptions
+from benchpark.spec import ConcreteVariantMap, Spec
+from benchpark.spec_index import SpecIndex
+
+
+def _concrete(text):
+    """A spec with concrete variants, without needing a class to concretize"""
+    spec = Spec(text)
+    spec._variants = ConcreteVariantMap(spec.variants)
+    return spec
+
+
+@pytest.fixture(scope="module")
+def specs():
+    names = ["amg2023", "saxpy", "kripke"]
+    models = ["openmp", "cuda", "rocm"]
+    compilers = ["gcc", "clang", "intel", "xl"]
+    sizes = [str(i) for i in range(100)]
+    return [
+        _concrete(f"builtin.{n} programming_model={m} compiler={c} size={s}")
+        for n, m, c, s in itertools.product(names, models, compilers, sizes)
+    ]
+
+
+queries = [
+    "programming_model=cuda",
+    "saxpy compiler=clang",
+    "builtin.kripke programming_model=rocm size=7",
+    "other.saxpy",
+    "compiler=fortran",
+    "",
+]
+
+
+@pytest.mark.parametrize("query", queries)
+def test_index_matches_spec_methods(specs, query):
+    index = SpecIndex(specs)
+    query = Spec(query) if query else Spec()
+
+    assert index.satisfying(query) == [s for s in specs if s.satisfies(query)]
+    assert index.intersecting(query) == [s for s in specs if s.intersects(query)]
+
+
+def test_index_avoids_satisfies(specs, monkeypatch):
+    query = Spec("programming_model=cuda compiler=clang")
+    index = SpecIndex(specs)
+    expected = [s for s in specs if s.satisfies(query)]
+
+    calls = []
+    satisfies = Spec.satisfies
+    monkeypatch.setattr(
+        Spec,
+        "satisfies",
+        lambda self, other: calls.append(self) or satisfies(self, other),
+    )
+    # No spec is compared to the query one at a time
+    assert index.satisfying(query) == expected
+    assert calls == []
+
+
+@pytest.mark.benchmark
+def test_index_benchmark(specs):
+    query = Spec("programming_model=cuda compiler=clang")
+    index = SpecIndex(specs)
+
+    start = time.perf_counter()
+    expected = [s for s in specs if s.satisfies(query)]
+    one_at_a_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = index.satisfying(query)
+    indexed = time.perf_counter() - start
+
+    print(
+        f"{len(specs)} specs: {one_at_a_time * 1000:.2f} ms one at a time, "
+        f"{indexed * 1000:.2f} ms indexed"
+    )
+    assert found == expected
+    assert indexed < one_at_a_time
+
+
+def test_find_descriptions(tmpdir):
+    experiment = tmpdir.mkdir("exp")
+    experiment.join("experiment_id.yaml").write(
+        "experiment:\n  spec: builtin.saxpy programming_model=cuda\n"
+    )
+    system = tmpdir.mkdir("sys")
+    system.join("system_id.yaml").write("system:\n  spec: builtin.aws\n")
+    tmpdir.mkdir("other").join("ramble.yaml").write("ramble: {}\n")
+
+    found = sorted(find_descriptions([str(tmpdir)]))
+    assert found == [
+        ("experiment", str(experiment), "builtin.saxpy programming_model=cuda"),
+        ("system", str(system), "builtin.aws"),
+    ]
+    assert list(find_descriptions([str(tmpdir)], kinds=["system"])) == [
+        ("system", str(system), "builtin.aws")
+    ]
@@ -6,11 +6,14 @@
 import pytest
 
 from benchpark.spec import (
+    ExperimentSpec,
+    FrozenVariantMap,
     Spec,
     SpecParser,
     SpecTokenizationError,
     Token,
     TokenType,
+    parse_spec,
 )
 
 
@@ -246,3 +249,49 @@ def test_error_reporting(text, expected_in_error):
 def test_error_conditions(text, match_string):
     with pytest.raises(Exception, match=match_string):
         SpecParser(Spec, text).next_spec()
+
+
+def test_parse_spec_is_cached():
+    parse_spec.cache_clear()
+    first = parse_spec(Spec, "x+debug mode=fast")
+    second = parse_spec(Spec, "x+debug mode=fast")
+
+    assert first is second
+    assert parse_spec.cache_info().hits == 1
+    assert parse_spec(ExperimentSpec, "x+debug mode=fast") is not first
+
+    # Specs shared through the cache cannot be changed...
+    with pytest.raises(TypeError):
+        first.variants["other"] = "value"
+
+    # ...but specs built from the same string are independent copies
+    spec = Spec("x+debug mode=fast")
+    spec.variants["other"] = "value"
+    assert "other" not in parse_spec(Spec, "x+debug mode=fast").variants
+
+
+def test_satisfies_uses_parse_cache():
+    parse_spec.cache_clear()
+    spec = Spec("x+debug mode=fast")
+    for _ in range(3):
+        assert spec.satisfies("+debug")
+        assert spec.intersects("mode=fast")
+    assert parse_spec.cache_info().hits == 4
+
+
+def test_frozen_variant_map():
+    mutable = Spec("x mode=fast,safe +debug").variants
+    frozen = FrozenVariantMap(mutable)
+
+    assert frozen == mutable and mutable == frozen
+    assert hash(frozen) == hash(mutable)
+    assert str(frozen) == str(mutable) == "+debug mode=fast,safe"
+    assert frozen["mode"] == ("fast", "safe")
+    assert FrozenVariantMap({"a": "1"}) != FrozenVariantMap({"b": "1"})
+
+    assert frozen.satisfies(FrozenVariantMap({"mode": ("safe",)}))
+    assert frozen.satisfies(Spec("mode=safe,fast").variants)
+    assert not frozen.satisfies(FrozenVariantMap({"mode": ("slow",)}))
+    assert not frozen.satisfies(FrozenVariantMap({"other": ("x",)}))
+    with pytest.raises(TypeError):
+        frozen["mode"] = "slow"
@@ -0,0 +1,68 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import benchpark.paths
+
+main_py = benchpark.paths.benchpark_root / "lib" / "main.py"
+
+#: Wall-clock budget (in seconds) for ``benchpark <cmd> --help``. This is
+#: deliberately generous so it only trips when something heavy (Ramble,
+#: pytest, a git clone) sneaks back onto the startup path.
+startup_budget = float(os.environ.get("BENCHPARK_STARTUP_BUDGET", "2.0"))
+
+
+def _all_subcommands():
+    sys.path.insert(0, str(main_py.parent))
+    try:
+        import main
+    finally:
+        sys.path.pop(0)
+    return [None, "list", "tags"] + list(main.commands)
+
+
+@pytest.mark.parametrize("subcommand", _all_subcommands())
+def test_help_startup_time(subcommand, tmpdir):
+    args = [sys.executable, str(main_py)]
+    if subcommand:
+        args.append(subcommand)
+    args.append("--help")
+
+    # Point HOME somewhere empty so we can tell whether Ramble was bootstrapped
+    env = dict(os.environ, HOME=str(tmpdir))
+
+    start = time.perf_counter()
+    subprocess.run(args, env=env, check=True, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+
+    print(f"benchpark {' '.join(args[2:])}: {elapsed * 1000:.1f} ms")
+    assert not (tmpdir / ".benchpark").exists()
+    assert elapsed < startup_budget
+
+
+def test_launcher_exit_code(tmpdir):
+    launcher = benchpark.paths.benchpark_root / "bin" / "benchpark"
+    env = dict(os.environ, HOME=str(tmpdir))
+
+    # No arguments prints help and fails; --version succeeds
+    no_args = subprocess.run(
+        [sys.executable, str(launcher)], env=env, stdout=subprocess.DEVNULL
+    )
+    assert no_args.returncode == 1
+
+    version = subprocess.run(
+        [sys.executable, str(launcher), "--version"],
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert version.returncode == 0
+    assert version.stdout.strip()
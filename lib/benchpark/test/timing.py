@@ -0,0 +1,100 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import benchpark.paths
+import benchpark.timing
+
+
+@pytest.fixture
+def timing(monkeypatch):
+    monkeypatch.setattr(benchpark.timing, "enabled", True)
+    monkeypatch.setattr(benchpark.timing, "_roots", [])
+    return benchpark.timing
+
+
+def test_spans_nest(timing):
+    with timing.span("outer"):
+        with timing.span("first"):
+            pass
+        with timing.span("second"):
+            with timing.span("inner"):
+                pass
+
+    lines = timing.summary().splitlines()
+    assert [line.split(" ms ")[1] for line in lines] == [
+        " outer",
+        "   first",
+        "   second",
+        "     inner",
+    ]
+
+    events = timing.chrome_trace()["traceEvents"]
+    assert [e["name"] for e in events] == ["outer", "first", "second", "inner"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+
+
+def test_spans_disabled(monkeypatch):
+    monkeypatch.setattr(benchpark.timing, "enabled", False)
+    monkeypatch.setattr(benchpark.timing, "_roots", [])
+    with benchpark.timing.span("ignored"):
+        pass
+    assert benchpark.timing.summary() == ""
+
+
+def test_span_in_thread(timing):
+    import benchpark.runtime
+
+    with timing.span("parent"):
+        benchpark.runtime.run_parallel({"child": lambda: None})
+
+    assert timing.summary().splitlines()[-1].split(" ms ")[1] == "   child"
+
+
+def test_import_profiler(tmpdir, monkeypatch):
+    tmpdir.join("outer_mod.py").write("import inner_mod\n")
+    tmpdir.join("inner_mod.py").write("x = sum(range(10000))\n")
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    profiler = benchpark.timing.ImportProfiler()
+    profiler.install()
+    try:
+        import outer_mod  # noqa: F401
+    finally:
+        profiler.uninstall()
+        for name in ("outer_mod", "inner_mod"):
+            sys.modules.pop(name, None)
+
+    assert set(profiler.cumulative) == {"outer_mod", "inner_mod"}
+    assert profiler.cumulative["outer_mod"] >= profiler.cumulative["inner_mod"]
+    assert profiler.self_time["outer_mod"] <= profiler.cumulative["outer_mod"]
+    assert "inner_mod" in profiler.report()
+
+
+def test_cli_timings(tmpdir):
+    trace = tmpdir.join("trace.json")
+    main_py = benchpark.paths.benchpark_root / "lib" / "main.py"
+    env = dict(os.environ, HOME=str(tmpdir))
+
+    result = subprocess.run(
+        [sys.executable, str(main_py), "--timings", "--trace", str(trace), "list"],
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    assert "Experiments:" in result.stdout
+    assert "benchpark list" in result.stderr
+    with open(trace) as f:
+        names = [e["name"] for e in json.load(f)["traceEvents"]]
+    assert "benchpark list" in names
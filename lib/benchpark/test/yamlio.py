@@ -0,0 +1,92 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import stat
+import timeit
+
+import pytest
+import yaml
+
+import benchpark.yamlio
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    benchpark.yamlio.clear_cache()
+    yield
+    benchpark.yamlio.clear_cache()
+
+
+def test_roundtrip(tmpdir):
+    data = {"b": [1, 2, {"c": "x: y"}], "a": ("t", "u"), "d": None}
+    path = tmpdir.join("data.yaml")
+    benchpark.yamlio.write(str(path), data)
+
+    assert yaml.safe_load(path.read()) == dict(data, a=["t", "u"])
+    assert benchpark.yamlio.load(str(path)) == dict(data, a=["t", "u"])
+    # Block style, with sorted keys, like yaml.safe_dump
+    assert path.read().startswith("a:\n- t\n- u\nb:\n")
+
+
+def test_load_is_cached(tmpdir):
+    path = tmpdir.join("data.yaml")
+    path.write("a: 1\n")
+
+    first = benchpark.yamlio.load(str(path))
+    assert benchpark.yamlio.load(path) is first
+
+    # A change in size or mtime invalidates the entry
+    path.write("a: 22\n")
+    assert benchpark.yamlio.load(str(path)) == {"a": 22}
+    mtime = os.stat(str(path)).st_mtime_ns
+    path.write("a: 33\n")
+    os.utime(str(path), ns=(mtime, mtime + 1))
+    assert benchpark.yamlio.load(str(path)) == {"a": 33}
+
+    # As does writing the file
+    benchpark.yamlio.write(str(path), {"a": 44})
+    assert benchpark.yamlio.load(str(path)) == {"a": 44}
+
+
+def test_cache_is_bounded(tmpdir, monkeypatch):
+    monkeypatch.setattr(benchpark.yamlio, "cache_size", 2)
+    for i in range(4):
+        tmpdir.join(f"{i}.yaml").write(f"{i}\n")
+        assert benchpark.yamlio.load(str(tmpdir.join(f"{i}.yaml"))) == i
+    assert len(benchpark.yamlio._cache) == 2
+
+
+def test_atomic_write(tmpdir):
+    path = tmpdir.join("data.yaml")
+    path.write("a: 1\n")
+
+    with pytest.raises(RuntimeError):
+        with benchpark.yamlio.atomic_write(str(path)) as f:
+            f.write("a: 2\n")
+            raise RuntimeError("interrupted")
+    # The old content is kept, and no temporary file is left behind
+    assert path.read() == "a: 1\n"
+    assert tmpdir.listdir() == [path]
+
+    benchpark.yamlio.write(str(path), {"a": 3})
+    mode = stat.S_IMODE(os.stat(str(path)).st_mode)
+    umask = os.umask(0)
+    os.umask(umask)
+    assert mode == 0o666 & ~umask
+
+
+def test_loader_benchmark():
+    data = {f"key{i}": {"values": list(range(20)), "name": f"x{i}"} for i in range(200)}
+    text = yaml.safe_dump(data)
+
+    pure = min(timeit.repeat(lambda: yaml.safe_load(text), number=3, repeat=3))
+    fast = min(timeit.repeat(lambda: benchpark.yamlio.loads(text), number=3, repeat=3))
+    print(
+        f"yaml.safe_load: {pure * 1000 / 3:.2f} ms, yamlio.loads {fast * 1000 / 3:.2f} ms"
+    )
+    assert benchpark.yamlio.loads(text) == data
+    if benchpark.yamlio.Loader is yaml.CSafeLoader:
+        assert fast < pure
@@ -0,0 +1,220 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Lightweight phase timing for the Benchpark CLI.
+
+Code marks the phases it wants reported with::
+
+    with benchpark.timing.span("concretize"):
+        ...
+
+Spans nest, and are recorded only when timing was enabled (``benchpark
+--timings``, or the ``BENCHPARK_PROFILE`` environment variable), so
+otherwise they cost next to nothing.
+"""
+
+from contextlib import contextmanager
+import importlib.abc
+import json
+import os
+import sys
+import threading
+import time
+
+#: Whether spans are being recorded
+enabled = False
+
+_lock = threading.Lock()
+_local = threading.local()
+_roots = []
+_start = time.perf_counter()
+
+
+class Span:
+    __slots__ = "name", "start", "end", "children", "thread"
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.thread = threading.get_ident()
+
+    @property
+    def duration(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def reset():
+    """Disable timing and drop the recorded spans."""
+    global enabled
+    enabled = False
+    with _lock:
+        _roots.clear()
+
+
+def current():
+    """The innermost open span of this thread (None if there is none)."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name, parent=None):
+    """Record the time spent in the body of the ``with`` statement.
+
+    The span becomes a child of the innermost open span of this thread, or
+    of ``parent`` if it is given (e.g. for work handed to another thread).
+    """
+    if not enabled:
+        yield
+        return
+
+    stack = _stack()
+    parent = parent or (stack[-1] if stack else None)
+    new_span = Span(name)
+    with _lock:
+        (parent.children if parent else _roots).append(new_span)
+
+    stack.append(new_span)
+    try:
+        yield new_span
+    finally:
+        new_span.end = time.perf_counter()
+        stack.pop()
+
+
+def summary():
+    """Return the recorded spans as an indented tree with durations."""
+    lines = []
+
+    def _add(s, depth):
+        lines.append(f"{s.duration * 1000:10.1f} ms  {'  ' * depth}{s.name}")
+        for child in s.children:
+            _add(child, depth + 1)
+
+    for root in _roots:
+        _add(root, 0)
+    return "\n".join(lines)
+
+
+def chrome_trace():
+    """Return the recorded spans in Chrome's Trace Event format, which can
+    be loaded in chrome://tracing or https://ui.perfetto.dev
+    """
+    events = []
+    pid = os.getpid()
+
+    def _add(s):
+        events.append(
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": (s.start - _start) * 1e6,
+                "dur": s.duration * 1e6,
+                "pid": pid,
+                "tid": s.thread,
+            }
+        )
+        for child in s.children:
+            _add(child)
+
+    for root in _roots:
+        _add(root)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path):
+    with open(path, "w") as f:
+        json.dump(chrome_trace(), f)
+
+
+class _TimedLoader:
+    """Wraps a module loader to measure how long executing the module takes"""
+
+    def __init__(self, loader, name, profiler):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler.start(self._name)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.stop()
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """Records the cost of each module imported while it is installed.
+
+    The cumulative time of a module includes the imports it triggers; its
+    self time does not.
+    """
+
+    def __init__(self):
+        self.cumulative = {}
+        self.self_time = {}
+        self._stack = []
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        # Let the other finders do the finding, and only wrap the loader
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, fullname, self)
+            return spec
+        return None
+
+    def start(self, name):
+        # [name, start time, time spent in nested imports]
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def stop(self):
+        name, start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.cumulative[name] = elapsed
+        self.self_time[name] = elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def report(self, limit=30):
+        lines = [f"{'self ms':>10} {'cumul. ms':>10}  module"]
+        by_self_time = sorted(self.self_time.items(), key=lambda x: -x[1])
+        for name, self_time in by_self_time[:limit]:
+            lines.append(
+                f"{self_time * 1000:10.1f} {self.cumulative[name] * 1000:10.1f}  {name}"
+            )
+        total = sum(self.self_time.values())
+        lines.append(f"{total * 1000:10.1f} {'':10}  total ({len(self.self_time)})")
+        return "\n".join(lines)
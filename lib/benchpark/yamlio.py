@@ -0,0 +1,117 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""Reading and writing YAML files.
+
+Everything goes through libyaml (``yaml.CSafeLoader``/``yaml.CSafeDumper``)
+when PyYAML was built with it, which is several times faster than the
+pure-Python loader and dumper. Files that were already parsed are served
+from an in-process cache as long as their mtime and size are unchanged, and
+files are written atomically, so a reader never sees half of one.
+"""
+
+import collections
+import contextlib
+import os
+import tempfile
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as _SafeDumper
+    from yaml import CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeDumper as _SafeDumper
+    from yaml import SafeLoader as Loader
+
+YAMLError = yaml.YAMLError
+
+
+class Dumper(_SafeDumper):
+    """A safe dumper that also accepts tuples (written as lists)"""
+
+
+Dumper.add_representer(tuple, Dumper.represent_list)
+
+#: Number of parsed files kept by ``load``
+cache_size = 1024
+
+#: Path -> (mtime_ns, size, document), least recently used first
+_cache = collections.OrderedDict()
+
+
+def _file_mode():
+    # The umask can only be read by setting it, for the whole process: this
+    # is done once here, rather than while other threads may create files
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+#: Permissions of the files written by ``atomic_write``, as ``open`` would
+#: create them
+file_mode = _file_mode()
+
+
+def loads(text):
+    """Parse a YAML document from a string or a stream."""
+    return yaml.load(text, Loader=Loader)
+
+
+def load(path):
+    """The parsed content of the YAML file at ``path``.
+
+    The document is shared with every other caller loading the same file, so
+    it must not be modified: use ``copy.deepcopy`` on it first if needed.
+    """
+    key = os.fspath(path)
+    stat = os.stat(key)
+    cached = _cache.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        _cache.move_to_end(key)
+        return cached[2]
+
+    with open(key, "r") as f:
+        document = loads(f)
+    _cache[key] = (stat.st_mtime_ns, stat.st_size, document)
+    if len(_cache) > cache_size:
+        _cache.popitem(last=False)
+    return document
+
+
+def dump(data, stream=None, **kwargs):
+    """Write ``data`` as YAML to ``stream``, or return it as a string."""
+    kwargs.setdefault("default_flow_style", False)
+    return yaml.dump(data, stream, Dumper=Dumper, **kwargs)
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """Open a temporary file next to ``path`` for writing, and move it into
+    place once the block completes (or remove it if the block fails).
+    """
+    path = os.fspath(path)
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}-")
+    try:
+        # mkstemp creates the file readable by its owner only
+        os.chmod(tmp_path, file_mode)
+        with os.fdopen(fd, "w") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    _cache.pop(path, None)
+
+
+def write(path, data, **kwargs):
+    """Atomically write ``data`` as YAML to the file at ``path``."""
+    with atomic_write(path) as f:
+        dump(data, f, **kwargs)
+
+
+def clear_cache():
+    _cache.clear()
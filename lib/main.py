@@ -6,20 +6,14 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import argparse
+import importlib
 import inspect
 import os
 import pathlib
-import shlex
-import subprocess
 import sys
-import yaml
 
-import benchpark.cmd.audit
-import benchpark.cmd.system
-import benchpark.cmd.experiment
-import benchpark.cmd.setup
-import benchpark.cmd.unit_test
 import benchpark.paths
+import benchpark.timing
 from benchpark.accounting import (
     benchpark_experiments,
     benchpark_modifiers,
@@ -29,25 +23,87 @@ from benchpark.accounting import (
 
 __version__ = "0.1.0"
 
-
-def main():
+#: Subcommands implemented in ``benchpark.cmd``, mapped to the module that
+#: implements them and their one-line help. A command module is imported
+#: (and its parser built) only when that subcommand is invoked, so
+#: ``benchpark --help`` and the cheap commands never import e.g. pytest.
+commands = {
+    "system": ("benchpark.cmd.system", "Initialize a system config"),
+    "experiment": ("benchpark.cmd.experiment", "Interact with experiments"),
+    "setup": (
+        "benchpark.cmd.setup",
+        "Set up an experiment and prepare it to build/run",
+    ),
+    "unit-test": ("benchpark.cmd.unit_test", "Run benchpark unit tests"),
+    "audit": ("benchpark.cmd.audit", "Look for problems in System/Experiment repos"),
+    "budget": (
+        "benchpark.cmd.budget",
+        "Estimate the node-hours of an experiment on a system, and prune it to a budget",
+    ),
+    "query": (
+        "benchpark.cmd.query",
+        "Find generated experiments and systems whose specs match a spec",
+    ),
+    "serve": (
+        "benchpark.cmd.serve",
+        "Run a server that keeps repos loaded for faster repeated commands",
+    ),
+}
+
+#: Commands that are sent to the `benchpark serve` listening on the socket
+#: named by BENCHPARK_SERVER, if that is set
+served_commands = ("experiment", "system", "setup", "audit", "query")
+
+
+#: Benchpark's own options that are followed by a value
+options_with_values = ("--trace",)
+
+
+def main(argv=None, use_server=True):
+    """Run ``benchpark <argv>``. Unless ``use_server`` is False (as when
+    running a command for the server), served commands are sent to the
+    server named by BENCHPARK_SERVER, if that is set.
+    """
     if sys.version_info[:2] < (3, 8):
         raise Exception("Benchpark requires at least python 3.8+.")
 
-    parser = argparse.ArgumentParser(description="Benchpark")
-    parser.add_argument(
-        "-V", "--version", action="store_true", help="show version number and exit"
-    )
-
-    subparsers = parser.add_subparsers(title="Subcommands", dest="subcommand")
+    argv = sys.argv[1:] if argv is None else argv
+    cmd_name = requested_command(argv)
+
+    # Hand the command to a running `benchpark serve`, if there is one
+    server_socket = os.environ.get("BENCHPARK_SERVER")
+    if use_server and server_socket and cmd_name in served_commands:
+        from benchpark.server import forward
+
+        status = forward(server_socket, argv)
+        # Otherwise the server could not run it: it is run here instead
+        if status is not None:
+            return status
+
+    main_argv = argv[: argv.index(cmd_name)] if cmd_name else argv
+
+    # Profiling options are acted on before the command module is imported
+    # (and before argparse has seen the command's arguments)
+    import_profiler = None
+    if "--profile-imports" in main_argv:
+        import_profiler = benchpark.timing.ImportProfiler()
+        import_profiler.install()
+
+    trace_path = None
+    profile_env = os.environ.get("BENCHPARK_PROFILE", "")
+    if profile_env and profile_env != "0":
+        benchpark.timing.enable()
+        if profile_env.endswith(".json"):
+            trace_path = profile_env
+    if "--timings" in main_argv or any(a.startswith("--trace") for a in main_argv):
+        benchpark.timing.enable()
 
     actions = {}
-    benchpark_list(subparsers, actions)
-    benchpark_tags(subparsers, actions)
-    init_commands(subparsers, actions)
+    with benchpark.timing.span("load command"):
+        parser = make_parser(actions, [cmd_name])
 
-    args, unknown_args = parser.parse_known_args()
-    no_args = True if len(sys.argv) == 1 else False
+    args, unknown_args = parser.parse_known_args(argv)
+    no_args = True if len(argv) == 0 else False
 
     if no_args:
         parser.print_help()
@@ -57,16 +113,72 @@ def main():
         print(get_version())
         return 0
 
+    try:
+        with benchpark.timing.span(f"benchpark {args.subcommand}"):
+            return run_action(actions, args, unknown_args)
+    finally:
+        if benchpark.timing.enabled:
+            print("\nTimings:", file=sys.stderr)
+            print(benchpark.timing.summary(), file=sys.stderr)
+            if "benchpark.spec" in sys.modules:
+                spec_module = sys.modules["benchpark.spec"]
+                summary = spec_module.parse_cache_summary()
+                print(f"\nSpec parse cache: {summary}", file=sys.stderr)
+        trace_path = args.trace or trace_path
+        if trace_path:
+            benchpark.timing.write_chrome_trace(trace_path)
+            print(f"Wrote trace to {trace_path}", file=sys.stderr)
+        if import_profiler:
+            import_profiler.uninstall()
+            print("\nImports:", file=sys.stderr)
+            print(import_profiler.report(), file=sys.stderr)
+
+
+def make_parser(actions, cmd_names=()):
+    """The argument parser for ``benchpark``. Only the commands in
+    ``cmd_names`` are fully set up (see ``init_commands``), and their
+    actions are added to ``actions``.
+    """
+    parser = argparse.ArgumentParser(description="Benchpark")
+    parser.add_argument(
+        "-V", "--version", action="store_true", help="show version number and exit"
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="print how long each phase of the command took (also enabled by "
+        "setting BENCHPARK_PROFILE)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="write the phase timings to FILE as a Chrome trace (JSON)",
+    )
+    parser.add_argument(
+        "--profile-imports",
+        action="store_true",
+        help="print how long importing each Python module took",
+    )
+
+    subparsers = parser.add_subparsers(title="Subcommands", dest="subcommand")
+
+    benchpark_list(subparsers, actions)
+    benchpark_tags(subparsers, actions)
+    init_commands(subparsers, actions, cmd_names)
+    return parser
+
+
+def run_action(actions, args, unknown_args):
     if args.subcommand in actions:
         action = actions[args.subcommand]
         if supports_unknown_args(action):
-            action(args, unknown_args)
+            return action(args, unknown_args)
         elif unknown_args:
             raise argparse.ArgumentTypeError(
                 f"benchpark {args.subcommand} has no option(s) {unknown_args}"
             )
         else:
-            action(args)
+            return action(args)
     else:
         print(
             "Invalid subcommand ({args.subcommand}) - must choose one of: "
@@ -110,14 +222,15 @@ def benchpark_benchmarks():
 
 
 def benchpark_get_tags():
+    import benchpark.yamlio
+
     f = benchpark.paths.benchpark_root / "tags.yaml"
     tags = []
 
-    with open(f, "r") as stream:
-        try:
-            data = yaml.safe_load(stream)
-        except yaml.YAMLError as exc:
-            print(exc)
+    try:
+        data = benchpark.yamlio.load(f)
+    except benchpark.yamlio.YAMLError as exc:
+        print(exc)
 
     for k0, v0 in data.items():
         if k0 == "benchpark-tags":
@@ -189,57 +302,39 @@ def benchpark_check_tag(arg_str):
     return found
 
 
-def init_commands(subparsers, actions_dict):
-    """This function is for initializing commands that are defined outside
-    of this script. It is intended that all command setup will eventually
-    be refactored in this way (e.g. `benchpark_setup` will be defined in
-    another file.
-    """
-    system_parser = subparsers.add_parser("system", help="Initialize a system config")
-    benchpark.cmd.system.setup_parser(system_parser)
-
-    experiment_parser = subparsers.add_parser(
-        "experiment", help="Interact with experiments"
-    )
-    benchpark.cmd.experiment.setup_parser(experiment_parser)
-
-    setup_parser = subparsers.add_parser(
-        "setup", help="Set up an experiment and prepare it to build/run"
-    )
-    benchpark.cmd.setup.setup_parser(setup_parser)
+def requested_command(argv):
+    """Return the subcommand named on the command line, if any.
 
-    unit_test_parser = subparsers.add_parser(
-        "unit-test", help="Run benchpark unit tests"
-    )
-    benchpark.cmd.unit_test.setup_parser(unit_test_parser)
+    Benchpark's own options come before the subcommand, so this is the first
+    argument that is neither an option nor the value of one.
+    """
+    option_value = False
+    for arg in argv:
+        if option_value:
+            option_value = False
+        elif arg in options_with_values:
+            option_value = True
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+def init_commands(subparsers, actions_dict, cmd_names=()):
+    """This function is for initializing commands that are defined outside
+    of this script (see ``commands``).
 
-    audit_parser = subparsers.add_parser(
-        "audit", help="Look for problems in System/Experiment repos"
-    )
-    benchpark.cmd.audit.setup_parser(audit_parser)
-
-    actions_dict["system"] = benchpark.cmd.system.command
-    actions_dict["experiment"] = benchpark.cmd.experiment.command
-    actions_dict["setup"] = benchpark.cmd.setup.command
-    actions_dict["unit-test"] = benchpark.cmd.unit_test.command
-    actions_dict["audit"] = benchpark.cmd.audit.command
-
-
-def run_command(command_str, env=None):
-    proc = subprocess.Popen(
-        shlex.split(command_str),
-        env=env,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    stdout, stderr = proc.communicate()
-    if proc.returncode != 0:
-        raise RuntimeError(
-            f"Failed command: {command_str}\nOutput: {stdout}\nError: {stderr}"
-        )
+    Every command gets a subparser so that it shows up in ``benchpark
+    --help``, but only those in ``cmd_names`` (the command being run) have
+    their module imported and their full parser set up.
+    """
+    for name, (module_name, help_str) in commands.items():
+        cmd_parser = subparsers.add_parser(name, help=help_str)
+        if name not in cmd_names:
+            continue
 
-    return (stdout, stderr)
+        module = importlib.import_module(module_name)
+        module.setup_parser(cmd_parser)
+        actions_dict[name] = module.command
 
 
 def benchpark_tags(subparsers, actions_dict):
@@ -265,6 +360,10 @@ def benchpark_tags(subparsers, actions_dict):
 
 
 def helper_experiments_tags(ramble_exe, benchmarks):
+    # Imported here rather than for every command: benchpark.runtime pulls in
+    # concurrent.futures, yaml and the site config code
+    from benchpark.runtime import run_command
+
     # find all tags in Ramble applications (both in Ramble built-in and in Benchpark/repo)
     (tags_stdout, tags_stderr) = run_command(f"{ramble_exe} attributes --tags --all")
     ramble_applications_tags = {}
@@ -286,6 +385,8 @@ def benchpark_tags_handler(args):
     """
     Filter ramble tags by benchpark benchmarks
     """
+    from benchpark.runtime import run_command
+
     experiments_root = pathlib.Path(os.path.abspath(args.experiments_root))
     ramble_location = experiments_root / "ramble"
     ramble_exe = ramble_location / "bin" / "ramble"
@@ -316,4 +417,4 @@ def benchpark_tags_handler(args):
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# Copyright 2023 Lawrence Livermore National Security, LLC and other
+# Benchpark Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# Bash and zsh completion for benchpark. Source this file from ~/.bashrc or
+# ~/.zshrc:
+#
+#     source /path/to/benchpark/share/benchpark/benchpark-completion.bash
+#
+# Subcommands, options, experiment and system names, and variant names and
+# values are completed.
+
+if test -n "${ZSH_VERSION:-}"; then
+    if ! typeset -f compdef >/dev/null 2>&1; then
+        autoload -U +X compinit && compinit
+    fi
+    autoload -U +X bashcompinit && bashcompinit
+fi
+
+_benchpark() {
+    local line="${COMP_LINE:0:$COMP_POINT}"
+    local cur="${COMP_WORDS[COMP_CWORD]}"
+    local IFS=$'\n'
+    COMPREPLY=($("${COMP_WORDS[0]}" _complete "$line" 2>/dev/null))
+
+    # Candidates are whole words, but bash also splits words at "=" (see
+    # COMP_WORDBREAKS): keep only the part that replaces the current word
+    local word="${line##*[[:space:]]}"
+    if [ "$word" != "$cur" ]; then
+        local prefix="${word%"$cur"}"
+        COMPREPLY=("${COMPREPLY[@]#"$prefix"}")
+    fi
+
+    # A value follows "variant=", so don't add a space after it
+    if [ "${#COMPREPLY[@]}" -eq 1 ] && [[ "${COMPREPLY[0]}" == *= ]]; then
+        type compopt >/dev/null 2>&1 && compopt -o nospace
+    fi
+}
+
+complete -o default -F _benchpark benchpark